@@ -2,148 +2,1035 @@
 """
 Batch processor for txt2kg chunks
 Processes multiple document chunks and stores them in the knowledge graph
+
+Two modes are available:
+  - serial (default): one chunk at a time with blocking requests
+  - async (--async): an aiohttp pipeline with a bounded number of in-flight
+    extractions feeding a separate storage stage
+
+With --dedup, near-duplicate chunks (MinHash-LSH, see chunk_dedup.py) are
+grouped and only one representative per group is sent for extraction; its
+triples are stored again under every member's document name.
+
+Per-stage latency and throughput (read, extract, store) can be written as
+JSON (--metrics-json) and in the Prometheus text format (--metrics-prom).
+
+Progress is recorded in a SQLite journal keyed by the SHA-256 of each chunk's
+text, so an interrupted run can be restarted without re-extracting chunks.
+
+The input is either a directory of .txt chunk files or a single large text
+file, which is split into sentence-aligned chunks on the fly (see
+split_document.py) without writing temp files. JSONL records of the form
+{"name": ..., "text": ...} are also accepted, from a .jsonl file, a directory
+of .jsonl shards or stdin ("-"), so a corpus exporter can be piped straight in:
+
+    python3 examples/download_biorxiv_dataset.py --format jsonl --output - | \
+        python3 batch-process-chunks.py - --async
 """
 
+import io
 import os
+import math
 import sys
 import json
 import time
 import glob
+import random
+import sqlite3
+import hashlib
+import asyncio
+from collections import Counter
+import argparse
 import requests
-from pathlib import Path
+
+from split_document import (
+    CHUNK_SIZE_KB_DEFAULT,
+    RESERVE_TOKENS_DEFAULT,
+    chunk_name,
+    iter_file_chunks,
+    iter_sentences,
+    pack_sentences,
+    resolve_packing,
+)
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
 
 API_BASE_URL = "http://localhost:3001"
 EXTRACT_ENDPOINT = f"{API_BASE_URL}/api/extract-triples"
 STORE_ENDPOINT = f"{API_BASE_URL}/api/graph-db/triples"
 
-def process_chunk(chunk_file, use_langchain=True):
-    """Process a single chunk file"""
+EXTRACT_TIMEOUT = 120  # 2 minute timeout per chunk
+STORE_TIMEOUT = 30
+STORE_TIMEOUT_PER_TRIPLE = 0.05  # extra store timeout for coalesced batches
+
+# Async pipeline defaults
+CONCURRENCY_DEFAULT = 8
+STORE_CONCURRENCY_DEFAULT = 2
+MAX_RETRIES_DEFAULT = 5
+BACKOFF_BASE = 1.0  # seconds, doubled on every retry
+BACKOFF_MAX = 60.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Store coalescing defaults (async mode)
+STORE_BATCH_SIZE_DEFAULT = 500  # unique triples per store request
+STORE_FLUSH_INTERVAL_DEFAULT = 5.0  # seconds before a partial batch is flushed
+
+JOURNAL_FILE = ".txt2kg-journal.sqlite"
+
+def chunk_digest(text):
+    """Content address of a chunk, used as the journal key"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class IngestJournal:
+    """
+    Records per-chunk progress so interrupted runs can resume.
+
+    Each chunk moves through two states: extracted (triples are saved) and
+    stored (the graph database acknowledged the write). On a rerun, stored
+    chunks are skipped and extracted-but-unstored chunks go straight to the
+    store step without another LLM call.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                digest TEXT PRIMARY KEY,
+                name TEXT,
+                triples TEXT NOT NULL,
+                triple_count INTEGER NOT NULL,
+                extracted_at REAL NOT NULL,
+                stored_count INTEGER,
+                stored_at REAL
+            )
+        """)
+        self.conn.commit()
+
+    def lookup(self, digest):
+        """Return the journal entry for a chunk, or None if it was never extracted"""
+        row = self.conn.execute(
+            "SELECT triples, triple_count, stored_count FROM chunks WHERE digest = ?",
+            (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'triples': json.loads(row[0]),
+            'triple_count': row[1],
+            'stored': row[2] is not None,
+            'stored_count': row[2] or 0,
+        }
+
+    def record_extraction(self, digest, name, triples):
+        self.conn.execute(
+            """INSERT OR REPLACE INTO chunks (digest, name, triples, triple_count, extracted_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (digest, name, json.dumps(triples), len(triples), time.time())
+        )
+        self.conn.commit()
+
+    def record_store(self, digest, stored_count):
+        self.conn.execute(
+            "UPDATE chunks SET stored_count = ?, stored_at = ? WHERE digest = ?",
+            (stored_count, time.time(), digest)
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+STAGES = ("read", "extract", "store")
+
+def configure_api(base_url):
+    """Point the extract/store endpoints at a different txt2kg (or mock) server"""
+    global API_BASE_URL, EXTRACT_ENDPOINT, STORE_ENDPOINT
+    API_BASE_URL = base_url.rstrip('/')
+    EXTRACT_ENDPOINT = f"{API_BASE_URL}/api/extract-triples"
+    STORE_ENDPOINT = f"{API_BASE_URL}/api/graph-db/triples"
+
+def error_type(error):
+    """Short, stable label for an error, used to group error rates"""
+    if isinstance(error, (asyncio.TimeoutError, requests.Timeout)):
+        return 'timeout'
+    status = getattr(error, 'status', None)
+    if status is None and isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    if status is not None:
+        return f'http_{status}'
+    if isinstance(error, requests.ConnectionError) or (
+            HAS_AIOHTTP and isinstance(error, aiohttp.ClientConnectionError)):
+        return 'connection'
+    return type(error).__name__
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+class IngestMetrics:
+    """
+    Per-stage latency, throughput and error counts for an ingest run.
+
+    Every stage records one latency sample per operation (reading a chunk,
+    one extraction call including retries, one store request) along with the
+    bytes and triples it handled (for the store stage, the bytes of the
+    request body sent). Failed operations are counted by error type,
+    and retried 429/5xx responses are counted separately.
+    """
+
+    def __init__(self):
+        self.stages = {
+            stage: {'latencies': [], 'bytes': 0, 'triples': 0,
+                    'errors': Counter(), 'retries': Counter()}
+            for stage in STAGES
+        }
+        self.chunks = Counter()
+
+    def record(self, stage, seconds, nbytes=0, triples=0):
+        metrics = self.stages[stage]
+        metrics['latencies'].append(seconds)
+        metrics['bytes'] += nbytes
+        metrics['triples'] += triples
+
+    def record_error(self, stage, error):
+        self.stages[stage]['errors'][error_type(error)] += 1
+
+    def record_retry(self, stage, error):
+        self.stages[stage]['retries'][error_type(error)] += 1
+
+    def record_chunk(self, result):
+        if result.get('skipped'):
+            self.chunks['skipped'] += 1
+        if result.get('deduplicated'):
+            self.chunks['deduplicated'] += 1
+        self.chunks['succeeded' if result['success'] else 'failed'] += 1
+
+    def report(self, wall_time):
+        """Machine-readable summary of the run"""
+        wall_time = max(wall_time, 1e-9)
+        read = self.stages['read']
+        stages = {}
+        for stage, metrics in self.stages.items():
+            latencies = sorted(metrics['latencies'])
+            errors = sum(metrics['errors'].values())
+            attempts = len(latencies) + errors
+            stages[stage] = {
+                'count': len(latencies),
+                'total_s': sum(latencies),
+                'p50_s': percentile(latencies, 0.50),
+                'p95_s': percentile(latencies, 0.95),
+                'p99_s': percentile(latencies, 0.99),
+                'max_s': latencies[-1] if latencies else 0.0,
+                'bytes': metrics['bytes'],
+                'triples': metrics['triples'],
+                'errors': dict(metrics['errors']),
+                'retries': dict(metrics['retries']),
+                'error_rate': errors / attempts if attempts else 0.0,
+            }
+        return {
+            'wall_time_s': wall_time,
+            'chunks': {
+                'total': self.chunks['succeeded'] + self.chunks['failed'],
+                'succeeded': self.chunks['succeeded'],
+                'failed': self.chunks['failed'],
+                'skipped': self.chunks['skipped'],
+                'deduplicated': self.chunks['deduplicated'],
+            },
+            'throughput': {
+                'chunks_per_s': (self.chunks['succeeded'] + self.chunks['failed']) / wall_time,
+                'triples_per_s': self.stages['extract']['triples'] / wall_time,
+                'stored_triples_per_s': self.stages['store']['triples'] / wall_time,
+                'bytes_per_s': read['bytes'] / wall_time,
+            },
+            'stages': stages,
+        }
+
+def format_prometheus(report):
+    """Render a metrics report in the Prometheus text exposition format"""
+    lines = []
+
+    def sample(name, labels, value):
+        label_str = ','.join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f"txt2kg_ingest_{name}{{{label_str}}} {value}" if label_str
+                     else f"txt2kg_ingest_{name} {value}")
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP txt2kg_ingest_{name} {help_text}")
+        lines.append(f"# TYPE txt2kg_ingest_{name} {kind}")
+        for labels, value in samples:
+            sample(name, labels, value)
+
+    stages = report['stages']
+    metric('wall_time_seconds', 'gauge', "Wall-clock duration of the run",
+           [({}, report['wall_time_s'])])
+    metric('chunks_total', 'counter', "Chunks by outcome",
+           [({'outcome': k}, v) for k, v in report['chunks'].items() if k != 'total'])
+    for key, value in report['throughput'].items():
+        metric(key, 'gauge', f"Average {key.replace('_', ' ')} over the run", [({}, value)])
+    metric('stage_latency_seconds', 'summary', "Per-operation latency by stage",
+           [({'stage': s, 'quantile': q}, stages[s][f'p{int(q * 100)}_s'])
+            for s in stages for q in (0.5, 0.95, 0.99)])
+    for s in stages:
+        sample('stage_latency_seconds_sum', {'stage': s}, stages[s]['total_s'])
+        sample('stage_latency_seconds_count', {'stage': s}, stages[s]['count'])
+    metric('stage_operations_total', 'counter', "Completed operations by stage",
+           [({'stage': s}, stages[s]['count']) for s in stages])
+    metric('stage_bytes_total', 'counter', "Bytes handled by stage",
+           [({'stage': s}, stages[s]['bytes']) for s in stages])
+    metric('stage_triples_total', 'counter', "Triples handled by stage",
+           [({'stage': s}, stages[s]['triples']) for s in stages])
+    metric('stage_errors_total', 'counter', "Failed operations by stage and error type",
+           [({'stage': s, 'type': t}, n) for s in stages for t, n in stages[s]['errors'].items()])
+    metric('stage_retries_total', 'counter', "Retried requests by stage and cause",
+           [({'stage': s, 'type': t}, n) for s in stages for t, n in stages[s]['retries'].items()])
+    return '\n'.join(lines) + '\n'
+
+def timed_chunks(chunks, metrics):
+    """Wrap a (name, text) iterator, recording read latency and bytes"""
+    iterator = iter(chunks)
+    while True:
+        start_time = time.perf_counter()
+        try:
+            name, text = next(iterator)
+        except StopIteration:
+            return
+        metrics.record('read', time.perf_counter() - start_time, nbytes=len(text.encode('utf-8')))
+        yield name, text
+
+def iter_directory_chunks(chunk_files):
+    """Yield (name, text) for each chunk file, reading files lazily"""
+    for chunk_file in chunk_files:
+        with open(chunk_file, 'r', encoding='utf-8') as f:
+            yield os.path.basename(chunk_file), f.read()
+
+def iter_document_chunks(path, chunk_size_kb, overlap_kb=0, **token_options):
+    """Yield (name, text) for sentence-aligned chunks streamed from one large file"""
+    for index, text in enumerate(iter_file_chunks(path, chunk_size_kb, overlap_kb, **token_options), 1):
+        yield chunk_name(path, index), text
+
+def iter_jsonl_chunks(paths, chunk_size_kb, overlap_kb=0, **token_options):
+    """
+    Yield (name, text) for JSONL records read from `paths` ("-" is stdin).
+    Records larger than the chunk budget are split like a single large file.
+    """
+    budget, overlap, measure, exact = resolve_packing(chunk_size_kb, overlap_kb, **token_options)
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                name, text = record['name'], record['text']
+                if measure(text) <= budget:
+                    yield name, text
+                    continue
+                pieces = pack_sentences(iter_sentences(io.StringIO(text)), budget, overlap, measure, exact)
+                for index, piece in enumerate(pieces, 1):
+                    yield chunk_name(name, index), piece
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def process_chunk(name, text, use_langchain=True, journal=None, extract_timeout=EXTRACT_TIMEOUT,
+                  metrics=None, shared_triples=None, on_triples=None):
+    """
+    Process a single chunk
+
+    `shared_triples` are the triples of this chunk's near-duplicate group
+    representative; when given, extraction is skipped and they are stored
+    under this chunk's name. `on_triples` is called with the chunk's triples
+    once they are known.
+    """
     print(f"\n{'='*60}")
-    print(f"Processing: {os.path.basename(chunk_file)}")
+    print(f"Processing: {name}")
     print(f"{'='*60}")
 
-    # Read the file
-    with open(chunk_file, 'r', encoding='utf-8') as f:
-        text = f.read()
-
     file_size_kb = len(text) / 1024
     print(f"File size: {file_size_kb:.2f} KB")
 
-    # Extract triples
-    print("Extracting triples using NVIDIA Nemotron...")
+    digest = chunk_digest(text)
+    entry = journal.lookup(digest) if journal else None
+    if entry and entry['stored']:
+        print(f"⏭️  Already processed ({entry['triple_count']} triples), skipping")
+        if on_triples:
+            on_triples(entry['triples'])
+        return {'success': True, 'skipped': True,
+                'triples': entry['triple_count'], 'stored': entry['stored_count']}
+
     start_time = time.time()
+    extraction_time = 0
+    stage = 'extract'
+    deduplicated = False
 
     try:
-        response = requests.post(
-            EXTRACT_ENDPOINT,
-            json={
-                "text": text,
-                "useLangChain": use_langchain,
-                "useGraphTransformer": False
-            },
-            timeout=120  # 2 minute timeout per chunk
-        )
-        response.raise_for_status()
-        result = response.json()
+        if entry:
+            triples = entry['triples']
+            print(f"⏭️  Re-using {len(triples)} journaled triples, skipping extraction")
+        elif shared_triples is not None:
+            triples = shared_triples
+            deduplicated = True
+            if journal:
+                journal.record_extraction(digest, name, triples)
+            print(f"⏭️  Near-duplicate chunk, re-using {len(triples)} triples from its group")
+        else:
+            # Extract triples
+            print("Extracting triples using NVIDIA Nemotron...")
+            response = requests.post(
+                EXTRACT_ENDPOINT,
+                json={
+                    "text": text,
+                    "useLangChain": use_langchain,
+                    "useGraphTransformer": False
+                },
+                timeout=extract_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
 
-        extraction_time = time.time() - start_time
-        triple_count = result.get('count', 0)
+            extraction_time = time.time() - start_time
+            triples = result.get('triples', []) if result.get('count', 0) else []
+            if metrics:
+                metrics.record('extract', extraction_time, len(text.encode('utf-8')), len(triples))
+            if journal:
+                journal.record_extraction(digest, name, triples)
 
-        print(f"✅ Extracted {triple_count} triples in {extraction_time:.1f}s")
+            print(f"✅ Extracted {len(triples)} triples in {extraction_time:.1f}s")
 
+        if on_triples:
+            on_triples(triples)
+        triple_count = len(triples)
         if triple_count == 0:
             print("⚠️  No triples extracted from this chunk")
-            return {'success': True, 'triples': 0, 'stored': 0}
+            if journal:
+                journal.record_store(digest, 0)
+            return {'success': True, 'triples': 0, 'stored': 0, 'deduplicated': deduplicated}
 
         # Store triples in graph database
         print("Storing triples in ArangoDB...")
+        stage = 'store'
+        store_start = time.time()
         store_response = requests.post(
             STORE_ENDPOINT,
             json={
-                "triples": result['triples'],
-                "documentName": os.path.basename(chunk_file)
+                "triples": triples,
+                "documentName": name
             },
-            timeout=30
+            timeout=STORE_TIMEOUT
         )
         store_response.raise_for_status()
         store_result = store_response.json()
 
         stored_count = store_result.get('count', 0)
+        if metrics:
+            metrics.record('store', time.time() - store_start, len(store_response.request.body or b''),
+                           stored_count)
+        if journal:
+            journal.record_store(digest, stored_count)
         print(f"✅ Stored {stored_count} triples in graph database")
 
         return {
             'success': True,
             'triples': triple_count,
             'stored': stored_count,
-            'time': extraction_time
+            'time': extraction_time,
+            'deduplicated': deduplicated
         }
 
-    except requests.Timeout:
+    except requests.Timeout as e:
+        if metrics:
+            metrics.record_error(stage, e)
         print("❌ Request timed out - chunk may be too large")
         return {'success': False, 'error': 'timeout'}
     except Exception as e:
+        if metrics:
+            metrics.record_error(stage, e)
         print(f"❌ Error: {str(e)}")
         return {'success': False, 'error': str(e)}
 
+class RetryableStatus(Exception):
+    """Raised for responses that signal an overloaded backend (429/5xx)"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+class AdaptiveLimiter:
+    """
+    Bounds the number of in-flight requests to an endpoint.
+
+    The window starts at max_limit, is halved whenever the backend reports
+    overload and grows back by one after a full window of successes (AIMD).
+    An overload response also pauses every worker until the backoff expires,
+    so a 429 slows the whole pipeline instead of a single request.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self, overloaded=False, backoff=0.0):
+        async with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self.resume_at = max(self.resume_at, time.monotonic() + backoff)
+            elif self.limit < self.max_limit:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, honouring Retry-After when given"""
+    if retry_after is not None:
+        return min(BACKOFF_MAX, retry_after)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def parse_retry_after(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+async def post_with_backoff(session, url, payload, timeout, limiter, max_retries, on_retry=None):
+    """POST JSON, retrying 429/5xx and connection errors with adaptive backoff"""
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        overloaded = False
+        delay = 0.0
+        try:
+            async with session.post(url, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    raise RetryableStatus(
+                        response.status,
+                        parse_retry_after(response.headers.get('Retry-After'))
+                    )
+                response.raise_for_status()
+                return await response.json()
+        except (RetryableStatus, aiohttp.ClientConnectionError) as e:
+            if attempt >= max_retries:
+                raise
+            overloaded = True
+            delay = backoff_delay(attempt, getattr(e, 'retry_after', None))
+            attempt += 1
+            if on_retry:
+                on_retry(e)
+        finally:
+            await limiter.release(overloaded=overloaded, backoff=delay)
+        await asyncio.sleep(delay)
+
+class TripleBatch:
+    """
+    Triples from several chunks coalesced into a single store request.
+
+    Identical (subject, predicate, object) tuples are merged. The store
+    endpoint keeps only subject, predicate and object, so which chunks a
+    triple came from is not recorded, and `documentName` only names the
+    batch in the server log. The chunks that contributed are remembered so
+    they can be acknowledged (or failed) together once the write completes,
+    each with the unique triples it added to the batch.
+    """
+
+    def __init__(self):
+        self.triples = {}
+        self.chunks = []
+        self.created = None
+        self.received = 0
+
+    def __len__(self):
+        return len(self.triples)
+
+    def add(self, index, name, digest, triples, extraction_time, deduplicated=False):
+        if self.created is None:
+            self.created = time.monotonic()
+        added = 0
+        for triple in triples:
+            key = tuple(str(triple.get(field) or '').strip()
+                        for field in ('subject', 'predicate', 'object'))
+            if not all(key):
+                continue
+            self.received += 1
+            if key not in self.triples:
+                self.triples[key] = {'subject': key[0], 'predicate': key[1], 'object': key[2]}
+                added += 1
+        self.chunks.append((index, name, digest, len(triples), added, extraction_time, deduplicated))
+
+    def stored_counts(self, stored):
+        """
+        Split the `stored` count the server returned for the batch over its
+        chunks, in order, by the unique triples each one added
+        """
+        counts = []
+        for chunk in self.chunks:
+            counts.append(min(chunk[4], stored))
+            stored -= counts[-1]
+        return counts
+
+    def age(self):
+        return time.monotonic() - self.created if self.created is not None else 0.0
+
+    def payload(self):
+        names = [chunk[1] for chunk in self.chunks]
+        document_name = names[0] if len(names) == 1 else f"{names[0]} (+{len(names) - 1} more)"
+        return {"triples": list(self.triples.values()), "documentName": document_name}
+
+def describe_error(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    return str(error) or type(error).__name__
+
+async def run_pipeline(chunks, concurrency, store_concurrency, max_retries,
+                       use_langchain=True, journal=None,
+                       store_batch_size=STORE_BATCH_SIZE_DEFAULT,
+                       store_flush_interval=STORE_FLUSH_INTERVAL_DEFAULT, total=None,
+                       extract_timeout=EXTRACT_TIMEOUT, metrics=None, dedup=None):
+    """
+    Run extraction and storage as overlapping pipeline stages.
+
+    Up to `concurrency` extractions are in flight at once. Extracted triples
+    flow through a bounded queue into a coalescing stage that merges triples
+    from many chunks into batches of up to `store_batch_size` unique triples
+    (or whatever has accumulated after `store_flush_interval` seconds), and
+    `store_concurrency` workers write those batches to the graph database.
+
+    `chunks` is an iterable of (name, text) pairs and is consumed lazily, so
+    streamed inputs never have to be held in memory; `total` is only used for
+    progress output.
+
+    With a `dedup` index, a near-duplicate chunk waits for its group
+    representative's extraction and reuses those triples; if the
+    representative fails, the chunk is extracted on its own.
+    """
+    metrics = metrics or IngestMetrics()
+    group_ready = {}  # representative digest -> asyncio.Event
+    group_triples = {}  # representative digest -> triples, kept in memory only without a journal
+
+    def group_event(digest):
+        return group_ready.setdefault(digest, asyncio.Event())
+
+    def publish_group(digest, triples):
+        if triples is not None and journal is None:
+            group_triples[digest] = triples
+        group_event(digest).set()
+
+    async def representative_triples(representative):
+        await group_event(representative).wait()
+        if journal:
+            entry = journal.lookup(representative)
+            return entry['triples'] if entry else None
+        return group_triples.get(representative)
+
+    results = {}
+    done = 0
+    store_stats = {'requests': 0, 'received': 0, 'unique': 0, 'stored': 0}
+
+    extract_queue = asyncio.Queue(maxsize=concurrency * 2)
+    store_queue = asyncio.Queue(maxsize=concurrency * 2)
+    flush_queue = asyncio.Queue(maxsize=store_concurrency)
+    extract_limiter = AdaptiveLimiter(concurrency)
+    store_limiter = AdaptiveLimiter(store_concurrency)
+
+    def finish(index, name, result):
+        nonlocal done
+        done += 1
+        results[index] = result
+        metrics.record_chunk(result)
+        progress = f"[{done}/{total}]" if total else f"[{done}]"
+        if result.get('skipped'):
+            print(f"{progress} ⏭️  {name}: already processed")
+        elif result.get('deduplicated'):
+            print(f"{progress} 🔁 {name}: near-duplicate, {result['stored']} triples re-used")
+        elif result['success']:
+            print(f"{progress} ✅ {name}: {result['triples']} extracted, "
+                  f"{result['stored']} stored ({result.get('time', 0):.1f}s)")
+        else:
+            print(f"{progress} ❌ {name}: {result['error']}")
+
+    async def feed():
+        # Pull chunks in a worker thread so file reads and splitting don't block the loop
+        iterator = iter(chunks)
+        index = 0
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                break
+            await extract_queue.put((index, *chunk))
+            index += 1
+        for _ in range(concurrency):
+            await extract_queue.put(None)
+
+    async def extract_worker(session):
+        while True:
+            item = await extract_queue.get()
+            if item is None:
+                return
+            index, name, text = item
+            start_time = time.time()
+            digest = chunk_digest(text)
+            representative = None
+            is_representative = False
+            deduplicated = False
+            triples = None
+            try:
+                if dedup:
+                    representative = await asyncio.to_thread(dedup.assign, digest, text)
+                    is_representative = representative is None
+                entry = journal.lookup(digest) if journal else None
+                if entry and entry['stored']:
+                    triples = entry['triples']
+                    finish(index, name, {'success': True, 'skipped': True,
+                                   'triples': entry['triple_count'], 'stored': entry['stored_count']})
+                    continue
+                shared = None
+                if not entry and representative is not None:
+                    shared = await representative_triples(representative)
+                if entry:
+                    triples = entry['triples']
+                elif shared is not None:
+                    triples = shared
+                    deduplicated = True
+                    if journal:
+                        journal.record_extraction(digest, name, triples)
+                else:
+                    result = await post_with_backoff(
+                        session, EXTRACT_ENDPOINT,
+                        {"text": text, "useLangChain": use_langchain, "useGraphTransformer": False},
+                        extract_timeout, extract_limiter, max_retries,
+                        on_retry=lambda e: metrics.record_retry('extract', e)
+                    )
+                    triples = result.get('triples', []) if result.get('count', 0) else []
+                    metrics.record('extract', time.time() - start_time,
+                                   len(text.encode('utf-8')), len(triples))
+                    if journal:
+                        journal.record_extraction(digest, name, triples)
+            except Exception as e:
+                metrics.record_error('extract', e)
+                finish(index, name, {'success': False, 'error': describe_error(e)})
+                continue
+            finally:
+                if is_representative:
+                    publish_group(digest, triples)
+
+            extraction_time = 0 if entry or deduplicated else time.time() - start_time
+            if not triples:
+                if journal:
+                    journal.record_store(digest, 0)
+                finish(index, name, {'success': True, 'triples': 0, 'stored': 0,
+                                     'time': extraction_time, 'deduplicated': deduplicated})
+                continue
+            await store_queue.put((index, name, digest, triples, extraction_time, deduplicated))
+
+    async def coalesce():
+        batch = TripleBatch()
+        while True:
+            timeout = None
+            if batch.chunks:
+                timeout = max(0.0, store_flush_interval - batch.age())
+            try:
+                item = await asyncio.wait_for(store_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = False
+            if item is None:
+                break
+            if item:
+                batch.add(*item)
+            if batch.chunks and (len(batch) >= store_batch_size or batch.age() >= store_flush_interval):
+                await flush_queue.put(batch)
+                batch = TripleBatch()
+        if batch.chunks:
+            await flush_queue.put(batch)
+        for _ in range(store_concurrency):
+            await flush_queue.put(None)
+
+    async def store_worker(session):
+        while True:
+            batch = await flush_queue.get()
+            if batch is None:
+                return
+            payload = batch.payload()
+            store_start = time.time()
+            try:
+                store_result = await post_with_backoff(
+                    session, STORE_ENDPOINT, payload,
+                    STORE_TIMEOUT + len(batch) * STORE_TIMEOUT_PER_TRIPLE,
+                    store_limiter, max_retries,
+                    on_retry=lambda e: metrics.record_retry('store', e)
+                )
+            except Exception as e:
+                metrics.record_error('store', e)
+                for index, name, *_ in batch.chunks:
+                    finish(index, name, {'success': False, 'error': describe_error(e)})
+                continue
+            stored_count = store_result.get('count', 0)
+            metrics.record('store', time.time() - store_start,
+                           len(json.dumps(payload).encode('utf-8')), stored_count)
+            store_stats['requests'] += 1
+            store_stats['received'] += batch.received
+            store_stats['unique'] += len(batch)
+            store_stats['stored'] += stored_count
+            for (index, name, digest, triple_count, _, extraction_time, deduplicated), stored in zip(
+                    batch.chunks, batch.stored_counts(stored_count)):
+                if journal:
+                    journal.record_store(digest, stored)
+                finish(index, name, {
+                    'success': True,
+                    'triples': triple_count,
+                    'stored': stored,
+                    'time': extraction_time,
+                    'deduplicated': deduplicated
+                })
+
+    connector = aiohttp.TCPConnector(limit=concurrency + store_concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        extractors = [asyncio.create_task(extract_worker(session)) for _ in range(concurrency)]
+        coalescer = asyncio.create_task(coalesce())
+        storers = [asyncio.create_task(store_worker(session)) for _ in range(store_concurrency)]
+        await feed()
+        await asyncio.gather(*extractors)
+        await store_queue.put(None)
+        await asyncio.gather(coalescer, *storers)
+
+    if store_stats['requests']:
+        print(f"\nStore requests: {store_stats['requests']} "
+              f"({store_stats['unique']} unique triples, "
+              f"{store_stats['received'] - store_stats['unique']} duplicates coalesced, "
+              f"{store_stats['stored']} stored)")
+
+    return [results[index] for index in sorted(results)]
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extract triples from a directory of chunk files and store them in the graph database",
+        epilog="Example: python3 batch-process-chunks.py document_chunks/"
+    )
+    parser.add_argument('chunks_dir',
+                        help="Directory of .txt chunks or .jsonl shards, a single text or .jsonl file, "
+                             "or '-' to read JSONL records from stdin")
+    parser.add_argument('--chunk-size-kb', type=float, default=CHUNK_SIZE_KB_DEFAULT,
+                        help="Chunk size when splitting a single input file")
+    parser.add_argument('--overlap-kb', type=float, default=0,
+                        help="Overlap between consecutive chunks when splitting a single input file")
+    parser.add_argument('--tokenizer', type=str, default=None,
+                        help="Local tokenizer directory of the extraction model; packs streamed chunks by exact token count")
+    parser.add_argument('--max-tokens', type=int, default=None,
+                        help="Token budget per streamed chunk (default with --tokenizer: model context minus --reserve-tokens)")
+    parser.add_argument('--overlap-tokens', type=int, default=0,
+                        help="Tokens of overlap between streamed chunks when packing by tokens")
+    parser.add_argument('--reserve-tokens', type=int, default=RESERVE_TOKENS_DEFAULT,
+                        help="Tokens left free for the extraction prompt and output")
+    parser.add_argument('--extract-timeout', type=float, default=EXTRACT_TIMEOUT,
+                        help="Timeout in seconds for each extraction request")
+    parser.add_argument('--api-url', type=str, default=API_BASE_URL,
+                        help="Base URL of the txt2kg API (or scripts/mock_ingest_server.py)")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Use the concurrent aiohttp pipeline instead of serial processing")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY_DEFAULT,
+                        help="Maximum in-flight extraction requests in async mode")
+    parser.add_argument('--store-concurrency', type=int, default=STORE_CONCURRENCY_DEFAULT,
+                        help="Maximum in-flight store requests in async mode")
+    parser.add_argument('--store-batch-size', type=int, default=STORE_BATCH_SIZE_DEFAULT,
+                        help="Unique triples coalesced into one store request in async mode")
+    parser.add_argument('--store-flush-interval', type=float, default=STORE_FLUSH_INTERVAL_DEFAULT,
+                        help="Seconds before a partially filled store batch is flushed in async mode")
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES_DEFAULT,
+                        help="Retries per request on 429/5xx responses in async mode")
+    parser.add_argument('--delay', type=float, default=1.0,
+                        help="Seconds to sleep between chunks in serial mode")
+    parser.add_argument('--dedup', action='store_true',
+                        help="Extract only one representative per group of near-duplicate chunks (requires numpy)")
+    parser.add_argument('--dedup-threshold', type=float, default=0.9,
+                        help="Estimated Jaccard similarity above which chunks count as near-duplicates")
+    parser.add_argument('--metrics-json', type=str, default=None,
+                        help="Write per-stage latency/throughput metrics to this JSON file")
+    parser.add_argument('--metrics-prom', type=str, default=None,
+                        help="Write the same metrics in Prometheus text format (e.g. for the node_exporter textfile collector)")
+    parser.add_argument('--journal', type=str, default=None,
+                        help=f"Path of the resume journal (default: <chunks_dir>/{JOURNAL_FILE})")
+    parser.add_argument('--no-journal', action='store_true',
+                        help="Disable the resume journal and process every chunk")
+    return parser.parse_args()
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 batch-process-chunks.py <chunks_directory>")
-        print("Example: python3 batch-process-chunks.py document_chunks/")
-        sys.exit(1)
+    args = parse_args()
+    configure_api(args.api_url)
+    chunks_dir = args.chunks_dir
+    token_options = dict(max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens,
+                         tokenizer=args.tokenizer, reserve_tokens=args.reserve_tokens)
+    jsonl_files = None
 
-    chunks_dir = sys.argv[1]
+    if chunks_dir == '-' or (chunks_dir.endswith('.jsonl') and os.path.isfile(chunks_dir)):
+        jsonl_files = [chunks_dir]
+        journal_dir = os.getcwd() if chunks_dir == '-' else os.path.dirname(os.path.abspath(chunks_dir))
+    elif os.path.isfile(chunks_dir):
+        # Stream sentence-aligned chunks straight from a single large document
+        chunks = iter_document_chunks(chunks_dir, args.chunk_size_kb, args.overlap_kb, **token_options)
+        total = None
+        journal_dir = os.path.dirname(os.path.abspath(chunks_dir))
+    elif os.path.isdir(chunks_dir):
+        # Find all .txt files in the directory
+        chunk_files = sorted(glob.glob(os.path.join(chunks_dir, "*.txt")))
+        journal_dir = chunks_dir
 
-    if not os.path.isdir(chunks_dir):
+        if chunk_files:
+            chunks = iter_directory_chunks(chunk_files)
+            total = len(chunk_files)
+        else:
+            jsonl_files = sorted(glob.glob(os.path.join(chunks_dir, "*.jsonl")))
+            if not jsonl_files:
+                print(f"Error: No .txt or .jsonl files found in '{chunks_dir}'")
+                sys.exit(1)
+    else:
         print(f"Error: Directory '{chunks_dir}' not found")
         sys.exit(1)
 
-    # Find all .txt files in the directory
-    chunk_files = sorted(glob.glob(os.path.join(chunks_dir, "*.txt")))
+    if jsonl_files:
+        chunks = iter_jsonl_chunks(jsonl_files, args.chunk_size_kb, args.overlap_kb, **token_options)
+        total = None
 
-    if not chunk_files:
-        print(f"Error: No .txt files found in '{chunks_dir}'")
+    if args.use_async and not HAS_AIOHTTP:
+        print("Error: --async requires aiohttp (pip install aiohttp)")
         sys.exit(1)
 
     print("\n" + "="*60)
     print("txt2kg Batch Processor")
     print("="*60)
-    print(f"Chunks directory: {chunks_dir}")
-    print(f"Total chunks: {len(chunk_files)}")
+    if total is None:
+        if args.tokenizer or args.max_tokens:
+            budget = f"{args.max_tokens or 'context-sized'} token"
+        else:
+            budget = f"{args.chunk_size_kb:g} KB"
+        source = "JSONL records" if jsonl_files else "Input document"
+        print(f"{source}: {'stdin' if chunks_dir == '-' else chunks_dir} (streaming {budget} chunks)")
+    else:
+        print(f"Chunks directory: {chunks_dir}")
+        print(f"Total chunks: {total}")
     print(f"API endpoint: {API_BASE_URL}")
+    if args.use_async:
+        print(f"Mode: async (concurrency {args.concurrency}, store concurrency {args.store_concurrency})")
+    else:
+        print("Mode: serial")
+    journal = None
+    if not args.no_journal:
+        journal = IngestJournal(args.journal or os.path.join(journal_dir, JOURNAL_FILE))
+        print(f"Journal: {journal.path}")
     print("="*60)
 
-    # Process each chunk
-    results = []
-    total_triples = 0
-    total_stored = 0
-    total_time = 0
+    dedup = None
+    if args.dedup:
+        from chunk_dedup import NearDuplicateIndex
+        dedup = NearDuplicateIndex(threshold=args.dedup_threshold)
+        print(f"Near-duplicate detection: Jaccard >= {args.dedup_threshold}")
+
+    metrics = IngestMetrics()
+    chunks = timed_chunks(chunks, metrics)
 
-    for i, chunk_file in enumerate(chunk_files, 1):
-        print(f"\n[{i}/{len(chunk_files)}]", end=" ")
-        result = process_chunk(chunk_file)
-        results.append(result)
+    wall_start = time.time()
+    if args.use_async:
+        results = asyncio.run(run_pipeline(
+            chunks, args.concurrency, args.store_concurrency, args.max_retries,
+            journal=journal, store_batch_size=args.store_batch_size,
+            store_flush_interval=args.store_flush_interval, total=total,
+            extract_timeout=args.extract_timeout, metrics=metrics, dedup=dedup
+        ))
+    else:
+        results = []
+        group_triples = {}  # representative digest -> triples, only needed without a journal
+        for i, (name, text) in enumerate(chunks, 1):
+            print(f"\n[{i}/{total}]" if total else f"\n[{i}]", end=" ")
+            digest = chunk_digest(text)
+            shared_triples = None
+            on_triples = None
+            if dedup:
+                representative = dedup.assign(digest, text)
+                if representative is None and journal is None:
+                    on_triples = lambda triples, d=digest: group_triples.__setitem__(d, triples)
+                elif representative is not None:
+                    if journal:
+                        entry = journal.lookup(representative)
+                        shared_triples = entry['triples'] if entry else None
+                    else:
+                        shared_triples = group_triples.get(representative)
+            result = process_chunk(name, text, journal=journal, extract_timeout=args.extract_timeout,
+                                   metrics=metrics, shared_triples=shared_triples, on_triples=on_triples)
+            results.append(result)
+            metrics.record_chunk(result)
+            if result.get('skipped'):
+                continue
 
-        if result['success']:
-            total_triples += result['triples']
-            total_stored += result['stored']
-            total_time += result.get('time', 0)
+            # Small delay between chunks to avoid overwhelming the API
+            if i != total and args.delay > 0:
+                time.sleep(args.delay)
+    wall_time = time.time() - wall_start
+    if journal:
+        journal.close()
 
-        # Small delay between chunks to avoid overwhelming the API
-        if i < len(chunk_files):
-            time.sleep(1)
+    total_triples = sum(r['triples'] for r in results if r['success'])
+    total_stored = sum(r['stored'] for r in results if r['success'])
+    total_time = sum(r.get('time', 0) for r in results if r['success'])
 
     # Summary
     print("\n" + "="*60)
     print("PROCESSING SUMMARY")
     print("="*60)
-    print(f"Total chunks processed: {len(chunk_files)}")
+    print(f"Total chunks processed: {len(results)}")
     print(f"Successful: {sum(1 for r in results if r['success'])}")
+    print(f"Skipped (already in journal): {sum(1 for r in results if r.get('skipped'))}")
+    if dedup:
+        print(f"Near-duplicates (extraction skipped): {sum(1 for r in results if r.get('deduplicated'))} "
+              f"in {dedup.groups} groups")
     print(f"Failed: {sum(1 for r in results if not r['success'])}")
     print(f"Total triples extracted: {total_triples}")
     print(f"Total triples stored: {total_stored}")
     print(f"Total processing time: {total_time:.1f}s ({total_time/60:.1f} minutes)")
+    print(f"Wall-clock time: {wall_time:.1f}s ({wall_time/60:.1f} minutes)")
     if total_triples > 0:
         print(f"Average time per triple: {total_time/total_triples:.2f}s")
+
+    report = metrics.report(wall_time)
+    throughput = report['throughput']
+    print(f"Throughput: {throughput['chunks_per_s']:.2f} chunks/s, "
+          f"{throughput['triples_per_s']:.2f} triples/s, "
+          f"{throughput['bytes_per_s'] / 1024:.1f} KB/s")
+    for stage, stats in report['stages'].items():
+        if not stats['count'] and not stats['errors']:
+            continue
+        errors = ', '.join(f"{k}={v}" for k, v in stats['errors'].items()) or 'none'
+        print(f"  {stage:<8} n={stats['count']:<6} p50={stats['p50_s']:.3f}s "
+              f"p95={stats['p95_s']:.3f}s p99={stats['p99_s']:.3f}s errors: {errors}")
+    if args.metrics_json:
+        with open(args.metrics_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Metrics written to {args.metrics_json}")
+    if args.metrics_prom:
+        with open(args.metrics_prom, 'w', encoding='utf-8') as f:
+            f.write(format_prometheus(report))
+        print(f"Prometheus metrics written to {args.metrics_prom}")
     print("="*60)
     print("\n✅ Batch processing complete!")
     print("\nNext steps:")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate chunk detection for txt2kg ingest (MinHash + LSH)
+
+Corpora such as the bioRxiv dumps contain many near-identical abstracts and
+boilerplate sections, and each one would otherwise cost an LLM extraction
+call. NearDuplicateIndex groups chunks whose estimated Jaccard similarity
+(over word shingles) is above a threshold: the first chunk of a group becomes
+its representative and is the only one sent for extraction, and later members
+reuse the representative's triples under their own document names.
+
+Chunks are assigned online, one at a time, so the index works on streamed
+input. Memory grows with the number of distinct groups (one signature each),
+not with the size of the corpus text.
+
+Standalone use reports the duplicate groups in a directory of chunks:
+
+    python3 chunk_dedup.py biorxiv_genetics_genomics/ --threshold 0.85
+"""
+
+import os
+import re
+import sys
+import glob
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+
+THRESHOLD_DEFAULT = 0.9
+NUM_PERM_DEFAULT = 128
+SHINGLE_SIZE_DEFAULT = 5
+SEED_DEFAULT = 1
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+HASH_BLOCK = 8192  # shingles hashed per vectorized step, bounds temporary memory
+WORD = re.compile(r'\w+')
+
+def shingles(text, size=SHINGLE_SIZE_DEFAULT):
+    """Set of word n-grams of a lower-cased text"""
+    words = WORD.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def lsh_bands(threshold, num_perm):
+    """
+    Choose (bands, rows) with bands * rows == num_perm whose S-curve midpoint
+    (1/bands) ** (1/rows) is closest to the similarity threshold.
+    """
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+class MinHasher:
+    """MinHash signatures using universal hashing of 32-bit shingle hashes"""
+
+    def __init__(self, num_perm=NUM_PERM_DEFAULT, seed=SEED_DEFAULT):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, int(MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(MERSENNE_PRIME), num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+             for s in shingle_set),
+            dtype=np.uint64, count=len(shingle_set)
+        )
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), HASH_BLOCK):
+            block = hashes[start:start + HASH_BLOCK]
+            permuted = ((np.outer(self.a, block) + self.b[:, None]) % MERSENNE_PRIME) & MAX_HASH
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+class NearDuplicateIndex:
+    """
+    Online MinHash-LSH index that maps each chunk to a duplicate group.
+
+    assign() returns None when the chunk starts a new group (it is the
+    representative and should be extracted), or the key of the group's
+    representative when it is a near-duplicate of an earlier chunk.
+    Safe to call from several threads.
+    """
+
+    def __init__(self, threshold=THRESHOLD_DEFAULT, num_perm=NUM_PERM_DEFAULT,
+                 shingle_size=SHINGLE_SIZE_DEFAULT, seed=SEED_DEFAULT):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self.buckets = [dict() for _ in range(self.bands)]
+        self.signatures = {}
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def assign(self, key, text):
+        signature = self.hasher.signature(shingles(text, self.shingle_size))
+        with self._lock:
+            best_key, best_similarity = None, self.threshold
+            for band, band_key in self._band_keys(signature):
+                for candidate in self.buckets[band].get(band_key, ()):
+                    similarity = float(np.mean(self.signatures[candidate] == signature))
+                    if similarity >= best_similarity:
+                        best_key, best_similarity = candidate, similarity
+            if best_key is not None:
+                self.duplicates += 1
+                return best_key
+
+            self.signatures[key] = signature
+            for band, band_key in self._band_keys(signature):
+                self.buckets[band].setdefault(band_key, []).append(key)
+            return None
+
+    @property
+    def groups(self):
+        return len(self.signatures)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report near-duplicate chunks in a directory of .txt files")
+    parser.add_argument('chunks_dir', help="Directory containing .txt chunk files")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD_DEFAULT,
+                        help="Estimated Jaccard similarity above which chunks are grouped")
+    parser.add_argument('--num-perm', type=int, default=NUM_PERM_DEFAULT, help="MinHash permutations")
+    parser.add_argument('--shingle-size', type=int, default=SHINGLE_SIZE_DEFAULT, help="Words per shingle")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    chunk_files = sorted(glob.glob(os.path.join(args.chunks_dir, "*.txt")))
+    if not chunk_files:
+        print(f"Error: No .txt files found in '{args.chunks_dir}'")
+        sys.exit(1)
+
+    index = NearDuplicateIndex(args.threshold, args.num_perm, args.shingle_size)
+    members = {}
+    for chunk_file in chunk_files:
+        with open(chunk_file, 'r', encoding='utf-8') as f:
+            name = os.path.basename(chunk_file)
+            representative = index.assign(name, f.read())
+        if representative is not None:
+            members.setdefault(representative, []).append(name)
+
+    print(f"Chunks: {len(chunk_files)}")
+    print(f"Groups: {index.groups} (LSH {index.bands} bands x {index.rows} rows)")
+    print(f"Near-duplicates: {index.duplicates} ({index.duplicates / len(chunk_files) * 100:.1f}% of extraction calls saved)")
+    for representative, names in sorted(members.items(), key=lambda kv: -len(kv[1]))[:20]:
+        print(f"  {representative}: {len(names)} duplicate(s), e.g. {', '.join(names[:3])}")
+
+if __name__ == "__main__":
+    main()
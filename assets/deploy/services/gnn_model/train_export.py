@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import argparse
 import torch
 from torch_geometric import seed_everything
 from torch_geometric.loader import DataLoader
 from torch_geometric.nn import GAT, LLM, GRetriever
 
+# preprocess_data.py writes the dataset as a sharded subgraph store by default
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "..", "..", "scripts", "gnn"))
+from subgraph_store import is_data_store, load_data_lists, store_path
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Train and export GNN model for service')
     parser.add_argument('--dataset_file', type=str, default='tech_qa.pt', help='Path to load dataset')
@@ -26,12 +32,19 @@ def parse_args():
 def load_dataset(dataset_path):
     """
     Load preprocessed dataset from file
+
+    Opens the sharded store next to `dataset_path` when there is one
+    (tech_qa.pt -> tech_qa.shards), else unpickles the single-file dataset.
     """
-    if not os.path.exists(dataset_path):
-        raise FileNotFoundError(f"Dataset file not found at {dataset_path}. Please run preprocess_data.py first.")
-    
-    print(f"Loading dataset from {dataset_path}...")
-    data_lists = torch.load(dataset_path, weights_only=False)
+    if is_data_store(store_path(dataset_path)):
+        print(f"Opening sharded dataset {store_path(dataset_path)}...")
+        data_lists = load_data_lists(store_path(dataset_path))
+    elif os.path.exists(dataset_path):
+        print(f"Loading dataset from {dataset_path}...")
+        data_lists = torch.load(dataset_path, weights_only=False)
+    else:
+        raise FileNotFoundError(f"Dataset not found at {store_path(dataset_path)} or {dataset_path}. "
+                                "Please run preprocess_data.py first.")
     print("Dataset loaded successfully!")
     print(f"Train set size: {len(data_lists['train'])}")
     print(f"Validation set size: {len(data_lists['validation'])}")
@@ -1,31 +1,40 @@
-from flask import Flask, request, jsonify
-from sentence_transformers import SentenceTransformer
+from flask import Flask, Response, request, jsonify
 import os
 import time
-import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from embedding_service import batcher, encode_texts, health_status, logger, model_name, readiness_status
+from response_formats import JSON, DTYPES, encode_binary, negotiate
 
 app = Flask(__name__)
 
-# Get model name from environment variable
-model_name = os.environ.get("MODEL_NAME", "all-MiniLM-L6-v2")
-logger.info(f"Loading model: {model_name}")
-
-# Load model during startup
-start_time = time.time()
-try:
-    model = SentenceTransformer(model_name)
-    logger.info(f"Model loaded in {time.time() - start_time:.2f} seconds")
-except Exception as e:
-    logger.error(f"Failed to load model: {e}")
-    raise
+def binary_response(embeddings, mimetype, dtype, processing_time):
+    """Embeddings in a negotiated binary format"""
+    chunks, mimetype = encode_binary(embeddings, mimetype, dtype)
+    # WSGI servers (gunicorn, werkzeug) only write bytes, not memoryviews
+    body = b"".join(chunks)
+    response = Response(body, mimetype=mimetype)
+    response.headers["Content-Length"] = str(len(body))
+    response.headers["X-Model"] = model_name
+    response.headers["X-Processing-Time"] = f"{processing_time:.6f}"
+    response.headers["Vary"] = "Accept"
+    return response
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "healthy", "model": model_name})
+    return jsonify(health_status())
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """200 once the model is warmed up, 503 before; /health is for liveness"""
+    status = readiness_status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Queue depth and batch size histograms of the micro-batcher"""
+    if batcher is None:
+        return jsonify({"batching": None})
+    return jsonify({"batching": batcher.stats()})
 
 @app.route("/embed", methods=["POST"])
 def embed():
@@ -37,16 +46,25 @@ def embed():
         texts = data.get("texts", [])
         if not texts:
             return jsonify({"error": "No texts provided"}), 400
+        
+        # JSON unless the Accept header asks for a binary format
+        response_format = negotiate(request.headers.get("Accept"))
+        dtype = data.get("dtype", "float32")
+        if response_format != JSON and dtype not in DTYPES:
+            return jsonify({"error": f"Unsupported dtype '{dtype}'; expected one of {', '.join(DTYPES)}"}), 400
             
         # Process in batches if needed
         batch_size = data.get("batch_size", 32)
         
         start_time = time.time()
-        embeddings = model.encode(texts, batch_size=batch_size).tolist()
+        embeddings = encode_texts(texts, batch_size)
         processing_time = time.time() - start_time
         
         logger.info(f"Processed {len(texts)} texts in {processing_time:.2f} seconds")
         
+        if response_format != JSON:
+            return binary_response(embeddings, response_format, dtype, processing_time)
+        embeddings = embeddings.tolist()
         return jsonify({
             "embeddings": embeddings,
             "model": model_name,
@@ -67,13 +85,24 @@ def embeddings():
         texts = data.get("input", [])
         if not texts:
             return jsonify({"error": "No input texts provided"}), 400
+        
+        # JSON unless the Accept header asks for a binary format
+        response_format = negotiate(request.headers.get("Accept"))
+        dtype = data.get("dtype", "float32")
+        if response_format != JSON and dtype not in DTYPES:
+            return jsonify({"error": f"Unsupported dtype '{dtype}'; expected one of {', '.join(DTYPES)}"}), 400
             
         batch_size = data.get("batch_size", 32)
         
         start_time = time.time()
-        embeddings = model.encode(texts, batch_size=batch_size).tolist()
+        embeddings = encode_texts(texts, batch_size)
         processing_time = time.time() - start_time
         
+        if response_format != JSON:
+            logger.info(f"Processed {len(texts)} texts in {processing_time:.2f} seconds for /embeddings endpoint")
+            return binary_response(embeddings, response_format, dtype, processing_time)
+        embeddings = embeddings.tolist()
+        
         # Format response for compatibility with the EmbeddingsService
         response_data = {
             "data": [{"embedding": embedding} for embedding in embeddings],
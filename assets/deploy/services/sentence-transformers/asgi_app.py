@@ -0,0 +1,205 @@
+"""
+ASGI (FastAPI/uvicorn) variant of the sentence-transformers service.
+
+Same /embed, /embeddings and /health contracts as app.py, served from an
+event loop: inference and response encoding run in a bounded thread pool, so
+a slow request never blocks the others. Requests beyond MAX_QUEUED_REQUESTS
+are refused with 429, each request has a deadline (REQUEST_TIMEOUT_S, or a
+shorter "timeout" in the body) after which it gets 504, and on shutdown new
+requests get 503 while admitted ones finish.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 80
+"""
+
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+import uvicorn
+
+from embedding_service import batcher, cache, encode_texts, health_status, logger, model_name, readiness_status
+from response_formats import JSON, DTYPES, encode_binary, negotiate
+
+# Threads running inference; with micro-batching most of them wait on the shared batch
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 32))
+# Requests admitted at once (running or waiting for a thread) before 429
+MAX_QUEUED_REQUESTS = int(os.environ.get("MAX_QUEUED_REQUESTS", 256))
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT_S", 30))
+SHUTDOWN_TIMEOUT = float(os.environ.get("SHUTDOWN_TIMEOUT_S", 30))
+
+class Admission:
+    """Admitted-request count and the reasons requests were turned away"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.draining = False
+
+    def stats(self):
+        return {
+            "active_requests": self.active,
+            "max_queued_requests": self.limit,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "draining": self.draining,
+        }
+
+admission = Admission(MAX_QUEUED_REQUESTS)
+executor = None
+
+def release():
+    admission.active -= 1
+
+@asynccontextmanager
+async def lifespan(app):
+    global executor
+    executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    logger.info(f"Inference pool: {INFERENCE_WORKERS} threads, up to {MAX_QUEUED_REQUESTS} queued requests")
+    yield
+    # Refuse new requests and give admitted ones until the timeout to finish
+    admission.draining = True
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    while admission.active and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if admission.active:
+        logger.warning(f"Shutting down with {admission.active} requests still running")
+    executor.shutdown(wait=False, cancel_futures=True)
+    if cache is not None:
+        cache.close()
+
+app = FastAPI(title="Sentence Transformers Embedding Service", lifespan=lifespan)
+
+def error(message, status_code, headers=None):
+    return JSONResponse({"error": message}, status_code=status_code, headers=headers)
+
+def render(embeddings, response_format, dtype, processing_time, json_body):
+    """Response body and media type; run in the pool since JSON float formatting is slow"""
+    if response_format != JSON:
+        chunks, mimetype = encode_binary(embeddings, response_format, dtype)
+        # ASGI bodies are bytes, so the buffer is copied once here
+        return b"".join(chunks), mimetype
+    return json.dumps(json_body(embeddings.tolist(), processing_time)).encode("utf-8"), JSON
+
+async def handle_embedding_request(request, texts_key, missing_texts_error, json_body, endpoint):
+    """Admission, parsing, deadline and response negotiation shared by /embed and /embeddings"""
+    if admission.draining:
+        return error("Service is shutting down", 503)
+    if admission.active >= admission.limit:
+        admission.rejected += 1
+        return error("Too many queued requests", 429, headers={"Retry-After": "1"})
+    admission.active += 1
+    loop = asyncio.get_running_loop()
+    future = None
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not data:
+            return error("No JSON data provided", 400)
+
+        texts = data.get(texts_key, [])
+        if not texts:
+            return error(missing_texts_error, 400)
+
+        batch_size = data.get("batch_size", 32)
+        # JSON unless the Accept header asks for a binary format
+        response_format = negotiate(request.headers.get("accept"))
+        dtype = data.get("dtype", "float32")
+        if response_format != JSON and dtype not in DTYPES:
+            return error(f"Unsupported dtype '{dtype}'; expected one of {', '.join(DTYPES)}", 400)
+        try:
+            timeout = float(data["timeout"] if data.get("timeout") is not None else REQUEST_TIMEOUT)
+        except (TypeError, ValueError):
+            timeout = None
+        if timeout is None or not timeout > 0:
+            return error("'timeout' must be a positive number of seconds", 400)
+        timeout = min(timeout, REQUEST_TIMEOUT)
+        deadline = time.monotonic() + timeout
+
+        def job():
+            if time.monotonic() > deadline:
+                raise TimeoutError("Deadline passed before inference started")
+            start_time = time.time()
+            embeddings = encode_texts(texts, batch_size)
+            processing_time = time.time() - start_time
+            logger.info(f"Processed {len(texts)} texts in {processing_time:.2f} seconds for {endpoint} endpoint")
+            return render(embeddings, response_format, dtype, processing_time, json_body) + (processing_time,)
+
+        # A job that outlives its deadline keeps its thread busy, so the
+        # admission slot is released when the job itself ends, not the request
+        future = executor.submit(job)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+        try:
+            body, media_type, processing_time = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            admission.timed_out += 1
+            return error(f"Request did not complete within {timeout:g} seconds", 504)
+
+        headers = {"Vary": "Accept"}
+        if media_type != JSON:
+            headers.update({"X-Model": model_name, "X-Processing-Time": f"{processing_time:.6f}"})
+        return Response(body, media_type=media_type, headers=headers)
+    except Exception as e:
+        logger.error(f"Error generating embeddings: {e}")
+        return error(str(e), 500)
+    finally:
+        if future is None:
+            release()
+
+@app.get("/health")
+async def health():
+    status = health_status()
+    status["admission"] = admission.stats()
+    if admission.draining:
+        status["status"] = "draining"
+        return JSONResponse(status, status_code=503)
+    return status
+
+@app.get("/ready")
+async def ready():
+    """200 once the model is warmed up and the service is not draining, 503 otherwise"""
+    status = readiness_status()
+    status["ready"] = status["ready"] and not admission.draining
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Admission counters, and queue depth and batch size histograms of the micro-batcher"""
+    return {"admission": admission.stats(), "batching": batcher.stats() if batcher is not None else None}
+
+@app.post("/embed")
+async def embed(request: Request):
+    return await handle_embedding_request(
+        request, "texts", "No texts provided",
+        lambda embeddings, processing_time: {
+            "embeddings": embeddings,
+            "model": model_name,
+            "processing_time": processing_time
+        },
+        "/embed"
+    )
+
+# Compatibility with the EmbeddingsService class
+@app.post("/embeddings")
+async def embeddings(request: Request):
+    return await handle_embedding_request(
+        request, "input", "No input texts provided",
+        lambda embeddings, processing_time: {
+            "data": [{"embedding": embedding} for embedding in embeddings],
+            "model": model_name,
+            "processing_time": processing_time
+        },
+        "/embeddings"
+    )
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 80)),
+                timeout_graceful_shutdown=int(SHUTDOWN_TIMEOUT))
@@ -0,0 +1,133 @@
+"""
+Cross-request micro-batching for the embedding model.
+
+Request threads hand their texts to a MicroBatcher and wait; one worker
+thread collects queued texts from all requests and calls the model once per
+micro-batch, flushing when `max_batch_size` texts are queued or the oldest
+queued text has waited `max_wait` seconds. Each request gets back its own
+rows, in order, even when its texts were split across micro-batches.
+
+    batcher = MicroBatcher(lambda texts: model.encode(texts, batch_size=64))
+    embeddings = batcher.encode(texts)  # blocks until every text is embedded
+"""
+
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+MAX_BATCH_SIZE_DEFAULT = 64
+MAX_WAIT_DEFAULT = 0.005  # seconds
+
+class _Pending:
+    """One caller's texts and the rows filled in for them so far"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.embeddings = None
+        self.remaining = len(texts)
+        self.error = None
+        self.done = threading.Event()
+
+def _bucket(size):
+    """Power-of-two histogram bucket label: 1, 2, 4, ... (a bucket holds sizes up to its label)"""
+    return str(1 << max(0, size - 1).bit_length())
+
+class MicroBatcher:
+    """
+    Queues texts from concurrent callers and encodes them in shared batches.
+
+    Args:
+        encode: Function from a list of texts to a 2-D array of embeddings
+        max_batch_size: Texts per call to `encode`
+        max_wait: Seconds the oldest queued text may wait for a batch to fill
+
+    Thread-safe; the worker thread is started on first use.
+    """
+
+    def __init__(self, encode, max_batch_size=MAX_BATCH_SIZE_DEFAULT, max_wait=MAX_WAIT_DEFAULT):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = deque()  # (pending, position, enqueue time), one entry per text
+        self._cond = threading.Condition()
+        self._worker = None
+        self.batches = 0
+        self.texts = 0
+        self.full_flushes = 0
+        self.batch_sizes = {}  # histogram bucket -> batches
+        self.queue_depths = {}  # histogram bucket -> batches, queue length when the batch was taken
+
+    def encode(self, texts):
+        """Embeddings for `texts` as a float32 array; raises what the model raised"""
+        texts = list(texts)
+        pending = _Pending(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        now = time.monotonic()
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+            self._queue.extend((pending, position, now) for position in range(len(texts)))
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.embeddings
+
+    def _take(self):
+        """Block until a batch is due, then remove and return it"""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            depth = len(self._queue)
+            batch = [self._queue.popleft() for _ in range(min(depth, self.max_batch_size))]
+            self.batches += 1
+            self.texts += len(batch)
+            self.full_flushes += len(batch) == self.max_batch_size
+            self.batch_sizes[_bucket(len(batch))] = self.batch_sizes.get(_bucket(len(batch)), 0) + 1
+            self.queue_depths[_bucket(depth)] = self.queue_depths.get(_bucket(depth), 0) + 1
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            try:
+                embeddings = np.asarray(self._encode([pending.texts[position] for pending, position, _ in batch]),
+                                        dtype=np.float32)
+            except Exception as e:
+                for pending, _, _ in batch:
+                    pending.error = e
+                    pending.remaining -= 1
+                    if pending.remaining == 0:
+                        pending.done.set()
+                continue
+            for row, (pending, position, _) in zip(embeddings, batch):
+                if pending.embeddings is None:
+                    pending.embeddings = np.empty((len(pending.texts), embeddings.shape[1]), dtype=np.float32)
+                pending.embeddings[position] = row
+                pending.remaining -= 1
+                if pending.remaining == 0:
+                    pending.done.set()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "texts": self.texts,
+                "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+                "full_batches": self.full_flushes,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items(), key=lambda item: int(item[0]))),
+                "queue_depth_histogram": dict(sorted(self.queue_depths.items(), key=lambda item: int(item[0]))),
+            }
@@ -0,0 +1,218 @@
+"""
+Content-addressed on-disk cache for sentence embeddings.
+
+Embeddings are keyed by (model name, normalized text) and stored in a
+memory-mapped array of fixed-size rows, with a SQLite index mapping each
+key to its row and last use. When the cache is full, the least recently used
+rows are overwritten. One cache directory can hold several models; each gets
+its own array because their dimensions differ.
+
+Used by the sentence-transformers service (EMBEDDING_CACHE_DIR) and by
+scripts/gnn/preprocess_data.py:
+
+    cache = EmbeddingCache("embedding_cache", "all-MiniLM-L6-v2")
+    vectors = cache.encode(texts, lambda missing: model.encode(missing))
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+import numpy as np
+
+MAX_ENTRIES_DEFAULT = 1_000_000
+DTYPES = {"float32": np.float32, "float16": np.float16}
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text):
+    """Unicode NFC with whitespace runs collapsed, so trivially different copies share an entry"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).digest()[:16]
+
+class EmbeddingCache:
+    """
+    LRU embedding cache for one model, persisted under `root`.
+
+    Args:
+        root: Cache directory, shared between models
+        model_name: Name of the embedding model; part of every key
+        max_entries: Rows kept before least recently used ones are evicted
+        dtype: Storage type, "float32" or "float16" (returned as float32)
+
+    Thread-safe within a process.
+    """
+
+    def __init__(self, root, model_name, max_entries=MAX_ENTRIES_DEFAULT, dtype="float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported cache dtype '{dtype}'; expected one of {', '.join(DTYPES)}")
+        self.model_name = model_name
+        self.directory = os.path.join(root, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.bin")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                row INTEGER NOT NULL,
+                last_used INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT name, value FROM meta"))
+        # An existing cache keeps its storage type; capacity only ever grows
+        self.dtype = np.dtype(meta.get("dtype", dtype))
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self.capacity = max(int(meta.get("capacity", 0)), max_entries)
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM entries").fetchone()[0]
+        self._vectors = None
+        if self.dim is not None:
+            self._open_vectors()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _open_vectors(self):
+        size = self.capacity * self.dim * self.dtype.itemsize
+        with open(self.vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)  # sparse on most filesystems
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r+",
+                                  shape=(self.capacity, self.dim))
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", [
+                ("dim", str(self.dim)), ("dtype", self.dtype.name), ("capacity", str(self.capacity)),
+            ])
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def _rows(self, keys):
+        rows = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            query = f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+            rows.update(self._conn.execute(query, batch))
+        return rows
+
+    def get_many(self, texts):
+        """
+        Look up `texts`.
+
+        Returns:
+            (embeddings, missing) where embeddings is a float32 array with a
+            row per text (zeros where missing, or None if nothing is cached
+            yet) and missing lists the indices of texts not in the cache
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        with self._lock:
+            if self._vectors is None:
+                self.misses += len(texts)
+                return None, list(range(len(texts)))
+            rows = self._rows(keys)
+            found = [i for i, key in enumerate(keys) if key in rows]
+            missing = [i for i, key in enumerate(keys) if key not in rows]
+            embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+            if found:
+                embeddings[found] = self._vectors[[rows[keys[i]] for i in found]]
+                tick = self._tick()
+                with self._conn:
+                    self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                           [(tick, keys[i]) for i in found])
+            self.hits += len(found)
+            self.misses += len(missing)
+        return embeddings, missing
+
+    def put_many(self, texts, embeddings):
+        """Store embeddings for `texts`, evicting least recently used rows if the cache is full"""
+        embeddings = np.asarray(embeddings)
+        if len(texts) == 0:
+            return
+        entries = dict(zip((cache_key(self.model_name, text) for text in texts), embeddings))
+        # More new entries than fit: only the last `capacity` of them are kept
+        keys = list(entries)[-self.capacity:]
+        with self._lock:
+            if self._vectors is None:
+                self.dim = embeddings.shape[1]
+                self._open_vectors()
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match "
+                                 f"cached dimension {self.dim} for {self.model_name}")
+
+            tick = self._tick()
+            with self._conn:
+                existing = self._rows(keys)
+                # Touch overwritten entries first so they cannot be evicted below
+                self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                       [(tick, key) for key in existing])
+                new_keys = [key for key in keys if key not in existing]
+                # Rows are always 0..used-1: fill unused rows first, then evict
+                used = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                rows = list(range(used, min(self.capacity, used + len(new_keys))))
+                needed = len(new_keys) - len(rows)
+                if needed > 0:
+                    evicted = self._conn.execute(
+                        "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (needed,)
+                    ).fetchall()
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                    rows.extend(row for _, row in evicted)
+                self._conn.executemany(
+                    "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                    [(key, row, tick) for key, row in zip(new_keys, rows)]
+                )
+            assignments = list(existing.items()) + list(zip(new_keys, rows))
+            order = np.argsort([row for _, row in assignments])
+            target_rows = np.array([row for _, row in assignments])[order]
+            values = np.stack([entries[key] for key, _ in assignments])[order]
+            self._vectors[target_rows] = values.astype(self.dtype)
+            self._vectors.flush()
+
+    def encode(self, texts, encode_missing):
+        """
+        Embeddings for `texts` as a float32 array, calling
+        `encode_missing(list_of_texts)` only for texts not in the cache
+        (each distinct text once) and caching its result.
+        """
+        texts = list(texts)
+        embeddings, missing = self.get_many(texts)
+        if not missing:
+            return embeddings
+        unique = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = np.asarray(encode_missing(unique), dtype=np.float32)
+        self.put_many(unique, encoded)
+        if embeddings is None:
+            embeddings = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+        positions = {text: i for i, text in enumerate(unique)}
+        embeddings[missing] = encoded[[positions[texts[i]] for i in missing]]
+        return embeddings
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._conn.close()
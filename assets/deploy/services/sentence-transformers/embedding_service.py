@@ -0,0 +1,164 @@
+"""
+Model, embedding cache and micro-batcher shared by the Flask service (app.py)
+and its ASGI variant (asgi_app.py). Importing this module loads the model and
+starts warming it up in the background; `ready` is set once warmup is done.
+Warmup is retried WARMUP_ATTEMPTS times, after which the process exits so
+that its supervisor (gunicorn, the container runtime) starts a fresh one.
+
+The model is read from MODEL_DIR/<MODEL_NAME> when present (the Docker image
+saves it there at build time), so startup does not touch the network.
+MODEL_BACKEND selects the CPU inference path:
+    torch  the model as published (default)
+    int8   Linear layers dynamically quantized to int8 (CPU only)
+"""
+
+from sentence_transformers import SentenceTransformer
+import os
+import time
+import logging
+import threading
+
+import torch
+
+from embedding_cache import EmbeddingCache, MAX_ENTRIES_DEFAULT
+from batcher import MicroBatcher, MAX_BATCH_SIZE_DEFAULT, MAX_WAIT_DEFAULT
+from length_batching import TOKEN_BUDGET_DEFAULT, encode_length_sorted
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_BACKENDS = ("torch", "int8")
+MODEL_DIR_DEFAULT = "models"
+WARMUP_LENGTHS = (8, 32, 128, 512)  # words per warmup text, capped by the model's max_seq_length
+WARMUP_ATTEMPTS_DEFAULT = 3
+
+def local_model_path(model_name, model_dir):
+    """Where the saved artifacts of `model_name` live (models/all-MiniLM-L6-v2)"""
+    return os.path.join(model_dir, model_name)
+
+def load_model(model_name, backend="torch", model_dir=MODEL_DIR_DEFAULT):
+    """SentenceTransformer for `backend`, from the local artifacts when they exist"""
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unsupported MODEL_BACKEND '{backend}'; expected one of {', '.join(MODEL_BACKENDS)}")
+    source = local_model_path(model_name, model_dir)
+    if not os.path.isdir(source):
+        logger.warning(f"No saved model under {source}, loading {model_name} from the Hugging Face Hub")
+        source = model_name
+    model = SentenceTransformer(source)
+    if backend == "int8":
+        if model.device.type != "cpu":
+            logger.warning(f"int8 quantization is CPU-only; keeping the fp32 model on {model.device}")
+            return model
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+# Get model name from environment variable
+model_name = os.environ.get("MODEL_NAME", "all-MiniLM-L6-v2")
+model_backend = os.environ.get("MODEL_BACKEND", "torch")
+logger.info(f"Loading model: {model_name} ({model_backend})")
+
+# Load model during startup
+start_time = time.time()
+try:
+    model = load_model(model_name, model_backend, os.environ.get("MODEL_DIR", MODEL_DIR_DEFAULT))
+    logger.info(f"Model loaded in {time.time() - start_time:.2f} seconds")
+except Exception as e:
+    logger.error(f"Failed to load model: {e}")
+    raise
+
+# Optional on-disk embedding cache, shared across restarts when the directory is a volume
+cache_dir = os.environ.get("EMBEDDING_CACHE_DIR", "")
+cache = None
+if cache_dir:
+    # Quantized backends give slightly different vectors, so they get their own entries
+    cache = EmbeddingCache(
+        cache_dir, model_name if model_backend == "torch" else f"{model_name}@{model_backend}",
+        max_entries=int(os.environ.get("EMBEDDING_CACHE_SIZE", MAX_ENTRIES_DEFAULT)),
+        dtype=os.environ.get("EMBEDDING_CACHE_DTYPE", "float32")
+    )
+    logger.info(f"Embedding cache: {cache.directory} ({len(cache)} entries)")
+
+# Padded tokens per model call; texts are sorted by length and batched within this budget
+token_budget = int(os.environ.get("TOKEN_BUDGET", TOKEN_BUDGET_DEFAULT))
+
+def encode_sorted(texts, max_batch_size):
+    """model.encode over length-sorted batches of at most `max_batch_size` texts and `token_budget` tokens"""
+    return encode_length_sorted(texts, lambda batch: model.encode(batch, batch_size=len(batch)), model.tokenizer,
+                                token_budget, max_batch_size, getattr(model, "max_seq_length", None))
+
+# Texts from concurrent requests are encoded together; BATCHING=0 encodes each request on its own
+batcher = None
+if os.environ.get("BATCHING", "1") != "0":
+    max_batch_size = int(os.environ.get("BATCH_MAX_SIZE", MAX_BATCH_SIZE_DEFAULT))
+    batcher = MicroBatcher(
+        lambda texts: encode_sorted(texts, max_batch_size),
+        max_batch_size=max_batch_size,
+        max_wait=float(os.environ.get("BATCH_MAX_WAIT_MS", MAX_WAIT_DEFAULT * 1000)) / 1000
+    )
+    logger.info(f"Micro-batching: up to {batcher.max_batch_size} texts, {batcher.max_wait * 1000:g} ms wait")
+
+def encode_texts(texts, batch_size):
+    """
+    Encode texts, through the embedding cache when one is configured and the
+    micro-batcher when enabled (which then sets the model batch size)
+    """
+    if batcher is not None:
+        encode = batcher.encode
+    else:
+        encode = lambda missing: encode_sorted(missing, batch_size)
+    if cache is None:
+        return encode(texts)
+    return cache.encode(texts, encode)
+
+def warmup():
+    """
+    Encode texts of representative lengths at batch size 1 and at the
+    micro-batch size, so kernel selection and allocator growth happen before
+    real traffic, then set `ready`. A process that cannot warm up would never
+    become ready, so after the last failed attempt it exits.
+    """
+    max_words = getattr(model, "max_seq_length", None) or max(WARMUP_LENGTHS)
+    lengths = [length for length in WARMUP_LENGTHS if length <= max_words] or [max_words]
+    batch_sizes = sorted({1, batcher.max_batch_size if batcher is not None else 32})
+    attempts = max(1, int(os.environ.get("WARMUP_ATTEMPTS", WARMUP_ATTEMPTS_DEFAULT)))
+    for attempt in range(1, attempts + 1):
+        start_time = time.time()
+        try:
+            for length in lengths:
+                for batch_size in batch_sizes:
+                    model.encode([" ".join(["warmup"] * length)] * batch_size, batch_size=batch_size)
+        except Exception as e:
+            logger.error(f"Warmup attempt {attempt}/{attempts} failed: {e}")
+            if attempt < attempts:
+                time.sleep(min(2 ** attempt, 30))
+        else:
+            readiness["warmup_time"] = time.time() - start_time
+            logger.info(f"Warmed up {len(lengths)} lengths x batch sizes {batch_sizes} "
+                        f"in {readiness['warmup_time']:.2f} seconds")
+            ready.set()
+            return
+    logger.critical(f"Warmup failed {attempts} times, exiting")
+    logging.shutdown()
+    os._exit(1)
+
+# Set once warmup has finished; /health answers before that, /ready does not
+ready = threading.Event()
+readiness = {"model": model_name, "backend": model_backend}
+if os.environ.get("WARMUP", "1") != "0":
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+else:
+    ready.set()
+
+def readiness_status():
+    """Body of the /ready response"""
+    return {"ready": ready.is_set(), **readiness}
+
+def health_status():
+    """Body of the /health response"""
+    status = {"status": "healthy", "model": model_name}
+    if cache is not None:
+        status["cache"] = cache.stats()
+    if batcher is not None:
+        status["batching"] = batcher.stats()
+    return status
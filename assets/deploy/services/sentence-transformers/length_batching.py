@@ -0,0 +1,71 @@
+"""
+Length-sorted, token-budgeted batching for sentence encoders.
+
+A fixed-count batch pads every text to its longest member, so one long
+document among short entity names multiplies the work of the whole batch and
+a batch of long documents can run out of memory. encode_length_sorted
+tokenizes the texts once to count tokens, sorts them longest first, cuts
+batches so that (texts in batch) x (longest text's tokens) stays within a
+token budget, and returns the embeddings in the caller's order.
+
+Used by the sentence-transformers service and by
+scripts/gnn/preprocess_data.py:
+
+    embeddings = encode_length_sorted(texts, lambda batch: model.encode(batch, batch_size=len(batch)),
+                                      model.tokenizer, max_length=model.max_seq_length)
+"""
+
+import numpy as np
+
+TOKEN_BUDGET_DEFAULT = 16384  # padded tokens per batch
+MAX_BATCH_SIZE_DEFAULT = 256
+
+def token_lengths(tokenizer, texts, max_length=None):
+    """Tokens per text, special tokens included, counting at most `max_length` (where the model truncates)"""
+    lengths = tokenizer(texts, truncation=max_length is not None, max_length=max_length, return_length=True,
+                        return_attention_mask=False, return_token_type_ids=False)["length"]
+    return np.asarray(lengths, dtype=np.int64).reshape(len(texts))
+
+def token_budget_batches(lengths, max_tokens=TOKEN_BUDGET_DEFAULT, max_batch_size=MAX_BATCH_SIZE_DEFAULT):
+    """
+    Index arrays of batches over `lengths`, longest first. Each batch is padded
+    to its first member, so its size times that length stays within
+    `max_tokens`; a text longer than the budget gets a batch of its own.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch_size, max_tokens // longest))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+def encode_length_sorted(texts, encode_batch, tokenizer, max_tokens=TOKEN_BUDGET_DEFAULT,
+                         max_batch_size=MAX_BATCH_SIZE_DEFAULT, max_length=None, progress=None):
+    """
+    Embeddings of `texts`, in order, computed over token-budgeted batches.
+
+    Args:
+        texts: List of strings
+        encode_batch: Encodes one batch (a list of strings) into a numpy
+            array or torch tensor with a row per string
+        tokenizer: Hugging Face tokenizer of the model, used to count tokens
+        max_tokens: Padded tokens per batch
+        max_batch_size: Texts per batch, however short
+        max_length: Tokens the model keeps per text
+        progress: Optional wrapper for the batch iterable, e.g. tqdm
+    """
+    texts = list(texts)
+    if not texts:
+        return encode_batch(texts)
+    batches = token_budget_batches(token_lengths(tokenizer, texts, max_length), max_tokens, max_batch_size)
+    parts = [encode_batch([texts[i] for i in batch]) for batch in (progress or iter)(batches)]
+    order = np.concatenate(batches)
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    if isinstance(parts[0], np.ndarray):
+        return np.concatenate(parts)[inverse]
+    import torch
+    return torch.cat(parts)[torch.from_numpy(inverse).to(parts[0].device)]
@@ -0,0 +1,99 @@
+"""
+Binary response formats for embeddings, chosen by content negotiation.
+
+JSON stays the default. A client that sends one of these Accept types gets
+the embedding matrix as bytes written straight from the numpy buffer:
+
+    application/octet-stream           16-byte header, then row-major little-endian values
+    application/x-npy                  a .npy file (numpy.load reads it)
+    application/vnd.apache.arrow.stream  Arrow IPC stream, one "embedding" column of
+                                         fixed-size lists (needs pyarrow)
+
+The octet-stream header is struct "<4sBBHII": magic b"EMBD", format version,
+dtype code (0 float32, 1 float16), reserved, rows, dimension. The request
+body's "dtype" field picks float32 (default) or float16 for binary formats.
+"""
+
+import struct
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON = "application/json"
+RAW = "application/octet-stream"
+NPY = "application/x-npy"
+ARROW = "application/vnd.apache.arrow.stream"
+
+RAW_MAGIC = b"EMBD"
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct("<4sBBHII")
+DTYPES = {"float32": (np.dtype("<f4"), 0), "float16": (np.dtype("<f2"), 1)}
+
+def _qualities(accept):
+    """{mimetype: quality} for the types an Accept header value names explicitly"""
+    qualities = {}
+    for item in (accept or "").split(","):
+        mimetype, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[mimetype.strip().lower()] = quality
+    return qualities
+
+def negotiate(accept):
+    """
+    Response format for an Accept header value: a binary format only when it
+    is named explicitly and ranked above JSON; wildcards and ties get JSON.
+    """
+    qualities = _qualities(accept)
+    offered = [RAW, NPY] + ([ARROW] if pa is not None else [])
+    best = max(offered, key=lambda mimetype: qualities.get(mimetype, 0.0))
+    return best if qualities.get(best, 0.0) > qualities.get(JSON, 0.0) else JSON
+
+def _npy_header(array):
+    """.npy format 1.0 header for a C-contiguous `array`, padded so the data starts 64-byte aligned"""
+    header = repr({"descr": np.lib.format.dtype_to_descr(array.dtype), "fortran_order": False,
+                   "shape": array.shape}).encode("latin1")
+    padding = 64 - (10 + len(header) + 1) % 64
+    header += b" " * padding + b"\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header
+
+def encode_binary(embeddings, mimetype, dtype="float32"):
+    """
+    (chunks, mimetype) for `embeddings` in a binary format; chunks are bytes
+    or byte views of the array's own buffer, with no per-value conversion.
+    Servers that only accept bytes need them joined (b"".join(chunks)).
+
+    Raises:
+        ValueError: For an unknown dtype
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}'; expected one of {', '.join(DTYPES)}")
+    np_dtype, code = DTYPES[dtype]
+    embeddings = np.ascontiguousarray(embeddings, dtype=np_dtype)
+    if embeddings.ndim != 2:
+        embeddings = embeddings.reshape(len(embeddings), -1)
+    data = memoryview(embeddings).cast("B")
+    if mimetype == RAW:
+        rows, dim = embeddings.shape
+        return [RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, code, 0, rows, dim), data], mimetype
+    if mimetype == NPY:
+        return [_npy_header(embeddings), data], mimetype
+    if mimetype == ARROW:
+        values = pa.array(embeddings.reshape(-1))  # zero-copy for a contiguous numeric array
+        column = pa.FixedSizeListArray.from_arrays(values, embeddings.shape[1])
+        batch = pa.record_batch([column], names=["embedding"])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return [memoryview(sink.getvalue())], mimetype
+    raise ValueError(f"Unsupported response format '{mimetype}'")
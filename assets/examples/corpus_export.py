@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Shared writers for the bioRxiv download examples.
+
+Papers are exported either as one .txt file per paper, written from a thread
+pool, or as JSONL records {"name": ..., "text": ...} in fixed-size shards.
+JSONL can also go to stdout ("-") and be piped straight into
+batch-process-chunks.py without touching the filesystem.
+"""
+
+import re
+import sys
+import json
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+FORMATS = ("txt", "jsonl")
+WORKERS_DEFAULT = 16
+SHARD_SIZE_DEFAULT = 10_000
+
+def sanitize_filename(text, max_length=100):
+    """Convert text to a safe filename."""
+    # Remove special characters and replace with underscores
+    filename = re.sub(r'[^\w\s-]', '', text)
+    filename = re.sub(r'[-\s]+', '_', filename)
+    filename = filename.strip('_')
+
+    # Truncate if too long
+    if len(filename) > max_length:
+        filename = filename[:max_length]
+
+    return filename
+
+def write_text_files(records, output_dir, workers=WORKERS_DEFAULT):
+    """
+    Write (filename, content) records as individual files from a thread pool.
+
+    At most a few records per worker are held in memory at a time, so
+    `records` can be a stream of any length. Returns the number written.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    slots = threading.BoundedSemaphore(workers * 4)
+    errors = []
+
+    def write(path, content):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        except OSError as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for filename, content in records:
+            if errors:
+                break
+            slots.acquire()
+            pool.submit(write, output_dir / filename, content)
+            count += 1
+    if errors:
+        raise errors[0]
+    return count
+
+def write_jsonl(records, output, shard_size=SHARD_SIZE_DEFAULT):
+    """
+    Write (name, text) records as JSONL: to stdout when `output` is "-",
+    otherwise to part-NNNNN.jsonl shards of `shard_size` records in `output`.
+    Returns the number written.
+    """
+    if output == "-":
+        count = 0
+        for count, (name, text) in enumerate(records, 1):
+            sys.stdout.write(json.dumps({"name": name, "text": text}) + "\n")
+        sys.stdout.flush()
+        return count
+
+    output_dir = Path(output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    shard = None
+    try:
+        for name, text in records:
+            if count % shard_size == 0:
+                if shard:
+                    shard.close()
+                shard = open(output_dir / f"part-{count // shard_size:05d}.jsonl", 'w', encoding='utf-8')
+            shard.write(json.dumps({"name": name, "text": text}) + "\n")
+            count += 1
+    finally:
+        if shard:
+            shard.close()
+    return count
+
+def export_records(records, output, fmt="txt", workers=WORKERS_DEFAULT, shard_size=SHARD_SIZE_DEFAULT):
+    """Export (filename, content) records in `fmt` ("txt" or "jsonl")"""
+    if fmt == "jsonl":
+        return write_jsonl(records, output, shard_size)
+    if output == "-":
+        raise ValueError("Only --format jsonl can be written to stdout")
+    return write_text_files(records, output, workers)
+
+def add_export_args(parser, default_output):
+    """Command-line options shared by the download examples"""
+    parser.add_argument("--output", type=str, default=default_output,
+                        help="Output directory, or '-' to write JSONL to stdout")
+    parser.add_argument("--format", choices=FORMATS, default="txt",
+                        help="One .txt file per paper, or sharded JSONL records")
+    parser.add_argument("--workers", type=int, default=WORKERS_DEFAULT,
+                        help="Threads writing .txt files")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE_DEFAULT,
+                        help="Records per JSONL shard")
+    parser.add_argument("--no-streaming", action="store_true",
+                        help="Download the full dataset and filter it with Arrow instead of streaming it")
+    parser.add_argument("--num-proc", type=int, default=None,
+                        help="Processes for Arrow filtering (with --no-streaming)")
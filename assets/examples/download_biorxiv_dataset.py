@@ -2,86 +2,102 @@
 """
 Download and process the MTEB raw_biorxiv dataset for txt2kg demo.
 Filter for genetics/genomics categories and create individual txt files.
+
+The dataset is streamed and filtered in batches, and papers are written as
+they arrive (see corpus_export.py), so category counts come from the same
+single pass. To skip the files and feed the batch processor directly:
+
+    python3 examples/download_biorxiv_dataset.py --format jsonl --output - | \\
+        python3 batch-process-chunks.py - --async
 """
 
-import os
 import re
-from pathlib import Path
+import sys
+import argparse
+from collections import Counter
+from functools import partial
 from datasets import load_dataset
 
-def sanitize_filename(text, max_length=100):
-    """Convert text to a safe filename."""
-    # Remove special characters and replace with underscores
-    filename = re.sub(r'[^\w\s-]', '', text)
-    filename = re.sub(r'[-\s]+', '_', filename)
-    filename = filename.strip('_')
-    
-    # Truncate if too long
-    if len(filename) > max_length:
-        filename = filename[:max_length]
-    
-    return filename
+from corpus_export import add_export_args, export_records, sanitize_filename
+
+CATEGORY_PATTERN = "genetic|genomic"
+CATEGORY_RE = re.compile(CATEGORY_PATTERN)
+FILTER_BATCH_SIZE = 10_000
+
+def genetics_genomics_mask(categories):
+    """Batched filter over the category column (a pyarrow array in Arrow format)"""
+    if hasattr(categories, 'to_pylist'):
+        import pyarrow.compute as pc
+        return pc.match_substring_regex(pc.utf8_lower(categories), CATEGORY_PATTERN).to_pylist()
+    return [CATEGORY_RE.search(category.lower()) is not None for category in categories]
+
+def paper_records(papers, category_counts):
+    """Yield (filename, content) for each paper, counting categories on the way"""
+    for i, item in enumerate(papers):
+        category_counts[item['category']] += 1
 
-def main():
-    print("Loading MTEB raw_biorxiv dataset...")
-    
-    # Load the dataset
-    ds = load_dataset("mteb/raw_biorxiv")
-    
-    # Get the train split
-    train_data = ds['train']
-    
-    print(f"Total dataset size: {len(train_data)} papers")
-    
-    # Filter for genetics or genomics categories
-    genetics_genomics_data = []
-    for item in train_data:
-        category = item['category'].lower()
-        if 'genetic' in category or 'genomic' in category:
-            genetics_genomics_data.append(item)
-    
-    print(f"Found {len(genetics_genomics_data)} papers with genetics/genomics categories")
-    
-    if len(genetics_genomics_data) == 0:
-        # Let's check what categories are available
-        categories = set(item['category'] for item in train_data)
-        print("Available categories:")
-        for cat in sorted(categories):
-            print(f"  - {cat}")
-        return
-    
-    # Create output directory
-    output_dir = Path("biorxiv_genetics_genomics")
-    output_dir.mkdir(exist_ok=True)
-    
-    print(f"Creating txt files in {output_dir}/")
-    
-    # Process each paper
-    for i, item in enumerate(genetics_genomics_data):
         # Create filename from title and ID
         title_part = sanitize_filename(item['title'], max_length=50)
         paper_id = item['id'].replace('/', '_')
         filename = f"{i+1:03d}_{title_part}_{paper_id}.txt"
-        
+
         # Create file content
         content = f"Title: {item['title']}\n"
         content += f"ID: {item['id']}\n"
         content += f"Category: {item['category']}\n"
         content += f"\nAbstract:\n{item['abstract']}\n"
-        
-        # Write to file
-        file_path = output_dir / filename
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-    
-    print(f"Successfully created {len(genetics_genomics_data)} txt files in {output_dir}/")
-    
+        yield filename, content
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export genetics/genomics abstracts from mteb/raw_biorxiv")
+    add_export_args(parser, default_output="biorxiv_genetics_genomics")
+    parser.add_argument("--limit", type=int, default=None, help="Export at most this many papers")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # Keep stdout clean for the records when piping JSONL
+    log = partial(print, file=sys.stderr if args.output == "-" else sys.stdout)
+
+    log("Loading MTEB raw_biorxiv dataset...")
+
+    if args.no_streaming:
+        train_data = load_dataset("mteb/raw_biorxiv", split="train")
+        log(f"Total dataset size: {len(train_data)} papers")
+        papers = train_data.with_format("arrow").filter(
+            genetics_genomics_mask, batched=True, batch_size=FILTER_BATCH_SIZE,
+            input_columns=["category"], num_proc=args.num_proc
+        ).with_format(None)
+        log(f"Found {len(papers)} papers with genetics/genomics categories")
+    else:
+        train_data = load_dataset("mteb/raw_biorxiv", split="train", streaming=True)
+        papers = train_data.filter(
+            genetics_genomics_mask, batched=True, batch_size=FILTER_BATCH_SIZE, input_columns=["category"]
+        )
+    if args.limit:
+        papers = papers.select(range(min(args.limit, len(papers)))) if args.no_streaming else papers.take(args.limit)
+
+    log(f"Writing {args.format} output to {'stdout' if args.output == '-' else args.output + '/'}")
+
+    category_counts = Counter()
+    count = export_records(paper_records(papers, category_counts), args.output, args.format,
+                           args.workers, args.shard_size)
+
+    if count == 0:
+        log("Found 0 papers with genetics/genomics categories")
+        if args.no_streaming:
+            # Let's check what categories are available
+            log("Available categories:")
+            for cat in sorted(train_data.unique('category')):
+                log(f"  - {cat}")
+        return
+
+    log(f"Successfully exported {count} papers to {args.output}")
+
     # Show some statistics
-    categories_found = set(item['category'] for item in genetics_genomics_data)
-    print(f"\nCategories included:")
-    for cat in sorted(categories_found):
-        count = sum(1 for item in genetics_genomics_data if item['category'] == cat)
-        print(f"  - {cat}: {count} papers")
+    log(f"\nCategories included:")
+    for cat, cat_count in sorted(category_counts.items()):
+        log(f"  - {cat}: {cat_count} papers")
 
 if __name__ == "__main__":
     main()
@@ -2,61 +2,37 @@
 """
 Download and process the marianna13/biorxiv dataset for txt2kg demo.
 Filter for Creative Commons licensed papers and create individual txt files.
+
+Like download_biorxiv_dataset.py, the dataset is streamed and papers are
+written as they arrive; --format jsonl --output - pipes them straight into
+batch-process-chunks.py.
 """
 
-import os
-import re
-from pathlib import Path
+import sys
+import argparse
+from functools import partial
 from datasets import load_dataset
 
-def sanitize_filename(text, max_length=100):
-    """Convert text to a safe filename."""
-    # Remove special characters and replace with underscores
-    filename = re.sub(r'[^\w\s-]', '', text)
-    filename = re.sub(r'[-\s]+', '_', filename)
-    filename = filename.strip('_')
-    
-    # Truncate if too long
-    if len(filename) > max_length:
-        filename = filename[:max_length]
-    
-    return filename
+from corpus_export import add_export_args, export_records, sanitize_filename
+
+FILTER_BATCH_SIZE = 10_000
+SAMPLE_SIZE_DEFAULT = 1000  # full dataset would be too large for the demo
+
+def creative_commons_mask(licenses):
+    """Batched filter over the LICENSE column"""
+    return [license == 'creative-commons' for license in licenses]
+
+def paper_records(papers, stats):
+    """Yield (filename, content) for each paper, collecting statistics on the way"""
+    for i, item in enumerate(papers):
+        stats['years'].add(item['YEAR'])
+        stats['text_chars'] += len(item['TEXT'])
 
-def main():
-    print("Loading marianna13/biorxiv dataset...")
-    
-    # Load the dataset
-    ds = load_dataset("marianna13/biorxiv")
-    
-    # Get the train split
-    train_data = ds['train']
-    
-    print(f"Total dataset size: {len(train_data)} papers")
-    
-    # Filter for Creative Commons licensed papers
-    cc_papers = train_data.filter(lambda x: x['LICENSE'] == 'creative-commons')
-    
-    print(f"Found {len(cc_papers)} Creative Commons licensed papers ({len(cc_papers)/len(train_data)*100:.1f}%)")
-    
-    # Take a sample for the demo (full dataset would be too large)
-    sample_size = min(1000, len(cc_papers))  # Limit to 1000 papers for demo
-    cc_sample = cc_papers.select(range(sample_size))
-    
-    print(f"Using sample of {len(cc_sample)} papers for demo")
-    
-    # Create output directory
-    output_dir = Path("biorxiv_creative_commons")
-    output_dir.mkdir(exist_ok=True)
-    
-    print(f"Creating txt files in {output_dir}/")
-    
-    # Process each paper
-    for i, item in enumerate(cc_sample):
         # Create filename from title and DOI
         title_part = sanitize_filename(item['TITLE'], max_length=50)
         doi_part = item['DOI'].replace('/', '_').replace('.', '_')
         filename = f"{i+1:03d}_{title_part}_{doi_part}.txt"
-        
+
         # Create file content with full text
         content = f"Title: {item['TITLE']}\n"
         content += f"DOI: {item['DOI']}\n"
@@ -64,23 +40,57 @@ def main():
         content += f"Authors: {'; '.join(item['AUTHORS']) if item['AUTHORS'] else 'N/A'}\n"
         content += f"License: {item['LICENSE']}\n"
         content += f"\nFull Text:\n{item['TEXT']}\n"
-        
-        # Write to file
-        file_path = output_dir / filename
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-    
-    print(f"Successfully created {len(cc_sample)} txt files in {output_dir}/")
-    
+        yield filename, content
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Creative Commons papers from marianna13/biorxiv")
+    add_export_args(parser, default_output="biorxiv_creative_commons")
+    parser.add_argument("--limit", type=int, default=SAMPLE_SIZE_DEFAULT,
+                        help="Export at most this many papers (0 = all)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # Keep stdout clean for the records when piping JSONL
+    log = partial(print, file=sys.stderr if args.output == "-" else sys.stdout)
+
+    log("Loading marianna13/biorxiv dataset...")
+
+    if args.no_streaming:
+        train_data = load_dataset("marianna13/biorxiv", split="train")
+        log(f"Total dataset size: {len(train_data)} papers")
+        cc_papers = train_data.filter(
+            creative_commons_mask, batched=True, batch_size=FILTER_BATCH_SIZE,
+            input_columns=["LICENSE"], num_proc=args.num_proc
+        )
+        log(f"Found {len(cc_papers)} Creative Commons licensed papers ({len(cc_papers)/len(train_data)*100:.1f}%)")
+        if args.limit:
+            cc_papers = cc_papers.select(range(min(args.limit, len(cc_papers))))
+    else:
+        train_data = load_dataset("marianna13/biorxiv", split="train", streaming=True)
+        cc_papers = train_data.filter(
+            creative_commons_mask, batched=True, batch_size=FILTER_BATCH_SIZE, input_columns=["LICENSE"]
+        )
+        if args.limit:
+            cc_papers = cc_papers.take(args.limit)
+
+    log(f"Writing {args.format} output to {'stdout' if args.output == '-' else args.output + '/'}")
+
+    stats = {'years': set(), 'text_chars': 0}
+    count = export_records(paper_records(cc_papers, stats), args.output, args.format,
+                           args.workers, args.shard_size)
+    if count == 0:
+        log("No Creative Commons licensed papers found")
+        return
+
+    log(f"Successfully exported {count} papers to {args.output}")
+
     # Show some statistics
-    years = [item['YEAR'] for item in cc_sample]
-    year_range = f"{min(years)} - {max(years)}"
-    
-    print(f"\nDataset Statistics:")
-    print(f"  Year range: {year_range}")
-    print(f"  License: Creative Commons (commercial use allowed)")
-    print(f"  Content: Full paper text (not just abstracts)")
-    print(f"  Average text length: {sum(len(item['TEXT']) for item in cc_sample) // len(cc_sample):,} characters")
+    log(f"\nDataset Statistics:")
+    log(f"  Year range: {min(stats['years'])} - {max(stats['years'])}")
+    log(f"  License: Creative Commons (commercial use allowed)")
+    log(f"  Content: Full paper text (not just abstracts)")
+    log(f"  Average text length: {stats['text_chars'] // count:,} characters")
 
 if __name__ == "__main__":
     main()
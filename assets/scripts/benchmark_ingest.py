@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Ingest Pipeline Benchmark: batch-process-chunks.py against a mock API
+Starts scripts/mock_ingest_server.py, generates a synthetic corpus and drives
+the batch processor over it at several concurrency levels, so client-side
+overhead and concurrency scaling can be measured on a laptop without the
+LLM or ArangoDB.
+
+Example:
+    python3 scripts/benchmark_ingest.py --chunks 200 --concurrency 1,4,8,16 \
+        --mock-args "--extract-latency lognormal:0.5,0.3 --max-concurrency 12"
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+MOCK_SERVER = SCRIPTS_DIR / "mock_ingest_server.py"
+BATCH_PROCESSOR = SCRIPTS_DIR.parent / "batch-process-chunks.py"
+RESULTS_DIR = "benchmark_results"
+
+ENTITIES = [
+    "BRCA1", "TP53", "Insulin", "Hemoglobin", "Monkeypox", "CRISPR", "Mitochondria",
+    "Ribosome", "Kinase", "Interferon", "Macrophage", "Neuron", "Cortisol", "Dopamine",
+]
+VERBS = ["regulates", "binds", "inhibits", "activates", "is expressed in", "interacts with"]
+
+def generate_corpus(directory, chunks, chunk_kb, seed):
+    """Write `chunks` deterministic text files of roughly `chunk_kb` KB each"""
+    rng = random.Random(seed)
+    target = int(chunk_kb * 1024)
+    for i in range(1, chunks + 1):
+        sentences = []
+        size = 0
+        while size < target:
+            sentence = (f"{rng.choice(ENTITIES)} {rng.choice(VERBS)} {rng.choice(ENTITIES)} "
+                        f"in sample {rng.randrange(10_000)} under condition {rng.randrange(100)}. ")
+            sentences.append(sentence)
+            size += len(sentence)
+        (Path(directory) / f"bench_part_{i:04d}.txt").write_text(''.join(sentences), encoding='utf-8')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def http_json(url, method="GET"):
+    request = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+def wait_for_server(base_url, process, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Mock server exited during startup")
+        try:
+            return http_json(f"{base_url}/stats")
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Mock server did not start within {timeout}s")
+
+def run_processor(corpus_dir, base_url, mode, concurrency, extra_args, metrics_path, log):
+    cmd = [sys.executable, str(BATCH_PROCESSOR), str(corpus_dir),
+           "--api-url", base_url, "--no-journal", "--metrics-json", str(metrics_path)]
+    if mode == "serial":
+        cmd += ["--delay", "0"]
+    else:
+        cmd += ["--async", "--concurrency", str(concurrency)]
+    cmd += extra_args
+    start_time = time.perf_counter()
+    subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, check=True)
+    elapsed = time.perf_counter() - start_time
+    with open(metrics_path, encoding='utf-8') as f:
+        return json.load(f), elapsed
+
+def summarize(mode, concurrency, report, elapsed, server_stats, baseline):
+    extract = report['stages']['extract']
+    server_extract = server_stats['extract']
+    client_mean = extract['total_s'] / extract['count'] if extract['count'] else 0.0
+    server_mean = (server_extract['service_time'] / server_extract['succeeded']
+                   if server_extract['succeeded'] else 0.0)
+    chunks_per_s = report['throughput']['chunks_per_s']
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'process_time_s': elapsed,
+        'wall_time_s': report['wall_time_s'],
+        'chunks_per_s': chunks_per_s,
+        'triples_per_s': report['throughput']['triples_per_s'],
+        'speedup': chunks_per_s / baseline if baseline else 1.0,
+        'extract_p50_s': extract['p50_s'],
+        'extract_p95_s': extract['p95_s'],
+        'client_overhead_ms': (client_mean - server_mean) * 1000,
+        'failed_chunks': report['chunks']['failed'],
+        'server_max_in_flight': server_extract['max_in_flight'],
+        'server_rejected': server_extract['rejected'],
+        'store_requests': server_stats['store']['succeeded'],
+    }
+
+def print_table(rows):
+    print("\n" + "=" * 104)
+    print("INGEST BENCHMARK RESULTS")
+    print("=" * 104)
+    print(f"{'mode':<7} {'conc':>4} {'wall s':>8} {'chunks/s':>9} {'speedup':>8} "
+          f"{'ext p50':>8} {'ext p95':>8} {'overhead ms':>12} {'in-flight':>9} {'429s':>5} {'failed':>6}")
+    for row in rows:
+        print(f"{row['mode']:<7} {row['concurrency']:>4} {row['wall_time_s']:>8.2f} "
+              f"{row['chunks_per_s']:>9.2f} {row['speedup']:>7.2f}x "
+              f"{row['extract_p50_s']:>8.3f} {row['extract_p95_s']:>8.3f} "
+              f"{row['client_overhead_ms']:>12.1f} {row['server_max_in_flight']:>9} "
+              f"{row['server_rejected']:>5} {row['failed_chunks']:>6}")
+    print("=" * 104)
+    print("overhead ms = mean client-observed extract latency minus mean server service time")
+    print("              (includes queueing, retries/backoff, JSON and HTTP handling)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark batch-process-chunks.py against a local mock API")
+    parser.add_argument("--chunks", type=int, default=100, help="Number of synthetic chunks")
+    parser.add_argument("--chunk-kb", type=float, default=4.0, help="Approximate size of each chunk in KB")
+    parser.add_argument("--corpus-dir", type=str, default=None,
+                        help="Use an existing directory of .txt chunks instead of a synthetic corpus")
+    parser.add_argument("--concurrency", type=str, default="1,2,4,8,16",
+                        help="Comma-separated async concurrency levels to test")
+    parser.add_argument("--no-serial", action="store_true", help="Skip the serial-mode baseline")
+    parser.add_argument("--mock-args", type=str, default="--extract-latency lognormal:0.5,0.3",
+                        help="Extra arguments passed to mock_ingest_server.py")
+    parser.add_argument("--processor-args", type=str, default="",
+                        help="Extra arguments passed to batch-process-chunks.py")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic corpus")
+    parser.add_argument("--output", type=str, default=os.path.join(RESULTS_DIR, "ingest_benchmark.json"),
+                        help="Where to write the JSON results")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+    extra_args = shlex.split(args.processor_args)
+
+    with tempfile.TemporaryDirectory(prefix="txt2kg-bench-") as workdir:
+        workdir = Path(workdir)
+        if args.corpus_dir:
+            corpus_dir = Path(args.corpus_dir)
+        else:
+            corpus_dir = workdir / "corpus"
+            corpus_dir.mkdir()
+            generate_corpus(corpus_dir, args.chunks, args.chunk_kb, args.seed)
+
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_path = workdir / "runs.log"
+        server = subprocess.Popen(
+            [sys.executable, str(MOCK_SERVER), "--port", str(port), *shlex.split(args.mock_args)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+        )
+        rows = []
+        try:
+            wait_for_server(base_url, server)
+            print(f"Mock API: {base_url} ({args.mock_args})")
+            print(f"Corpus: {corpus_dir}")
+
+            runs = ([] if args.no_serial else [("serial", 1)]) + [("async", c) for c in levels]
+            baseline = None
+            with open(log_path, "w") as log:
+                for mode, concurrency in runs:
+                    print(f"Running {mode} (concurrency {concurrency})...", flush=True)
+                    http_json(f"{base_url}/stats/reset", method="POST")
+                    report, elapsed = run_processor(
+                        corpus_dir, base_url, mode, concurrency, extra_args,
+                        workdir / f"metrics_{mode}_{concurrency}.json", log
+                    )
+                    server_stats = http_json(f"{base_url}/stats")
+                    row = summarize(mode, concurrency, report, elapsed, server_stats, baseline)
+                    baseline = baseline or row['chunks_per_s']
+                    rows.append(row)
+        except subprocess.CalledProcessError:
+            print(f"Batch processor failed; see log:\n{log_path.read_text()[-4000:]}")
+            sys.exit(1)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_table(rows)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": rows}, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Length-aware batching for GRetriever training
+
+Retrieved subgraphs range from a handful to hundreds of nodes and prompts
+from a short question to several long context documents, so uniformly
+shuffled batches pad every prompt to the longest one in its batch and run the
+GAT over mismatched graphs. BucketBatchSampler sorts samples into a grid of
+buckets by graph node count and tokenized prompt length, forms batches inside
+each bucket, and shuffles the batches, all from a seeded generator so every
+epoch's order is reproducible.
+"""
+
+import numpy as np
+from torch.utils.data import Sampler
+
+NUM_BUCKETS_DEFAULT = 4  # per size dimension
+POOL_BATCHES = 16  # batches' worth of a shuffled bucket sorted together
+
+def _quantile_bins(values, num_buckets):
+    """Bucket number of each value, splitting `values` into `num_buckets` quantiles"""
+    edges = np.quantile(values, np.linspace(0, 1, num_buckets + 1)[1:-1]) if len(values) else []
+    return np.searchsorted(edges, values, side="right")
+
+def padded_fraction(batches, lengths):
+    """Share of tokens in `batches` that are padding when every prompt is padded to its batch's longest"""
+    real = padded = 0
+    for batch in batches:
+        batch_lengths = lengths[batch]
+        real += int(batch_lengths.sum())
+        padded += int(batch_lengths.max()) * len(batch)
+    return 1 - real / padded if padded else 0.0
+
+class BucketBatchSampler(Sampler):
+    """
+    Batches of similar-sized samples in a reproducible shuffled order.
+
+    Args:
+        sizes: (n, d) array of per-sample sizes, e.g. node counts and prompt
+            token counts; each column is split into `num_buckets` quantiles
+        batch_size: Samples per batch
+        drop_last: Drop the final incomplete batch
+        num_buckets: Quantile buckets per size column
+        seed: Base seed; epoch e is shuffled with seed + e (see set_epoch)
+
+    Within a bucket, shuffled pools of POOL_BATCHES batches are sorted by
+    size before they are cut into batches. Samples left over in each bucket
+    are pooled, ordered by size and batched together, so at most one batch
+    per epoch is incomplete.
+    """
+
+    def __init__(self, sizes, batch_size, drop_last=False, num_buckets=NUM_BUCKETS_DEFAULT, seed=0):
+        sizes = np.asarray(sizes)
+        if sizes.ndim == 1:
+            sizes = sizes[:, None]
+        self.sizes = sizes
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+        bins = np.zeros(len(sizes), dtype=np.int64)
+        for column in sizes.T:
+            bins = bins * num_buckets + _quantile_bins(column, num_buckets)
+        self.buckets = [np.flatnonzero(bins == b) for b in np.unique(bins)]
+
+    def _by_size(self, indices):
+        """`indices` ordered by the last size column, then the ones before it (stable)"""
+        return indices[np.lexsort(self.sizes[indices].T)]
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def batches(self):
+        """This epoch's batches, as arrays of sample indices"""
+        generator = np.random.default_rng(self.seed + self.epoch)
+        batches = []
+        leftovers = []
+        for bucket in self.buckets:
+            bucket = generator.permutation(bucket)
+            # Quantile buckets are wide at the tails; sorting shuffled pools
+            # within them keeps neighbours close without fixing the batches
+            pool = self.batch_size * POOL_BATCHES
+            bucket = np.concatenate([self._by_size(bucket[i:i + pool]) for i in range(0, len(bucket), pool)]
+                                    or [bucket])
+            full = len(bucket) - len(bucket) % self.batch_size
+            batches.extend(bucket[i:i + self.batch_size] for i in range(0, full, self.batch_size))
+            leftovers.append(bucket[full:])
+        leftovers = np.concatenate(leftovers) if leftovers else np.empty(0, dtype=np.int64)
+        leftovers = self._by_size(leftovers)
+        full = len(leftovers) - len(leftovers) % self.batch_size
+        batches.extend(leftovers[i:i + self.batch_size] for i in range(0, full, self.batch_size))
+        order = generator.permutation(len(batches))
+        batches = [batches[i] for i in order]
+        if full < len(leftovers) and not self.drop_last:
+            batches.append(leftovers[full:])
+        return batches
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield batch.tolist()
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.sizes) // self.batch_size
+        return -(-len(self.sizes) // self.batch_size)
+
+def sample_sizes(dataset, prompt, tokenizer=None):
+    """
+    (n, 2) array of graph node counts and prompt lengths for `dataset`.
+
+    `prompt(attrs)` builds a sample's prompt text from its question, label,
+    text_context, ... attributes; lengths are token counts with `tokenizer`
+    (a Hugging Face tokenizer) or character counts without. Sharded datasets
+    are measured from their offsets and JSON records, without loading tensors.
+    """
+    if hasattr(dataset, "records"):
+        nodes = dataset.rows("x")
+        texts = [prompt(attrs) for attrs in dataset.records()]
+    else:
+        nodes = np.array([data.num_nodes for data in dataset], dtype=np.int64)
+        texts = [prompt(data.to_dict()) for data in dataset]
+    if tokenizer is not None:
+        lengths = np.array([len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]],
+                           dtype=np.int64)
+    else:
+        lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    return np.stack([nodes, lengths], axis=1)
+
+def shuffled_padded_fraction(lengths, batch_size, seed=0):
+    """padded_fraction of uniformly shuffled batches, as a baseline"""
+    order = np.random.default_rng(seed).permutation(len(lengths))
+    return padded_fraction([order[i:i + batch_size] for i in range(0, len(order), batch_size)], lengths)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Persistent approximate nearest-neighbour index over corpus documents
+
+RAGQueryLoader compares every query against every document embedding. With
+a million-document corpus that brute-force scan dominates retrieval, so
+preprocess_data.py keeps an HNSW index (hnswlib) of the document embeddings
+next to the graph backend and retrieves each query's context documents from
+it instead. Documents are keyed by content digest: syncing the index with
+the current corpus only embeds and inserts new documents and marks removed
+ones deleted, and the index is saved between runs.
+
+Layout:
+    <directory>/hnsw.bin    hnswlib index; labels are integers
+    <directory>/meta.json   digest -> label map and index parameters
+"""
+
+import os
+import json
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+INDEX_FILE = "hnsw.bin"
+META_FILE = "meta.json"
+SPACE_DEFAULT = "cosine"
+M_DEFAULT = 16  # graph degree
+EF_CONSTRUCTION_DEFAULT = 200
+EF_SEARCH_DEFAULT = 64  # raised to k when k is larger
+INITIAL_CAPACITY = 1024
+
+class DocumentIndex:
+    """
+    HNSW index of document embeddings keyed by document digest.
+
+    Args:
+        directory: Where the index is persisted; loaded if it exists
+        space: hnswlib distance, "cosine", "ip" or "l2"
+        m: HNSW graph degree
+        ef_construction: Build-time candidate list size
+        ef_search: Query-time candidate list size
+
+    Queries are safe from several threads or forked processes; add, remove
+    and save are not.
+    """
+
+    def __init__(self, directory, space=SPACE_DEFAULT, m=M_DEFAULT,
+                 ef_construction=EF_CONSTRUCTION_DEFAULT, ef_search=EF_SEARCH_DEFAULT):
+        if hnswlib is None:
+            raise ImportError("The document index needs hnswlib: pip install hnswlib")
+        self.directory = directory
+        self.ef_search = ef_search
+        self.index = None
+        self.labels = {}  # digest -> label
+        self.next_label = 0
+        self.params = {"space": space, "m": m, "ef_construction": ef_construction}
+
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.params = meta["params"]
+            self.labels = meta["labels"]
+            self.next_label = meta["next_label"]
+            self.index = hnswlib.Index(space=self.params["space"], dim=meta["dim"])
+            self.index.load_index(os.path.join(directory, INDEX_FILE), allow_replace_deleted=True)
+            self.index.set_num_threads(1)
+        self._documents = {label: digest for digest, label in self.labels.items()}
+        if self.index is not None:
+            # An interrupted save can leave the index newer than meta.json
+            stray = [label for label in self.index.get_ids_list() if label not in self._documents]
+            for label in stray:
+                try:
+                    self.index.mark_deleted(label)
+                except RuntimeError:
+                    pass  # already deleted
+            self.next_label = max([self.next_label] + [label + 1 for label in stray])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, digest):
+        return digest in self.labels
+
+    def _create(self, dim, capacity):
+        self.index = hnswlib.Index(space=self.params["space"], dim=dim)
+        self.index.init_index(max_elements=max(capacity, INITIAL_CAPACITY), M=self.params["m"],
+                              ef_construction=self.params["ef_construction"], allow_replace_deleted=True)
+        self.index.set_num_threads(1)
+
+    def add(self, digests, embeddings):
+        """Insert documents; digests already in the index are replaced"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(digests) == 0:
+            return
+        self.remove([digest for digest in digests if digest in self.labels])
+        if self.index is None:
+            self._create(embeddings.shape[1], 2 * len(digests))
+        needed = self.index.get_current_count() + len(digests)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+
+        labels = np.arange(self.next_label, self.next_label + len(digests))
+        self.next_label += len(digests)
+        # Reuse the slots of deleted documents before growing the graph
+        self.index.add_items(embeddings, labels, replace_deleted=True)
+        for digest, label in zip(digests, labels.tolist()):
+            self.labels[digest] = label
+            self._documents[label] = digest
+
+    def remove(self, digests):
+        """Mark documents deleted; they are no longer returned and their slots are reused"""
+        for digest in digests:
+            label = self.labels.pop(digest, None)
+            if label is not None:
+                self.index.mark_deleted(label)
+                del self._documents[label]
+
+    def sync(self, digests, embed_missing):
+        """
+        Make the index hold exactly the documents in `digests`.
+
+        `embed_missing(positions)` is called once with the positions in
+        `digests` of documents not indexed yet and returns their embeddings.
+
+        Returns:
+            (added, removed) document counts
+        """
+        current = set(digests)
+        removed = [digest for digest in self.labels if digest not in current]
+        self.remove(removed)
+        missing = {}
+        for position, digest in enumerate(digests):
+            if digest not in self.labels and digest not in missing:
+                missing[digest] = position
+        if missing:
+            self.add(list(missing), embed_missing(list(missing.values())))
+        return len(missing), len(removed)
+
+    def search(self, query_embeddings, k):
+        """Digests of the `k` nearest documents for each query embedding, nearest first"""
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        k = min(k, len(self.labels))
+        if k == 0:
+            return [[] for _ in range(len(query_embeddings.reshape(-1, query_embeddings.shape[-1])))]
+        query_embeddings = query_embeddings.reshape(-1, self.index.dim)
+        self.index.set_ef(max(self.ef_search, k))
+        labels, _ = self.index.knn_query(query_embeddings, k=k)
+        return [[self._documents[label] for label in row] for row in labels.tolist()]
+
+    def save(self):
+        """Write the index, then its metadata, each through a temporary file"""
+        if self.index is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        self.index.save_index(index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        meta_path = os.path.join(self.directory, META_FILE)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"params": self.params, "dim": self.index.dim, "labels": self.labels,
+                       "next_label": self.next_label}, f)
+        os.replace(meta_path + ".tmp", meta_path)
@@ -2,9 +2,19 @@
 
 import argparse
 import gc
+import hashlib
 import json
+import multiprocessing
 import os
+import queue
+import random
+import shutil
+import sys
+import threading
+import time
 import torch
+from multiprocessing.pool import ThreadPool
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from glob import glob
 from itertools import chain
 from tqdm import tqdm
@@ -12,8 +22,11 @@ from python_arango import ArangoClient
 
 # Import the necessary modules from PyTorch Geometric
 from torch_geometric import seed_everything
+from torch_geometric.data.large_graph_indexer import EDGE_RELATION, LargeGraphIndexer
 from torch_geometric.nn import SentenceTransformer
 from torch_geometric.utils.rag.backend_utils import (
+    RemoteDataType,
+    RemoteGraphBackendLoader,
     create_remote_backend_from_triplets,
     make_pcst_filter,
     preprocess_triplet,
@@ -22,25 +35,50 @@ from torch_geometric.utils.rag.feature_store import ModernBertFeatureStore
 from torch_geometric.utils.rag.graph_store import NeighborSamplingRAGGraphStore
 from torch_geometric.loader import RAGQueryLoader
 
+# The embedding cache and length batching live with the sentence-transformers service, which uses them too
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "..", "deploy", "services", "sentence-transformers"))
+from embedding_cache import EmbeddingCache, MAX_ENTRIES_DEFAULT
+from length_batching import TOKEN_BUDGET_DEFAULT, MAX_BATCH_SIZE_DEFAULT, encode_length_sorted
+from triple_table import NORMALIZE_WORKERS_DEFAULT, TripleTable, normalize_triples
+from subgraph_store import (SHARD_SIZE_DEFAULT, DataStoreWriter, SubgraphDataset, is_data_store,
+                            load_data_lists, store_path)
+from doc_index import DocumentIndex, hnswlib
+
 # Define constants for better readability
 NV_NIM_MODEL_DEFAULT = "nvidia/llama-3.1-nemotron-70b-instruct"
 CHUNK_SIZE_DEFAULT = 512
+TXT2KG_WORKERS_DEFAULT = 8
+TXT2KG_MAX_RETRIES = 5
+TXT2KG_BACKOFF_MAX = 60.0  # seconds
+CHECKPOINT_INTERVAL = 10  # documents between checkpoints
+LEDGER_VERSION = 1
 DEFAULT_ENDPOINT_URL = "https://integrate.api.nvidia.com/v1"
+EMBEDDING_MODEL = "Alibaba-NLP/gte-modernbert-base"
 
 # ArangoDB defaults from docker-compose.yml
 ARANGO_URL_DEFAULT = "http://localhost:8529"
 ARANGO_DB_DEFAULT = "txt2kg"
 ARANGO_USER_DEFAULT = ""
 ARANGO_PASSWORD_DEFAULT = ""
+ARANGO_BATCH_SIZE_DEFAULT = 10000
+ARANGO_SHARDS_DEFAULT = 1
+ARANGO_CURSOR_TTL = 3600  # seconds a streaming cursor may sit idle between batches
 
 # File paths and directories
-DATASET_FILE = "tech_qa.pt"
+DATASET_FILE = "tech_qa.pt"  # the sharded format lives next to it in tech_qa.shards/
+DATASET_FORMATS = ("sharded", "pt")
 TRIPLES_FILE = "tech_qa_just_triples.pt"
 CHECKPOINT_FILE = "checkpoint_kg.pt"
 TRAIN_DATA_FILE = "train.json"
 CORPUS_DIR = "corpus"
 BACKEND_PATH = "backend"
+MANIFEST_FILE = "manifest.pt"  # inside backend_path, incremental builds only
+GRAPH_FILE = "graph.pt"
 OUTPUT_DIR = "output"
+EMBEDDING_CACHE_DIR = "embedding_cache"
+DOC_INDEX_DIR = "doc_index"
+DOCS_PER_QUERY = 2  # context documents retrieved per question, as RAGQueryLoader does
 
 def parse_args():
     parser = argparse.ArgumentParser()
@@ -55,6 +93,10 @@ def parse_args():
         '--chunk_size', type=int, default=512, help="When splitting context documents for txt2kg,\
         the maximum number of characters per chunk.")
     parser.add_argument('--checkpointing', action="store_true")
+    parser.add_argument('--txt2kg_workers', type=int, default=TXT2KG_WORKERS_DEFAULT,
+                        help="Documents sent to the TXT2KG LLM concurrently")
+    parser.add_argument('--txt2kg_rate_limit', type=float, default=0,
+                        help="Maximum LLM requests per second across TXT2KG workers (0 = unlimited)")
     
     # Add ArangoDB-specific arguments
     parser.add_argument('--arango_url', type=str, default=ARANGO_URL_DEFAULT, help="ArangoDB URL")
@@ -62,19 +104,175 @@ def parse_args():
     parser.add_argument('--arango_user', type=str, default=ARANGO_USER_DEFAULT, help="ArangoDB username")
     parser.add_argument('--arango_password', type=str, default=ARANGO_PASSWORD_DEFAULT, help="ArangoDB password")
     parser.add_argument('--use_arango', action="store_true", help="Use ArangoDB instead of TXT2KG")
+    parser.add_argument('--normalize_workers', type=int, default=NORMALIZE_WORKERS_DEFAULT,
+                        help="Processes parsing and interning triples during validation")
+    parser.add_argument('--arango_batch_size', type=int, default=ARANGO_BATCH_SIZE_DEFAULT,
+                        help="Triples fetched per round trip from the streaming ArangoDB cursor")
+    parser.add_argument('--arango_shards', type=int, default=ARANGO_SHARDS_DEFAULT,
+                        help="Parallel cursors, each exporting one _key range of the relationships collection")
     
     # Add file path arguments
     parser.add_argument('--dataset_file', type=str, default=DATASET_FILE, help="Path to save/load dataset")
+    parser.add_argument('--dataset_format', type=str, default="sharded", choices=DATASET_FORMATS,
+                        help="Write the dataset as memory-mapped shards (loaded lazily for training) "
+                             "or as a single torch.save pickle")
+    parser.add_argument('--dataset_shard_size', type=int, default=SHARD_SIZE_DEFAULT,
+                        help="QA pairs per shard with --dataset_format sharded")
     parser.add_argument('--triples_file', type=str, default=TRIPLES_FILE, help="Path to save/load triples")
     parser.add_argument('--checkpoint_file', type=str, default=CHECKPOINT_FILE, help="Path to save/load checkpoint")
     parser.add_argument('--train_data_file', type=str, default=TRAIN_DATA_FILE, help="Path to training data file")
     parser.add_argument('--corpus_dir', type=str, default=CORPUS_DIR, help="Directory containing corpus documents")
     parser.add_argument('--backend_path', type=str, default=BACKEND_PATH, help="Path for backend storage")
     parser.add_argument('--output_dir', type=str, default=OUTPUT_DIR, help="Directory for output files")
+    parser.add_argument('--embedding_cache_dir', type=str, default=EMBEDDING_CACHE_DIR,
+                        help="Directory (under output_dir unless absolute) caching node and doc embeddings across runs")
+    parser.add_argument('--embedding_cache_size', type=int, default=MAX_ENTRIES_DEFAULT,
+                        help="Embeddings kept in the cache before least recently used ones are evicted")
+    parser.add_argument('--embedding_cache_dtype', type=str, default="float32", choices=["float32", "float16"],
+                        help="Storage type of cached embeddings")
+    parser.add_argument('--no_embedding_cache', action="store_true", help="Always encode from scratch")
+    parser.add_argument('--encode_token_budget', type=int, default=TOKEN_BUDGET_DEFAULT,
+                        help="Padded tokens per embedding batch; texts are sorted by token length and batched "
+                             "within this budget, with batch_size as the cap on texts per batch")
+    parser.add_argument('--doc_index_dir', type=str, default=DOC_INDEX_DIR,
+                        help="Directory (under output_dir) of the persistent ANN index over document embeddings")
+    parser.add_argument('--no_doc_index', action="store_true",
+                        help="Retrieve context documents by brute-force comparison with every document")
+    parser.add_argument('--query_workers', type=int, default=1,
+                        help="Parallel RAG queries when building the dataset: worker processes on CPU, "
+                             "threads when CUDA is in use")
+    parser.add_argument('--incremental', action="store_true",
+                        help="Update the dataset from the previous incremental build under backend_path, "
+                             "embedding only new nodes/edges/docs and re-querying only affected QA pairs")
     
     return parser.parse_args()
 
-def load_triples_from_arangodb(arango_url, arango_db, arango_user, arango_password):
+# Edges are joined to their endpoint entities through the primary index, and
+# only the three trimmed strings are sent back, as a compact array. An optional _key range lets
+# several cursors export disjoint slices of the collection in parallel.
+TRIPLES_AQL = """
+FOR e IN relationships
+    {key_filter}
+    FOR s IN entities
+        FILTER s._id == e._from
+        FOR o IN entities
+            FILTER o._id == e._to
+            LET subject = TRIM(s.name)
+            LET object = TRIM(o.name)
+            LET predicate = TRIM(e.type)
+            FILTER subject != "" AND predicate != "" AND object != ""
+            RETURN [subject, predicate, object]
+"""
+
+def connect_arangodb(arango_url, arango_db, arango_user, arango_password):
+    """Open a database handle (no auth in our docker setup)"""
+    client = ArangoClient(hosts=arango_url)
+    if arango_user and arango_password:
+        return client.db(arango_db, username=arango_user, password=arango_password)
+    return client.db(arango_db)
+
+def relationship_key_ranges(db, shards):
+    """
+    Split the relationships collection into `shards` contiguous _key ranges of
+    roughly equal size, as (lower, upper) bounds where None means unbounded.
+    """
+    total = db.collection('relationships').count()
+    if shards <= 1 or total < shards:
+        return [(None, None)]
+    boundaries = []
+    for shard in range(1, shards):
+        cursor = db.aql.execute(
+            "FOR e IN relationships SORT e._key LIMIT @offset, 1 RETURN e._key",
+            bind_vars={'offset': total * shard // shards}
+        )
+        boundaries.extend(cursor)
+    bounds = [None] + sorted(set(boundaries)) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def iter_triples_in_range(db, key_range=(None, None), batch_size=ARANGO_BATCH_SIZE_DEFAULT):
+    """Stream triple dicts for one _key range through a server-side cursor"""
+    lower, upper = key_range
+    conditions = []
+    bind_vars = {}
+    if lower is not None:
+        conditions.append("e._key >= @lower")
+        bind_vars['lower'] = lower
+    if upper is not None:
+        conditions.append("e._key < @upper")
+        bind_vars['upper'] = upper
+    key_filter = f"FILTER {' AND '.join(conditions)}" if conditions else ""
+    cursor = db.aql.execute(
+        TRIPLES_AQL.format(key_filter=key_filter),
+        bind_vars=bind_vars,
+        batch_size=batch_size,
+        stream=True,
+        ttl=ARANGO_CURSOR_TTL
+    )
+    try:
+        for subject, predicate, obj in cursor:
+            yield {'subject': subject, 'predicate': predicate, 'object': obj}
+    finally:
+        cursor.close(ignore_missing=True)
+
+def iter_triples_from_arangodb(connect, shards=ARANGO_SHARDS_DEFAULT, batch_size=ARANGO_BATCH_SIZE_DEFAULT):
+    """
+    Yield triple dicts from ArangoDB without holding the result in memory.
+
+    With more than one shard, each _key range is read by its own thread and
+    connection; batches are handed over through a bounded queue, so memory
+    stays at a few batches per shard. Triples arrive in no particular order.
+    """
+    db = connect()
+    key_ranges = relationship_key_ranges(db, shards)
+    if len(key_ranges) == 1:
+        yield from iter_triples_in_range(db, key_ranges[0], batch_size)
+        return
+
+    batches = queue.Queue(maxsize=2 * len(key_ranges))
+    stop = threading.Event()
+    done = object()
+
+    def export(key_range):
+        try:
+            batch = []
+            for triple in iter_triples_in_range(connect(), key_range, batch_size):
+                if stop.is_set():
+                    return
+                batch.append(triple)
+                if len(batch) == batch_size:
+                    batches.put(batch)
+                    batch = []
+            batches.put(batch)
+        except Exception as error:
+            batches.put(error)
+        finally:
+            batches.put(done)
+
+    workers = [threading.Thread(target=export, args=(key_range,), daemon=True) for key_range in key_ranges]
+    for worker in workers:
+        worker.start()
+    try:
+        remaining = len(workers)
+        while remaining:
+            item = batches.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield from item
+    finally:
+        stop.set()
+        # Unblock workers waiting on a full queue so they can exit
+        while any(worker.is_alive() for worker in workers):
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+def load_triples_from_arangodb(arango_url, arango_db, arango_user, arango_password,
+                               batch_size=ARANGO_BATCH_SIZE_DEFAULT, shards=ARANGO_SHARDS_DEFAULT,
+                               normalize_workers=NORMALIZE_WORKERS_DEFAULT):
     """
     Load triples from ArangoDB for use with the TXT2KG dataset
     
@@ -83,83 +281,51 @@ def load_triples_from_arangodb(arango_url, arango_db, arango_user, arango_passwo
         arango_db: ArangoDB database name
         arango_user: ArangoDB username
         arango_password: ArangoDB password
+        batch_size: Triples per cursor round trip
+        shards: Number of parallel cursors over disjoint _key ranges
+        normalize_workers: Processes interning and deduplicating the triples
         
     Returns:
-        Array of triples in the format expected by create_remote_backend_from_triplets
+        TripleTable of unique (subject, predicate, object) triples
     """
     try:
-        # Connect to ArangoDB
-        client = ArangoClient(hosts=arango_url)
-        
-        # Get database (no auth in our docker setup)
-        if arango_user and arango_password:
-            db = client.db(arango_db, username=arango_user, password=arango_password)
-        else:
-            db = client.db(arango_db)
-        
-        # Query to get all triples from ArangoDB as structured objects
-        # Handle case sensitivity and trim whitespace
-        aql_query = """
-        FOR e IN relationships
-        LET subject = TRIM(DOCUMENT(e._from).name)
-        LET object = TRIM(DOCUMENT(e._to).name)
-        LET predicate = TRIM(e.type)
-        FILTER subject != "" AND predicate != "" AND object != ""
-        RETURN {
-            subject: subject,
-            predicate: predicate,
-            object: object
-        }
-        """
-        
-        # Execute the query
-        cursor = db.aql.execute(aql_query)
-        triple_dicts = list(cursor)
+        def connect():
+            return connect_arangodb(arango_url, arango_db, arango_user, arango_password)
+
+        # Stream triples straight into normalization, so only interned
+        # strings and integer id rows are ever held in memory
+        triple_dicts = tqdm(iter_triples_from_arangodb(connect, shards, batch_size),
+                            desc="Exporting triples from ArangoDB", unit=" triples")
         
-        # Format triples as strings in the format expected by PyTorch Geometric
-        # The expected format is a list of strings in the form "subject predicate object"
-        triples = format_triples_for_pytorch_geometric(triple_dicts)
+        # Keep subject, predicate and object as separate fields all the way to
+        # PyTorch Geometric; multi-word entities cannot survive a join and re-split
+        triples = format_triples_for_pytorch_geometric(triple_dicts, normalize_workers)
         
         print(f"Loaded {len(triples)} triples from ArangoDB")
         # Print sample triples for debugging
         if len(triples) > 0:
             print("Sample triples:")
             for i in range(min(3, len(triples))):
-                print(f"  {triples[i]}")
+                print(f"  {triples.row(i)}")
         
         return triples
     except Exception as error:
         print(f"Error loading triples from ArangoDB: {error}")
         raise error
 
-def format_triples_for_pytorch_geometric(triple_dicts):
+def format_triples_for_pytorch_geometric(triple_dicts, workers=NORMALIZE_WORKERS_DEFAULT):
     """
     Format triples from ArangoDB into the format expected by PyTorch Geometric
     
     Args:
-        triple_dicts: List of dictionaries with subject, predicate, object keys
+        triple_dicts: Iterable of dictionaries with subject, predicate, object keys
+        workers: Processes interning and deduplicating the triples
         
     Returns:
-        List of strings in the format "subject predicate object"
+        TripleTable of unique (subject, predicate, object) triples, skipping
+        triples with empty values
     """
-    triples = []
-    # Create a set to avoid duplicates
-    unique_triples = set()
-    
-    for triple_dict in triple_dicts:
-        # Skip any triple with empty values
-        if not triple_dict['subject'] or not triple_dict['predicate'] or not triple_dict['object']:
-            continue
-            
-        # Create a space-separated string in the format that preprocess_triplet expects
-        triple_str = f"{triple_dict['subject']} {triple_dict['predicate']} {triple_dict['object']}"
-        
-        # Only add if not already in the set
-        if triple_str not in unique_triples:
-            unique_triples.add(triple_str)
-            triples.append(triple_str)
-    
-    return triples
+    return normalize_triples(triple_dicts, workers)
 
 def get_data(args):
     # need a JSON dict of Questions and answers, see below for how its used
@@ -174,48 +340,518 @@ def get_data(args):
     
     return json_obj, text_contexts
 
-def validate_triple_format(triples):
+def validate_triple_format(triples, workers=NORMALIZE_WORKERS_DEFAULT):
     """
     Validate and fix triple format if needed to ensure compatibility with preprocess_triplet
     
     Args:
-        triples: List of triples to validate
+        triples: List of triples to validate: (subject, predicate, object)
+            tuples or dicts, or "subject predicate object" strings from older
+            triples files (split on whitespace, so multi-word subjects and
+            predicates cannot be recovered from them)
+        workers: Processes interning and deduplicating the triples
         
     Returns:
-        Fixed list of triples in the format expected by preprocess_triplet
+        TripleTable of unique triples; its triples() are the (head, relation,
+        tail) tuples preprocess_triplet and make_pcst_filter expect
     """
-    validated_triples = []
-    
     print(f"Validating {len(triples)} triples...")
-    for i, triple in enumerate(triples):
-        # If triple is already a proper string with subject, predicate, object
-        if isinstance(triple, str):
-            parts = triple.split()
-            # Ensure there are at least 3 parts (subject, predicate, object)
-            if len(parts) >= 3:
-                # For strings with more than 3 parts, use first as subject, second as predicate, 
-                # and join the rest as object
-                subject = parts[0]
-                predicate = parts[1]
-                obj = ' '.join(parts[2:])
-                validated_triple = f"{subject} {predicate} {obj}"
-                validated_triples.append(validated_triple)
-            else:
-                print(f"Warning: Triple at index {i} has fewer than 3 parts: {triple}")
-        # If triple is a dictionary with subject, predicate, object keys
-        elif isinstance(triple, dict) and 'subject' in triple and 'predicate' in triple and 'object' in triple:
-            validated_triple = f"{triple['subject']} {triple['predicate']} {triple['object']}"
-            validated_triples.append(validated_triple)
-        # If triple is a tuple or list of length 3
-        elif (isinstance(triple, tuple) or isinstance(triple, list)) and len(triple) == 3:
-            validated_triple = f"{triple[0]} {triple[1]} {triple[2]}"
-            validated_triples.append(validated_triple)
-        else:
-            print(f"Warning: Skipping triple at index {i} with invalid format: {triple}")
-    
+    validated_triples = normalize_triples(triples, workers)
     print(f"Validation complete. {len(validated_triples)} valid triples out of {len(triples)}")
     return validated_triples
 
+def doc_digest(text):
+    """Content hash identifying a corpus document across runs"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def embed_with_reuse(keys, texts, previous_keys, previous_embeddings, encode):
+    """
+    Embed `texts`, copying rows of `previous_embeddings` for keys that were
+    embedded in an earlier run and calling `encode` only for the rest.
+
+    Returns:
+        (embeddings, number of newly encoded texts)
+    """
+    previous_rows = {key: row for row, key in enumerate(previous_keys or [])}
+    rows = [previous_rows.get(key, -1) for key in keys]
+    missing = [i for i, row in enumerate(rows) if row < 0]
+    new_embeddings = encode([texts[i] for i in missing]) if missing else None
+
+    reference = new_embeddings if new_embeddings is not None else previous_embeddings
+    if reference is None:
+        return torch.empty(0), 0
+    embeddings = torch.empty(len(keys), reference.shape[1], dtype=reference.dtype)
+    reused = [i for i, row in enumerate(rows) if row >= 0]
+    if reused:
+        embeddings[reused] = previous_embeddings[[rows[i] for i in reused]].to(reference.dtype)
+    if missing:
+        embeddings[missing] = new_embeddings.to('cpu')
+    return embeddings, len(missing)
+
+class LengthSortedEncoder:
+    """
+    SentenceTransformer.encode() over texts sorted by token length, in
+    batches of at most `batch_size` texts and `max_tokens` padded tokens,
+    returned in the caller's order
+    """
+
+    def __init__(self, model, max_tokens=TOKEN_BUDGET_DEFAULT):
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def encode(self, texts, batch_size=None, output_device=None, verbose=False):
+        progress = (lambda batches: tqdm(batches, desc="Encoding", unit=" batches")) if verbose else None
+        embeddings = encode_length_sorted(
+            texts, lambda batch: self.model.encode(batch, batch_size=len(batch)), self.model.tokenizer,
+            self.max_tokens, batch_size or MAX_BATCH_SIZE_DEFAULT, self.model.max_seq_length, progress
+        )
+        return embeddings.to(output_device or next(self.model.parameters()).device)
+
+class CachedEncoder(LengthSortedEncoder):
+    """LengthSortedEncoder through the on-disk embedding cache"""
+
+    def __init__(self, model, cache, max_tokens=TOKEN_BUDGET_DEFAULT):
+        super().__init__(model, max_tokens)
+        self.cache = cache
+
+    def encode(self, texts, batch_size=None, output_device=None, verbose=False):
+        def encode_missing(missing):
+            return super(CachedEncoder, self).encode(missing, batch_size, 'cpu', verbose).float().numpy()
+
+        embeddings = torch.from_numpy(self.cache.encode(texts, encode_missing))
+        return embeddings.to(output_device or next(self.model.parameters()).device)
+
+def load_embedding_model(args, device):
+    """
+    The sentence embedding model, plus the encoder to use for nodes, edges
+    and docs: a LengthSortedEncoder, or a CachedEncoder, around it
+    """
+    model = SentenceTransformer(model_name=EMBEDDING_MODEL).to(device)
+    if args.no_embedding_cache:
+        return model, LengthSortedEncoder(model, args.encode_token_budget)
+    cache = EmbeddingCache(
+        os.path.join(args.output_dir, args.embedding_cache_dir), EMBEDDING_MODEL,
+        max_entries=args.embedding_cache_size, dtype=args.embedding_cache_dtype
+    )
+    print(f"Embedding cache: {cache.directory} ({len(cache)} entries)")
+    return model, CachedEncoder(model, cache, args.encode_token_budget)
+
+def report_embedding_cache(encoder):
+    if isinstance(encoder, CachedEncoder):
+        stats = encoder.cache.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['entries']} entries")
+        encoder.cache.close()
+
+def build_graph_data(triples, model, batch_size, previous=None, previous_graph=None):
+    """
+    Index triples into a graph and embed its nodes and relations, re-using
+    embeddings from the previous incremental run where the text is unchanged.
+
+    Returns:
+        (data, nodes, relations, relation_embeddings) where `nodes` lists the
+        node text of each node id in `data`
+    """
+    indexer = LargeGraphIndexer.from_triplets(triples, pre_transform=preprocess_triplet)
+
+    def encode(texts):
+        return model.encode(texts, batch_size=min(len(texts), batch_size)).to('cpu')
+
+    nodes = indexer.get_unique_node_features()
+    node_embeddings, new_nodes = embed_with_reuse(
+        nodes, nodes, previous and previous['nodes'],
+        previous_graph.x if previous_graph is not None else None, encode
+    )
+    relations = indexer.get_unique_edge_features(feature_name=EDGE_RELATION)
+    relation_embeddings, new_relations = embed_with_reuse(
+        relations, relations, previous and previous['relations'],
+        previous and previous['relation_embeddings'], encode
+    )
+    print(f"Embedded {new_nodes} new of {len(nodes)} nodes and "
+          f"{new_relations} new of {len(relations)} relations")
+
+    indexer.add_node_feature('x', node_embeddings)
+    indexer.add_edge_feature(new_feature_name="edge_attr", new_feature_vals=relation_embeddings,
+                             map_from_feature=EDGE_RELATION)
+    data = indexer.to_data(node_feature_name='x', edge_feature_name='edge_attr')
+    return data.to("cpu"), nodes, relations, relation_embeddings
+
+def changed_node_ids(previous_triples, triples, previous_nodes):
+    """
+    Ids (in the previous run's numbering) of existing nodes that gained or
+    lost an edge. Queries whose neighbourhood avoids them retrieve the same
+    subgraph as before.
+    """
+    old, new = set(previous_triples), set(triples)
+    previous_ids = {node: i for i, node in enumerate(previous_nodes)}
+    changed = set()
+    for triple in chain(old - new, new - old):
+        head, _, tail = preprocess_triplet(triple)
+        changed.update(previous_ids[node] for node in (head, tail) if node in previous_ids)
+    return changed
+
+class PCSTFilter:
+    """
+    make_pcst_filter(triples, model) as a picklable object: the filter itself
+    is a closure, so it is rebuilt when unpickled in a query worker
+    """
+
+    def __init__(self, triples, model):
+        self.triples = triples
+        self.model = model
+        self._filter = make_pcst_filter(triples, model)
+
+    def __getstate__(self):
+        return {"triples": self.triples, "model": self.model}
+
+    def __setstate__(self, state):
+        self.__init__(state["triples"], state["model"])
+
+    def __call__(self, graph, query, **kwargs):
+        return self._filter(graph, query, **kwargs)
+
+class NeighbourhoodRecorder:
+    """
+    Wraps a RAGQueryLoader local filter so each returned subgraph carries the
+    node ids of its sampled neighbourhood (before filtering) as
+    `subgraph.neighbourhood`.
+    """
+
+    def __init__(self, local_filter):
+        self.local_filter = local_filter
+
+    def __call__(self, graph, query, **kwargs):
+        neighbourhood = torch.unique(torch.as_tensor(graph["node_idx"])).cpu()
+        subgraph = self.local_filter(graph, query, **kwargs)
+        subgraph.neighbourhood = neighbourhood
+        return subgraph
+
+# The query loader used by _run_query: set by the pool initializer in worker
+# processes, and in this process while query threads run
+_query_loader = None
+
+def _init_query_worker(query_loader):
+    global _query_loader
+    _query_loader = query_loader
+    # One intra-op thread per worker avoids oversubscribing the cores
+    torch.set_num_threads(1)
+
+def _run_query(item):
+    index, question = item
+    return index, _query_loader.query(question)
+
+def iter_queries(query_loader, questions, workers=1):
+    """
+    Yield (index, subgraph) for each question, in completion order.
+
+    With more than one worker on CPU, queries run in spawned processes. They
+    are not forked: by now this process runs other threads (ArangoDB export,
+    TXT2KG extraction, torch's pools), and a forked child can deadlock on a
+    lock one of them held. The query loader is pickled to each worker once,
+    and torch passes its CPU tensors through shared memory, so the stores are
+    not copied per worker. Once CUDA has been initialized threads are used
+    instead, sharing the model on the GPU.
+    """
+    global _query_loader
+    items = list(enumerate(questions))
+    if workers <= 1 or len(items) <= 1:
+        for index, question in items:
+            yield index, query_loader.query(question)
+        return
+
+    chunksize = max(1, min(16, len(items) // (workers * 8)))
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        _query_loader = query_loader
+        try:
+            with ThreadPool(workers) as pool:
+                yield from pool.imap_unordered(_run_query, items, chunksize=chunksize)
+        finally:
+            _query_loader = None
+        return
+    with multiprocessing.get_context("spawn").Pool(workers, initializer=_init_query_worker,
+                                                   initargs=(query_loader,)) as pool:
+        yield from pool.imap_unordered(_run_query, items, chunksize=chunksize)
+
+def run_queries(query_loader, questions, workers=1, desc="Querying"):
+    """iter_queries with a progress bar, reporting queries per second once done"""
+    start_time = time.time()
+    yield from tqdm(iter_queries(query_loader, questions, workers),
+                    total=len(questions), desc=desc, unit=" queries")
+    elapsed = time.time() - start_time
+    if questions:
+        print(f"Ran {len(questions)} queries in {elapsed:.1f}s "
+              f"({len(questions) / max(elapsed, 1e-9):.2f} queries/s, {workers} workers)")
+
+# The query embedding of the last seed retrieval on this thread; a query
+# runs on one thread from seed retrieval to document search
+_query_encoding = threading.local()
+
+class QueryEncodingFeatureStore(ModernBertFeatureStore):
+    """
+    ModernBertFeatureStore that keeps the query embedding it computes for
+    seed node retrieval in a thread-local slot, so IndexedDocsQueryLoader
+    can search documents without encoding the query a second time
+    """
+
+    def retrieve_seed_nodes(self, query, **kwargs):
+        seed_nodes, query_enc = super().retrieve_seed_nodes(query, **kwargs)
+        _query_encoding.value = query_enc
+        return seed_nodes, query_enc
+
+class IndexedDocsQueryLoader:
+    """
+    Wraps a RAGQueryLoader built without documents and sets each subgraph's
+    text_context from the DocumentIndex instead of a scan over all document
+    embeddings, searching with the query embedding its feature store (a
+    QueryEncodingFeatureStore) computed for the graph retrieval.
+    """
+
+    def __init__(self, query_loader, doc_index, docs_by_digest, k=DOCS_PER_QUERY):
+        self.query_loader = query_loader
+        self.doc_index = doc_index
+        self.docs_by_digest = docs_by_digest
+        self.k = k
+
+    def query(self, query):
+        _query_encoding.value = None
+        try:
+            data = self.query_loader.query(query)
+            query_enc = _query_encoding.value
+        finally:
+            _query_encoding.value = None
+        if query_enc is None:
+            raise RuntimeError("The query loader's feature store is not a QueryEncodingFeatureStore")
+        query_embedding = query_enc.reshape(1, -1).cpu().numpy()
+        data.text_context = [self.docs_by_digest[digest]
+                             for digest in self.doc_index.search(query_embedding, self.k)[0]]
+        return data
+
+def open_doc_index(args, digests, embed_missing):
+    """
+    The document index under output_dir, synced with the corpus given by
+    `digests` and saved, or None when disabled or hnswlib is missing.
+    """
+    if args.no_doc_index:
+        return None
+    if hnswlib is None:
+        print("hnswlib is not installed, retrieving context documents by brute force")
+        return None
+    doc_index = DocumentIndex(os.path.join(args.output_dir, args.doc_index_dir))
+    added, removed = doc_index.sync(digests, embed_missing)
+    doc_index.save()
+    print(f"Document index: {len(doc_index)} documents ({added} added, {removed} removed)")
+    return doc_index
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads; rate <= 0 disables it"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(slot - now)
+
+def load_extraction_ledger(checkpoint_path, digests):
+    """
+    {document digest: triples} for documents already extracted.
+
+    Checkpoints written by TXT2KG.save_kg are keyed by document index and are
+    mapped onto the digests of `context_docs` in corpus order.
+    """
+    if not os.path.exists(checkpoint_path):
+        return {}
+    saved = torch.load(checkpoint_path, weights_only=False)
+    if isinstance(saved, dict) and saved.get('version') == LEDGER_VERSION:
+        return saved['docs']
+    return {digests[i]: triples for i, triples in saved.items()
+            if isinstance(i, int) and 0 <= i < len(digests)}
+
+def save_extraction_ledger(ledger, checkpoint_path):
+    """Write the ledger to a temporary file and rename it, so a crash never leaves a torn checkpoint"""
+    tmp_path = checkpoint_path + ".tmp"
+    torch.save({'version': LEDGER_VERSION, 'docs': ledger}, tmp_path)
+    os.replace(tmp_path, checkpoint_path)
+
+def make_txt2kg_extractor(args, limiter):
+    """
+    Function extracting the triples of one document, safe to call from
+    several threads.
+
+    TXT2KG.add_doc_2_KG cannot run concurrently (its worker processes share
+    fixed result files under /tmp), so this drives the same chunking, NIM
+    call and parsing helpers directly, one chunk at a time per document.
+    """
+    from torch_geometric.nn import TXT2KG
+    txt2kg = sys.modules[TXT2KG.__module__]
+    if args.NV_NIM_KEY == '':
+        raise ValueError("TXT2KG needs an NVIDIA API key, pass --NV_NIM_KEY")
+
+    def complete(chunk):
+        for attempt in range(TXT2KG_MAX_RETRIES + 1):
+            limiter.wait()
+            try:
+                return txt2kg._chunk_to_triples_str_cloud(
+                    chunk, GLOBAL_NIM_KEY=args.NV_NIM_KEY, NIM_MODEL=args.NV_NIM_MODEL,
+                    ENDPOINT_URL=args.ENDPOINT_URL
+                )
+            except Exception:
+                if attempt == TXT2KG_MAX_RETRIES:
+                    raise
+                time.sleep(random.uniform(0, min(TXT2KG_BACKOFF_MAX, 2 ** attempt)))
+
+    def extract(doc):
+        triples = []
+        for chunk in txt2kg._chunk_text(doc, chunk_size=args.chunk_size):
+            triples += txt2kg._parse_n_check_triples(complete(chunk))
+        return triples
+
+    return extract
+
+def extract_triples_with_txt2kg(args, context_docs, checkpoint_path):
+    """Run TXT2KG over `context_docs` and return the unique triples, in corpus order"""
+    doc_triples = extract_document_triples(args, context_docs, checkpoint_path)
+    return list(dict.fromkeys(chain.from_iterable(doc_triples[doc_digest(doc)] for doc in context_docs)))
+
+def extract_document_triples(args, context_docs, checkpoint_path):
+    """
+    Run TXT2KG over `context_docs` and return {document digest: triples}.
+
+    Up to --txt2kg_workers documents are in flight at once, since the loop
+    is bound by LLM latency. With --checkpointing, a ledger of finished
+    documents keyed by content hash is written atomically every
+    CHECKPOINT_INTERVAL documents, so a restart skips exactly the documents
+    already done.
+    """
+    print(
+        "Note that if the TXT2KG process is too slow for you're liking using the public NIM, "
+        "consider deploying yourself using local_lm flag of TXT2KG or using "
+        "https://build.nvidia.com/nvidia/llama-3_1-nemotron-70b-instruct?snippet_tab=Docker "
+        "to deploy to a private endpoint, which you can pass to this script w/ --ENDPOINT_URL flag."
+    )
+    
+    digests = [doc_digest(doc) for doc in context_docs]
+    docs_by_digest = dict(zip(digests, context_docs))
+    ledger = load_extraction_ledger(checkpoint_path, digests)
+    if ledger:
+        print(f"Restoring KG from checkpoint at {checkpoint_path} ({len(ledger)} documents done)...")
+    pending = [digest for digest in docs_by_digest if digest not in ledger]
+
+    extract = make_txt2kg_extractor(args, RateLimiter(args.txt2kg_rate_limit))
+    pool = ThreadPoolExecutor(max_workers=max(1, args.txt2kg_workers))
+    futures = {pool.submit(extract, docs_by_digest[digest]): digest for digest in pending}
+    failed = 0
+    progress = tqdm(total=len(docs_by_digest), initial=len(docs_by_digest) - len(pending),
+                    desc="Extracting KG triples")
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                ledger[futures[future]] = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Warning: TXT2KG failed on a document: {e}")
+            progress.update(1)
+            if args.checkpointing and done % CHECKPOINT_INTERVAL == 0:
+                save_extraction_ledger(ledger, checkpoint_path)
+    finally:
+        # On interrupt, don't wait for documents that have not started
+        pool.shutdown(wait=True, cancel_futures=True)
+        progress.close()
+        if args.checkpointing:
+            print(f" checkpointing KG to {checkpoint_path}...")
+            save_extraction_ledger(ledger, checkpoint_path)
+
+    if failed:
+        raise RuntimeError(
+            f"TXT2KG failed on {failed} of {len(pending)} documents"
+            + ("; rerun to retry only those" if args.checkpointing else "; rerun with --checkpointing to keep progress")
+        )
+
+    if args.checkpointing and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {digest: ledger[digest] for digest in docs_by_digest}
+
+def load_triples(args, context_docs, checkpoint_path):
+    """Triples from ArangoDB (--use_arango) or extracted from the corpus with TXT2KG"""
+    if args.use_arango:
+        # Load triples from ArangoDB instead of generating with TXT2KG
+        print("Loading triples from ArangoDB...")
+        triples = load_triples_from_arangodb(
+            args.arango_url, 
+            args.arango_db, 
+            args.arango_user, 
+            args.arango_password,
+            batch_size=args.arango_batch_size,
+            shards=args.arango_shards,
+            normalize_workers=args.normalize_workers
+        )
+        return triples
+    return validate_triple_format(extract_triples_with_txt2kg(args, context_docs, checkpoint_path),
+                                  args.normalize_workers)
+
+def load_saved_triples(triples_path, workers=NORMALIZE_WORKERS_DEFAULT):
+    """TripleTable from a triples file; lists of tuples or strings from older runs are validated"""
+    saved = torch.load(triples_path, weights_only=False)
+    if isinstance(saved, TripleTable):
+        return saved
+    return validate_triple_format(saved, workers)
+
+def load_saved_dataset(dataset_path):
+    """Previously saved data_lists, from the sharded store or the .pt file, or None"""
+    if is_data_store(store_path(dataset_path)):
+        return load_data_lists(store_path(dataset_path))
+    if os.path.exists(dataset_path):
+        return torch.load(dataset_path, weights_only=False)
+    return None
+
+def split_questions(data_list):
+    """Question of each sample of a split; a sharded split is read without loading its tensors"""
+    if isinstance(data_list, SubgraphDataset):
+        return [record["question"] for record in data_list.records()]
+    return [subgraph.question for subgraph in data_list]
+
+class DatasetWriter:
+    """
+    Takes subgraphs one at a time as they are retrieved and saves them as
+    the dataset when the `with` block exits without error, after which
+    `data_lists` holds it. The sharded store is written as the subgraphs
+    arrive; --dataset_format pt collects them for a single torch.save.
+    """
+
+    def __init__(self, args, dataset_path):
+        self.args = args
+        self.dataset_path = dataset_path
+        self.data_lists = {"train": [], "validation": [], "test": []}
+        self.store = None
+        if args.dataset_format == "sharded":
+            self.store = DataStoreWriter(store_path(dataset_path), args.dataset_shard_size)
+
+    def append(self, split, subgraph):
+        if self.store is not None:
+            self.store.append(split, subgraph)
+        else:
+            self.data_lists[split].append(subgraph)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.store is not None:
+            self.store.__exit__(exc_type, exc, tb)
+            if exc_type is None:
+                print(f"Saved sharded dataset to {store_path(self.dataset_path)}")
+                self.data_lists = load_data_lists(store_path(self.dataset_path))
+        elif exc_type is None:
+            torch.save(self.data_lists, self.dataset_path)
+        return False
+
 def make_dataset(args):
     """Modified make_dataset function that can use ArangoDB as a data source"""
     # Create output directory if it doesn't exist
@@ -223,98 +859,39 @@ def make_dataset(args):
     dataset_path = os.path.join(args.output_dir, args.dataset_file)
     triples_path = os.path.join(args.output_dir, args.triples_file)
     checkpoint_path = os.path.join(args.output_dir, args.checkpoint_file)
+    backend_path = os.path.join(args.output_dir, args.backend_path)
     
-    if os.path.exists(dataset_path):
+    if args.incremental:
+        return make_dataset_incremental(args, dataset_path, triples_path, checkpoint_path, backend_path)
+    
+    saved = load_saved_dataset(dataset_path)
+    if saved is not None:
         print(f"Re-using Saved TechQA KG-RAG Dataset from {dataset_path}...")
-        return torch.load(dataset_path, weights_only=False)
+        return saved
     else:
         qa_pairs, context_docs = get_data(args)
         print("Number of Docs in our VectorDB =", len(context_docs))
-        data_lists = {"train": [], "validation": [], "test": []}
         
         # Load triples either from saved file or from sources
-        triples = []
         if os.path.exists(triples_path):
-            triples = torch.load(triples_path, weights_only=False)
+            triple_table = load_saved_triples(triples_path, args.normalize_workers)
         else:
-            if args.use_arango:
-                # Load triples from ArangoDB instead of generating with TXT2KG
-                print("Loading triples from ArangoDB...")
-                triples = load_triples_from_arangodb(
-                    args.arango_url, 
-                    args.arango_db, 
-                    args.arango_user, 
-                    args.arango_password
-                )
-                # Validate and fix triples format if needed
-                triples = validate_triple_format(triples)
-                # Save triples for future use
-                torch.save(triples, triples_path)
-            else:
-                # Original TXT2KG code path
-                from torch_geometric.nn import TXT2KG
-                kg_maker = TXT2KG(
-                    NVIDIA_NIM_MODEL=args.NV_NIM_MODEL,
-                    NVIDIA_API_KEY=args.NV_NIM_KEY,
-                    ENDPOINT_URL=args.ENDPOINT_URL,
-                    chunk_size=args.chunk_size
-                )
-                print(
-                    "Note that if the TXT2KG process is too slow for you're liking using the public NIM, "
-                    "consider deploying yourself using local_lm flag of TXT2KG or using "
-                    "https://build.nvidia.com/nvidia/llama-3_1-nemotron-70b-instruct?snippet_tab=Docker "
-                    "to deploy to a private endpoint, which you can pass to this script w/ --ENDPOINT_URL flag."
-                )
-                
-                total_tqdm_count = len(context_docs)
-                initial_tqdm_count = 0
-                if os.path.exists(checkpoint_path):
-                    print(f"Restoring KG from checkpoint at {checkpoint_path}...")
-                    saved_relevant_triples = torch.load(checkpoint_path, weights_only=False)
-                    kg_maker.relevant_triples = saved_relevant_triples
-                    kg_maker.doc_id_counter = len(saved_relevant_triples)
-                    initial_tqdm_count = kg_maker.doc_id_counter
-                    context_docs = context_docs[(kg_maker.doc_id_counter - 1):]
-                
-                if args.checkpointing:
-                    interval = 10
-                    count = 0
-                
-                for context_doc in tqdm(context_docs, total=total_tqdm_count, 
-                                       initial=initial_tqdm_count, desc="Extracting KG triples"):
-                    kg_maker.add_doc_2_KG(txt=context_doc)
-                    if args.checkpointing:
-                        count += 1
-                        if count == interval:
-                            print(f" checkpointing KG to {checkpoint_path}...")
-                            count = 0
-                            kg_maker.save_kg(checkpoint_path)
-                
-                relevant_triples = kg_maker.relevant_triples
-                triples.extend(
-                    list(
-                        chain.from_iterable(
-                            triple_set for triple_set in relevant_triples.values()
-                        )
-                    )
-                )
-                triples = list(dict.fromkeys(triples))
-                torch.save(triples, triples_path)
-                
-                if args.checkpointing and os.path.exists(checkpoint_path):
-                    os.remove(checkpoint_path)
+            triple_table = load_triples(args, context_docs, checkpoint_path)
+            # Save triples for future use
+            torch.save(triple_table, triples_path)
+        # (head, relation, tail) tuples, as create_remote_backend_from_triplets expects
+        triples = triple_table.triples()
+        del triple_table
         
         print("Number of triples in our GraphDB =", len(triples))
         
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         sent_trans_batch_size = 256
-        model = SentenceTransformer(
-            model_name='Alibaba-NLP/gte-modernbert-base').to(device)
+        model, encoder = load_embedding_model(args, device)
         
-        backend_path = os.path.join(args.output_dir, args.backend_path)
         fs, gs = create_remote_backend_from_triplets(
             triplets=triples,
-            node_embedding_model=model,
+            node_embedding_model=encoder,
             node_method_to_call="encode",
             path=backend_path,
             pre_transform=preprocess_triplet,
@@ -322,80 +899,268 @@ def make_dataset(args):
                 "batch_size": min(len(triples), sent_trans_batch_size)
             },
             graph_db=NeighborSamplingRAGGraphStore,
-            feature_db=ModernBertFeatureStore
+            feature_db=QueryEncodingFeatureStore
         ).load()
         
-        # encode the raw context docs
-        embedded_docs = model.encode(
-            context_docs,
-            output_device=device,
+        # encode the raw context docs, or only those the document index lacks
+        digests = [doc_digest(doc) for doc in context_docs]
+        doc_index = open_doc_index(args, digests, lambda positions: encoder.encode(
+            [context_docs[i] for i in positions],
             batch_size=int(sent_trans_batch_size / 4),
             verbose=True
-        )
-        
-        # k for KNN
-        knn_neighsample_bs = 1024
-        # number of neighbors for each seed node selected by KNN
-        fanout = 100
-        # number of hops for neighborsampling
-        num_hops = 2
+        ).cpu())
+        embedded_docs = None
+        if doc_index is None:
+            embedded_docs = encoder.encode(
+                context_docs,
+                output_device=device,
+                batch_size=int(sent_trans_batch_size / 4),
+                verbose=True
+            )
         
-        local_filter_kwargs = {
-            "topk": 5,  # nodes
-            "topk_e": 5,  # edges
-            "cost_e": .5,  # edge cost
-            "num_clusters": 10,  # num clusters
-        }
+        query_loader = make_query_loader(fs, gs, triples, model, context_docs, embedded_docs,
+                                         doc_index=doc_index, digests=digests)
         
-        print("Now to retrieve context for each query from our Vector and Graph DBs...")
-        # GraphDB retrieval done with KNN+NeighborSampling+PCST
-        # PCST = Prize Collecting Steiner Tree
-        # VectorDB retrieval just vanilla RAG
-        query_loader = RAGQueryLoader(
-            data=(fs, gs),
-            seed_nodes_kwargs={"k_nodes": knn_neighsample_bs},
-            sampler_kwargs={"num_neighbors": [fanout] * num_hops},
-            local_filter=make_pcst_filter(triples, model),
-            local_filter_kwargs=local_filter_kwargs,
-            raw_docs=context_docs,
-            embedded_docs=embedded_docs
-        )
-        
-        total_data_list = []
+        QA_pairs = [(data_point["question"], data_point["answer"])
+                    for data_point in qa_pairs if not data_point["is_impossible"]]
+        # Shuffle the QA pairs' indices and query in that order; the position
+        # in the shuffled order picks the 60:20:20 split, so each subgraph is
+        # written to its split as soon as it is retrieved
+        order = list(range(len(QA_pairs)))
+        random.shuffle(order)
+        train_end, validation_end = int(.6 * len(order)), int(.8 * len(order))
         extracted_triple_sizes = []
+        with DatasetWriter(args, dataset_path) as writer:
+            for position, subgraph in run_queries(query_loader, [QA_pairs[i][0] for i in order],
+                                                  args.query_workers, desc="Building dataset"):
+                subgraph.label = QA_pairs[order[position]][1]
+                extracted_triple_sizes.append(len(subgraph.triples))
+                split = ("train" if position < train_end else
+                         "validation" if position < validation_end else "test")
+                writer.append(split, subgraph)
+        data_lists = writer.data_lists
         
-        for data_point in tqdm(qa_pairs, desc="Building un-split dataset"):
-            if data_point["is_impossible"]:
-                continue
-                
-            QA_pair = (data_point["question"], data_point["answer"])
-            q = QA_pair[0]
-            subgraph = query_loader.query(q)
-            subgraph.label = QA_pair[1]
-            total_data_list.append(subgraph)
-            extracted_triple_sizes.append(len(subgraph.triples))
+        print_retrieval_stats(extracted_triple_sizes)
         
-        import random
-        random.shuffle(total_data_list)
-        
-        print("Min # of Retrieved Triples =", min(extracted_triple_sizes))
-        print("Max # of Retrieved Triples =", max(extracted_triple_sizes))
-        print("Average # of Retrieved Triples =", sum(extracted_triple_sizes) / len(extracted_triple_sizes))
-        
-        # 60:20:20 split
-        data_lists["train"] = total_data_list[:int(.6 * len(total_data_list))]
-        data_lists["validation"] = total_data_list[
-            int(.6 * len(total_data_list)):int(.8 * len(total_data_list))]
-        data_lists["test"] = total_data_list[int(.8 * len(total_data_list)):]
-        
-        torch.save(data_lists, dataset_path)
-        
-        del model
+        report_embedding_cache(encoder)
+        del model, encoder
         gc.collect()
         torch.cuda.empty_cache()
         
         return data_lists
 
+def make_query_loader(fs, gs, triples, model, context_docs, embedded_docs, local_filter=None,
+                      doc_index=None, digests=None):
+    """
+    RAGQueryLoader doing KNN+NeighborSampling+PCST over the graph and vanilla
+    RAG over the docs, through `doc_index` (keyed by `digests`) when given.
+    """
+    # k for KNN
+    knn_neighsample_bs = 1024
+    # number of neighbors for each seed node selected by KNN
+    fanout = 100
+    # number of hops for neighborsampling
+    num_hops = 2
+    
+    local_filter_kwargs = {
+        "topk": 5,  # nodes
+        "topk_e": 5,  # edges
+        "cost_e": .5,  # edge cost
+        "num_clusters": 10,  # num clusters
+    }
+    
+    print("Now to retrieve context for each query from our Vector and Graph DBs...")
+    # GraphDB retrieval done with KNN+NeighborSampling+PCST
+    # PCST = Prize Collecting Steiner Tree
+    # VectorDB retrieval just vanilla RAG
+    loader_kwargs = dict(
+        data=(fs, gs),
+        seed_nodes_kwargs={"k_nodes": knn_neighsample_bs},
+        sampler_kwargs={"num_neighbors": [fanout] * num_hops},
+        local_filter=local_filter or PCSTFilter(triples, model),
+        local_filter_kwargs=local_filter_kwargs,
+    )
+    if doc_index is not None:
+        return IndexedDocsQueryLoader(RAGQueryLoader(**loader_kwargs), doc_index,
+                                      dict(zip(digests, context_docs)))
+    return RAGQueryLoader(**loader_kwargs, raw_docs=context_docs, embedded_docs=embedded_docs)
+
+def print_retrieval_stats(extracted_triple_sizes):
+    if not extracted_triple_sizes:
+        return
+    print("Min # of Retrieved Triples =", min(extracted_triple_sizes))
+    print("Max # of Retrieved Triples =", max(extracted_triple_sizes))
+    print("Average # of Retrieved Triples =", sum(extracted_triple_sizes) / len(extracted_triple_sizes))
+
+def make_dataset_incremental(args, dataset_path, triples_path, checkpoint_path, backend_path):
+    """
+    Update the dataset and the persistent graph store under `backend_path`
+    after the corpus or the triples changed.
+
+    The manifest from the previous run records the triples, node and relation
+    texts, document hashes and the neighbourhood each QA pair was retrieved
+    from, and in TXT2KG mode each document's extracted triples. Only new
+    documents go through TXT2KG, only new nodes, relations and documents are
+    embedded, and only QA pairs whose sampled neighbourhood contains a node
+    that gained or lost an edge (or that are new) are queried again; the
+    rest keep their previous subgraph and split. Changes that only move KNN
+    seeds or document retrieval for untouched questions are not picked up;
+    delete `backend_path` for a full rebuild.
+    """
+    manifest_path = os.path.join(backend_path, MANIFEST_FILE)
+    graph_path = os.path.join(backend_path, GRAPH_FILE)
+    previous = previous_graph = None
+    previous_data_lists = None
+    if os.path.exists(manifest_path) and os.path.exists(graph_path):
+        previous_data_lists = load_saved_dataset(dataset_path)
+    if previous_data_lists is not None:
+        previous = torch.load(manifest_path, weights_only=False)
+        previous_graph = torch.load(graph_path, weights_only=False)
+        print(f"Updating KG-RAG dataset incrementally from {manifest_path}...")
+    else:
+        print(f"No previous incremental build under {backend_path}, building from scratch...")
+    os.makedirs(backend_path, exist_ok=True)
+
+    qa_pairs, context_docs = get_data(args)
+    print("Number of Docs in our VectorDB =", len(context_docs))
+    digests = [doc_digest(doc) for doc in context_docs]
+
+    doc_triples = None
+    if args.use_arango:
+        triples = load_triples(args, context_docs, checkpoint_path).triples()
+    else:
+        # The manifest keeps each document's TXT2KG triples: only documents
+        # without an entry are read, and the triples are rebuilt from the
+        # current documents, so removed or changed ones drop theirs
+        known = (previous or {}).get('doc_triples') or {}
+        doc_triples = {digest: known[digest] for digest in digests if digest in known}
+        new_docs = [doc for doc, digest in zip(context_docs, digests) if digest not in doc_triples]
+        print(f"Extracting triples from {len(new_docs)} new documents "
+              f"({len(set(known) - set(digests))} removed or changed)...")
+        if new_docs:
+            doc_triples.update(extract_document_triples(args, new_docs, checkpoint_path))
+        triples = validate_triple_format(
+            list(dict.fromkeys(chain.from_iterable(doc_triples[digest] for digest in digests))),
+            args.normalize_workers
+        ).triples()
+    if previous is not None:
+        # Keep surviving triples in their previous order so existing node ids stay stable
+        current = set(triples)
+        kept = [triple for triple in previous['triples'] if triple in current]
+        triples = list(dict.fromkeys(kept + triples))
+    # Same TripleTable format as a full build, so later runs load it without re-validating
+    torch.save(normalize_triples(triples, args.normalize_workers), triples_path)
+    print("Number of triples in our GraphDB =", len(triples))
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    sent_trans_batch_size = 256
+    model, encoder = load_embedding_model(args, device)
+
+    data, nodes, relations, relation_embeddings = build_graph_data(
+        triples, encoder, sent_trans_batch_size, previous, previous_graph
+    )
+    del previous_graph
+    torch.save(data, graph_path)
+    # RemoteGraphBackendLoader deletes its file once garbage collected, so it
+    # is handed a scratch copy and graph.pt survives for the next run
+    scratch_path = os.path.join(backend_path, "graph.load.pt")
+    shutil.copyfile(graph_path, scratch_path)
+    fs, gs = RemoteGraphBackendLoader(
+        scratch_path, RemoteDataType.DATA, NeighborSamplingRAGGraphStore, QueryEncodingFeatureStore
+    ).load()
+
+    embedded_docs, new_doc_count = embed_with_reuse(
+        digests, context_docs, previous and previous['doc_digests'],
+        previous and previous['doc_embeddings'],
+        lambda docs: encoder.encode(docs, batch_size=int(sent_trans_batch_size / 4), verbose=True)
+    )
+    print(f"Embedded {new_doc_count} new of {len(context_docs)} documents")
+    doc_index = open_doc_index(args, digests, lambda positions: embedded_docs[positions].cpu())
+
+    changed = set()
+    if previous is not None:
+        changed = changed_node_ids(previous['triples'], triples, previous['nodes'])
+        print(f"{len(changed)} existing nodes gained or lost edges")
+    changed_mask = torch.zeros(len(previous['nodes']) if previous else 0, dtype=torch.bool)
+    changed_mask[list(changed)] = True
+
+    previous_subgraphs = {}  # question -> (split, position in the previous split)
+    for split, data_list in (previous_data_lists or {}).items():
+        for position, question in enumerate(split_questions(data_list)):
+            previous_subgraphs[question] = (split, position)
+    previous_neighbourhoods = previous['neighbourhoods'] if previous else {}
+
+    query_loader = make_query_loader(
+        fs, gs, triples, model, context_docs, embedded_docs.to(device),
+        local_filter=NeighbourhoodRecorder(PCSTFilter(triples, model)),
+        doc_index=doc_index, digests=digests
+    )
+    node_ids = {node: i for i, node in enumerate(nodes)}
+    previous_nodes = previous['nodes'] if previous else []
+    # Re-number previous neighbourhoods into this run's node ids
+    remap = torch.tensor([node_ids.get(node, -1) for node in previous_nodes], dtype=torch.long)
+
+    neighbourhoods = {}
+    entries = []  # (question, label, split, previous position or None when it must be queried)
+    for data_point in qa_pairs:
+        if data_point["is_impossible"]:
+            continue
+        q, label = data_point["question"], data_point["answer"]
+        split, position = previous_subgraphs.get(q, (None, None))
+        hood = previous_neighbourhoods.get(q)
+        if position is not None and hood is not None and not changed_mask[hood].any():
+            remapped = remap[hood]
+            neighbourhoods[q] = remapped[remapped >= 0]
+        else:
+            position = None
+        if split is None:
+            # 60:20:20 split for questions not seen before
+            roll = random.random()
+            split = "train" if roll < .6 else "validation" if roll < .8 else "test"
+        entries.append((q, label, split, position))
+
+    stale = [i for i, (_, _, _, position) in enumerate(entries) if position is None]
+    extracted_triple_sizes = []
+    # Kept subgraphs are copied over from the previous dataset one at a time,
+    # then re-queried ones are written as they are retrieved
+    with DatasetWriter(args, dataset_path) as writer:
+        for q, label, split, position in entries:
+            if position is not None:
+                subgraph = previous_data_lists[split][position]
+                subgraph.label = label
+                writer.append(split, subgraph)
+                extracted_triple_sizes.append(len(subgraph.triples))
+        for index, subgraph in run_queries(query_loader, [entries[i][0] for i in stale], args.query_workers,
+                                           desc="Updating dataset"):
+            q, label, split, _ = entries[stale[index]]
+            subgraph.question = q
+            neighbourhoods[q] = subgraph.neighbourhood
+            del subgraph.neighbourhood
+            subgraph.label = label
+            writer.append(split, subgraph)
+            extracted_triple_sizes.append(len(subgraph.triples))
+    data_lists = writer.data_lists
+    print(f"Queried {len(stale)} of {len(extracted_triple_sizes)} QA pairs")
+    print_retrieval_stats(extracted_triple_sizes)
+
+    torch.save({
+        'triples': triples,
+        'nodes': nodes,
+        'relations': relations,
+        'relation_embeddings': relation_embeddings,
+        'doc_digests': digests,
+        'doc_embeddings': embedded_docs.to('cpu'),
+        'doc_triples': doc_triples,
+        'neighbourhoods': neighbourhoods,
+    }, manifest_path)
+
+    report_embedding_cache(encoder)
+    del model, encoder
+    gc.collect()
+    torch.cuda.empty_cache()
+
+    return data_lists
+
 if __name__ == '__main__':
     # for reproducibility
     seed_everything(50)
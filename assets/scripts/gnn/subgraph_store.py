@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Sharded, memory-mapped storage for the train/validation/test subgraph lists
+
+preprocess_data.py used to torch.save the whole data_lists dict as a single
+pickle, which train_test_gnn.py had to unpickle into RAM before training
+could start. Here every split is a directory of shards; each shard stores,
+for every tensor attribute of the Data objects, all samples' values
+concatenated into one raw file plus an offsets index, and all other
+attributes (question, label, text_context, triples, ...) as one JSON record
+per sample in a side file. SubgraphDataset memory-maps the shards and builds
+a Data object only when a sample is requested.
+
+Layout (<root> is the dataset file with .shards in place of .pt, see
+store_path):
+    <root>/meta.json                     splits and their sample counts
+    <root>/<split>/meta.json             tensor dtypes/shapes, shard sizes
+    <root>/<split>/shard-00000/<attr>.bin, <attr>.offsets.npy
+    <root>/<split>/shard-00000/attrs.bin, attrs.offsets.npy
+"""
+
+import os
+import json
+import shutil
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from torch_geometric.data import Data
+
+FORMAT_VERSION = 1
+SHARD_SIZE_DEFAULT = 4096
+SPLITS = ("train", "validation", "test")
+ATTRS_FILE = "attrs"
+TENSOR_KEYS = "__tensors__"  # per-sample list of tensor attributes, inside the JSON record
+
+def _to_tensor(value):
+    """Tensors, and numeric numpy arrays (e.g. PCST node_idx), are stored as tensors"""
+    if isinstance(value, torch.Tensor):
+        return value
+    if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+        return torch.from_numpy(value)
+    return None
+
+def _jsonable(value):
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class _ShardWriter:
+    """Appends one sample at a time; an attribute missing from a sample gets an empty entry"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+        self.offsets = {}
+        self.rows = 0
+
+    def append(self, parts):
+        """parts: {name: (payload bytes, length in rows or bytes)} for one sample"""
+        for name, (payload, length) in parts.items():
+            if name not in self.files:
+                self.files[name] = open(os.path.join(self.directory, f"{name}.bin"), "wb")
+                self.offsets[name] = [0] * (self.rows + 1)
+            self.files[name].write(payload)
+            self.offsets[name].append(self.offsets[name][-1] + length)
+        self.rows += 1
+        for name, offsets in self.offsets.items():
+            if len(offsets) <= self.rows:
+                offsets.append(offsets[-1])
+
+    def close(self):
+        for name, f in self.files.items():
+            f.close()
+            np.save(os.path.join(self.directory, f"{name}.offsets.npy"),
+                    np.asarray(self.offsets[name], dtype=np.int64))
+
+class SplitWriter:
+    """
+    Appends Data objects to a sharded split directory one at a time, so a
+    split never has to be held in memory. close() writes the split's
+    meta.json, which makes it readable.
+
+    Tensor attributes must keep the same dtype and trailing shape across
+    samples.
+    """
+
+    def __init__(self, directory, shard_size=SHARD_SIZE_DEFAULT):
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        self.tensors = {}  # name -> {"dtype", "shape" (per-row), "cat_dim"}
+        self.shards = []
+        self.count = 0
+        self._writer = None
+
+    def append(self, sample):
+        if self.count % self.shard_size == 0:
+            if self._writer:
+                self._writer.close()
+            self._writer = _ShardWriter(os.path.join(self.directory, f"shard-{len(self.shards):05d}"))
+            self.shards.append(0)
+        attrs = {TENSOR_KEYS: []}
+        parts = {}
+        for key, value in sample.items():
+            tensor = _to_tensor(value)
+            if tensor is None:
+                attrs[key] = _jsonable(value)
+                continue
+            cat_dim = sample.__cat_dim__(key, tensor) if tensor.dim() else 0
+            rows = tensor.movedim(cat_dim, 0) if tensor.dim() else tensor.reshape(1)
+            spec = {"dtype": str(rows.dtype).replace("torch.", ""), "shape": list(rows.shape[1:]),
+                    "cat_dim": cat_dim, "scalar": tensor.dim() == 0}
+            known = self.tensors.setdefault(key, spec)
+            if known["dtype"] != spec["dtype"] or known["shape"] != spec["shape"]:
+                raise ValueError(f"Attribute '{key}' changes from {known['dtype']}{known['shape']} "
+                                 f"to {spec['dtype']}{spec['shape']} at sample {self.count}")
+            rows = rows.detach().cpu().contiguous()
+            parts[key] = (rows.numpy().tobytes(), rows.shape[0])
+            attrs[TENSOR_KEYS].append(key)
+        payload = json.dumps(attrs, ensure_ascii=False).encode("utf-8")
+        parts[ATTRS_FILE] = (payload, len(payload))
+        self._writer.append(parts)
+        self.shards[-1] += 1
+        self.count += 1
+
+    def close(self):
+        """Finish the last shard and write meta.json; returns the number of samples written"""
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+        # Every shard has an offsets index for every attribute, even ones none
+        # of its samples have
+        for index, shard_count in enumerate(self.shards):
+            shard_dir = os.path.join(self.directory, f"shard-{index:05d}")
+            for key in self.tensors:
+                offsets_path = os.path.join(shard_dir, f"{key}.offsets.npy")
+                if not os.path.exists(offsets_path):
+                    open(os.path.join(shard_dir, f"{key}.bin"), "wb").close()
+                    np.save(offsets_path, np.zeros(shard_count + 1, dtype=np.int64))
+
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"version": FORMAT_VERSION, "num_samples": self.count, "shard_size": self.shard_size,
+                       "shards": self.shards, "tensors": self.tensors}, f, indent=2)
+        return self.count
+
+def write_split(samples, directory, shard_size=SHARD_SIZE_DEFAULT):
+    """Write an iterable of Data objects as a sharded split directory; returns the number of samples"""
+    writer = SplitWriter(directory, shard_size)
+    try:
+        for sample in samples:
+            writer.append(sample)
+    finally:
+        count = writer.close()
+    return count
+
+class SubgraphDataset(Dataset):
+    """
+    Lazily loaded split written by write_split.
+
+    Shards are memory-mapped on first access, so opening a dataset is
+    instant and only the samples being used occupy RAM. Safe to use with
+    DataLoader workers: open memory maps are not pickled.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported subgraph store version {meta['version']} in {directory}")
+        self.num_samples = meta["num_samples"]
+        self.shard_size = meta["shard_size"]
+        self.shards = meta["shards"]
+        self.tensors = meta["tensors"]
+        self._open = {}
+
+    def __len__(self):
+        return self.num_samples
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_open"] = {}
+        return state
+
+    def _shard(self, index):
+        shard = self._open.get(index)
+        if shard is None:
+            shard_dir = os.path.join(self.directory, f"shard-{index:05d}")
+            shard = {}
+            for key, spec in self.tensors.items():
+                offsets = np.load(os.path.join(shard_dir, f"{key}.offsets.npy"))
+                path = os.path.join(shard_dir, f"{key}.bin")
+                row_shape = tuple(spec["shape"])
+                rows = int(offsets[-1])
+                data = (np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r", shape=(rows, *row_shape))
+                        if rows else np.empty((0, *row_shape), dtype=np.dtype(spec["dtype"])))
+                shard[key] = (offsets, data)
+            attr_offsets = np.load(os.path.join(shard_dir, f"{ATTRS_FILE}.offsets.npy"))
+            attr_bytes = (np.memmap(os.path.join(shard_dir, f"{ATTRS_FILE}.bin"), dtype=np.uint8, mode="r")
+                          if attr_offsets[-1] else np.empty(0, dtype=np.uint8))
+            shard[ATTRS_FILE] = (attr_offsets, attr_bytes)
+            self._open[index] = shard
+        return shard
+
+    def rows(self, key):
+        """Per-sample row counts of tensor attribute `key` (e.g. nodes for "x"), from the offsets alone"""
+        counts = []
+        for index in range(len(self.shards)):
+            offsets, _ = self._shard(index)[key]
+            counts.append(np.diff(offsets))
+        return np.concatenate(counts) if counts else np.empty(0, dtype=np.int64)
+
+    def records(self):
+        """Yield each sample's non-tensor attributes (question, label, ...) without reading its tensors"""
+        for index, count in enumerate(self.shards):
+            offsets, raw = self._shard(index)[ATTRS_FILE]
+            for row in range(count):
+                attrs = json.loads(bytes(raw[offsets[row]:offsets[row + 1]]).decode("utf-8"))
+                del attrs[TENSOR_KEYS]
+                yield attrs
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.num_samples
+        if not 0 <= idx < self.num_samples:
+            raise IndexError(f"Sample {idx} out of range for {self.num_samples} samples")
+        shard = self._shard(idx // self.shard_size)
+        row = idx % self.shard_size
+
+        offsets, raw = shard[ATTRS_FILE]
+        attrs = json.loads(bytes(raw[offsets[row]:offsets[row + 1]]).decode("utf-8"))
+        for key in attrs.pop(TENSOR_KEYS):
+            spec = self.tensors[key]
+            offsets, data = shard[key]
+            start, end = offsets[row], offsets[row + 1]
+            tensor = torch.from_numpy(np.array(data[start:end]))
+            if spec["scalar"]:
+                tensor = tensor.reshape(())
+            elif spec["cat_dim"] != 0:
+                tensor = tensor.movedim(0, spec["cat_dim"])
+            attrs[key] = tensor
+        return Data(**attrs)
+
+class DataStoreWriter:
+    """
+    Streams samples into the splits of a new store under `root`:
+
+        with DataStoreWriter(root) as writer:
+            for split, sample in samples:
+                writer.append(split, sample)
+
+    The store is written beside `root` and replaces an existing one only
+    when the block exits without error (readers of the old one keep working
+    off their memory maps); on error the partial store is removed.
+    """
+
+    def __init__(self, root, shard_size=SHARD_SIZE_DEFAULT):
+        self.root = root.rstrip(os.sep)
+        self.staging = self.root + ".tmp"
+        shutil.rmtree(self.staging, ignore_errors=True)
+        self.splits = {split: SplitWriter(os.path.join(self.staging, split), shard_size) for split in SPLITS}
+
+    def append(self, split, sample):
+        self.splits[split].append(sample)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        sizes = {split: writer.close() for split, writer in self.splits.items()}
+        if exc_type is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            return False
+        with open(os.path.join(self.staging, "meta.json"), "w") as f:
+            json.dump({"version": FORMAT_VERSION, "splits": sizes}, f, indent=2)
+        previous = self.root + ".old"
+        if os.path.exists(self.root):
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(self.root, previous)
+        os.replace(self.staging, self.root)
+        shutil.rmtree(previous, ignore_errors=True)
+        return False
+
+def save_data_lists(data_lists, root, shard_size=SHARD_SIZE_DEFAULT):
+    """Write every split of `data_lists` under `root` (see DataStoreWriter)"""
+    with DataStoreWriter(root, shard_size) as writer:
+        for split in SPLITS:
+            for sample in data_lists[split]:
+                writer.append(split, sample)
+
+def store_path(dataset_path):
+    """Directory holding the sharded form of `dataset_path` (output/tech_qa.pt -> output/tech_qa.shards)"""
+    return os.path.splitext(dataset_path)[0] + ".shards"
+
+def is_data_store(root):
+    return os.path.isfile(os.path.join(root, "meta.json"))
+
+def load_data_lists(root):
+    """{split: SubgraphDataset} for a store written by save_data_lists"""
+    return {split: SubgraphDataset(os.path.join(root, split)) for split in SPLITS}
@@ -2,9 +2,12 @@
 
 import argparse
 import os
+import time
+from contextlib import nullcontext
 import torch
 from tqdm import tqdm
 from torch.nn.utils import clip_grad_norm_
+from torch.utils.checkpoint import checkpoint
 
 # Import the necessary modules from PyTorch Geometric
 from torch_geometric import seed_everything
@@ -13,6 +16,11 @@ from torch_geometric.nn import (
     GAT, LLM, GRetriever, LLMJudge
 )
 
+from subgraph_store import is_data_store, load_data_lists, store_path
+from bucket_sampler import (
+    NUM_BUCKETS_DEFAULT, BucketBatchSampler, padded_fraction, sample_sizes, shuffled_padded_fraction
+)
+
 # Define constants for better readability
 NV_NIM_MODEL_DEFAULT = "nvidia/llama-3.1-nemotron-70b-instruct"
 LLM_GENERATOR_NAME_DEFAULT = "meta-llama/Meta-Llama-3.1-8B-Instruct"
@@ -23,6 +31,8 @@ EPOCHS_DEFAULT = 2
 BATCH_SIZE_DEFAULT = 1
 EVAL_BATCH_SIZE_DEFAULT = 2
 LLM_GEN_MODE_DEFAULT = "full"
+PRECISIONS = {"fp32": torch.float32, "bf16": torch.bfloat16, "fp16": torch.float16}
+GRAD_CLIP_NORM = 0.1
 DEFAULT_ENDPOINT_URL = "https://integrate.api.nvidia.com/v1"
 
 # File paths and directories
@@ -59,9 +69,22 @@ def parse_args():
     )
     parser.add_argument('--dont_save_model', action="store_true", help="Whether to skip model saving.")
     parser.add_argument('--eval_only', action="store_true", help="Skip training and only run evaluation")
+    parser.add_argument('--precision', type=str, default="fp32", choices=list(PRECISIONS),
+                        help="Autocast dtype for training and validation; fp16 adds a gradient scaler, "
+                             "bf16 also works on CPU")
+    parser.add_argument('--grad_accum_steps', type=int, default=1,
+                        help="Batches whose gradients are accumulated per optimizer step "
+                             "(effective batch size = batch_size * grad_accum_steps)")
+    parser.add_argument('--no_bucketing', action="store_true",
+                        help="Shuffle training samples uniformly instead of batching similar-sized ones")
+    parser.add_argument('--num_buckets', type=int, default=NUM_BUCKETS_DEFAULT,
+                        help="Buckets per size (graph nodes, prompt tokens) for length-aware batching")
+    parser.add_argument('--gnn_checkpointing', action="store_true",
+                        help="Recompute GAT layer activations in the backward pass instead of storing them")
     
     # File path arguments
-    parser.add_argument('--dataset_file', type=str, default=DATASET_FILE, help="Path to load dataset")
+    parser.add_argument('--dataset_file', type=str, default=DATASET_FILE,
+                        help="Path to load dataset (its .shards directory is preferred when present)")
     parser.add_argument('--model_save_path', type=str, default=MODEL_SAVE_PATH, help="Path to save/load model")
     parser.add_argument('--output_dir', type=str, default=OUTPUT_DIR, help="Directory for output files")
     
@@ -98,6 +121,39 @@ def adjust_learning_rate(param_group, base_lr, progress, num_training_steps):
     param_group["lr"] = lr
     return lr
 
+def enable_activation_checkpointing(gnn):
+    """
+    Checkpoint each GNN layer: its activations are recomputed during the
+    backward pass instead of being kept. The layer modules are left in place,
+    so saved parameter names do not change.
+    """
+    for conv in gnn.convs:
+        def checkpointed(*args, _forward=conv.forward, **kwargs):
+            if torch.is_grad_enabled():
+                return checkpoint(_forward, *args, use_reentrant=False, **kwargs)
+            return _forward(*args, **kwargs)
+        conv.forward = checkpointed
+
+def training_prompt(attrs):
+    """The text a training sample feeds the LLM: its prompt and answer"""
+    prompt = prompt_template.format(question=attrs["question"], context=attrs.get("text_context"))
+    return prompt + str(attrs.get("label", ""))
+
+def make_train_loader(args, dataset, tokenizer, pin_memory):
+    """
+    DataLoader over the training split; unless --no_bucketing, batches group
+    samples of similar graph size and prompt length (see bucket_sampler.py)
+    """
+    if args.no_bucketing:
+        return DataLoader(dataset, batch_size=args.batch_size,
+                          drop_last=True, pin_memory=pin_memory, shuffle=True)
+    sizes = sample_sizes(dataset, training_prompt, tokenizer)
+    sampler = BucketBatchSampler(sizes, args.batch_size, drop_last=True,
+                                 num_buckets=args.num_buckets, seed=torch.initial_seed())
+    print(f"Length-aware batching: {padded_fraction(sampler.batches(), sizes[:, 1]):.1%} padded prompt tokens "
+          f"(uniform shuffle: {shuffled_padded_fraction(sizes[:, 1], args.batch_size):.1%})")
+    return DataLoader(dataset, batch_sampler=sampler, pin_memory=pin_memory)
+
 def get_loss(model, batch):
     """
     Calculate loss for a batch
@@ -134,25 +190,31 @@ def train(args, data_lists):
     eval_batch_size = args.eval_batch_size
     hidden_channels = args.gnn_hidden_channels
     num_gnn_layers = args.num_gnn_layers
+    device_type = "cuda" if torch.cuda.is_available() else "cpu"
+    amp_dtype = PRECISIONS[args.precision]
+    # Pinned host memory only speeds up copies to a GPU
+    pin_memory = device_type == "cuda"
     
-    train_loader = DataLoader(data_lists["train"], batch_size=batch_size,
-                             drop_last=True, pin_memory=True, shuffle=True)
     val_loader = DataLoader(data_lists["validation"], batch_size=eval_batch_size,
-                           drop_last=False, pin_memory=True, shuffle=False)
+                           drop_last=False, pin_memory=pin_memory, shuffle=False)
     test_loader = DataLoader(data_lists["test"], batch_size=eval_batch_size,
-                            drop_last=False, pin_memory=True, shuffle=False)
+                            drop_last=False, pin_memory=pin_memory, shuffle=False)
     
     gnn = GAT(in_channels=768, hidden_channels=hidden_channels,
              out_channels=1024, num_layers=num_gnn_layers, heads=4)
+    if args.gnn_checkpointing:
+        enable_activation_checkpointing(gnn)
     
     if args.llm_generator_mode == "full":
         llm = LLM(model_name=args.llm_generator_name)
         model = GRetriever(llm=llm, gnn=gnn)
     elif args.llm_generator_mode == "lora":
+        # fp32 base weights; autocast runs the matmuls in amp_dtype
         llm = LLM(model_name=args.llm_generator_name, dtype=torch.float32)
         model = GRetriever(llm=llm, gnn=gnn, use_lora=True)
     else:  # frozen
-        llm = LLM(model_name=args.llm_generator_name, dtype=torch.float32).eval()
+        # Frozen weights never receive updates, so they can be stored in amp_dtype directly
+        llm = LLM(model_name=args.llm_generator_name, dtype=amp_dtype).eval()
         for _, p in llm.named_parameters():
             p.requires_grad = False
         model = GRetriever(llm=llm, gnn=gnn)
@@ -173,12 +235,23 @@ def train(args, data_lists):
         optimizer = torch.optim.AdamW([{
             'params': params, 'lr': lr, 'weight_decay': 0.05
         }], betas=(0.9, 0.95))
+        # fp16 gradients underflow without loss scaling; bf16 has fp32's range
+        scaler = torch.amp.GradScaler(device_type, enabled=args.precision == "fp16")
+        autocast = (torch.autocast(device_type, dtype=amp_dtype) if args.precision != "fp32"
+                    else nullcontext())
+        accum_steps = max(1, args.grad_accum_steps)
+        updates = 0
+        train_loader = make_train_loader(args, data_lists["train"], llm.tokenizer, pin_memory)
         
         for epoch in range(args.epochs):
+            if isinstance(train_loader.batch_sampler, BucketBatchSampler):
+                train_loader.batch_sampler.set_epoch(epoch)
             model.train()
             epoch_loss = 0
             epoch_str = f'Epoch: {epoch + 1}|{args.epochs}'
             loader = tqdm(train_loader, desc=epoch_str)
+            start_time = time.time()
+            optimizer.zero_grad()
             
             for step, batch in enumerate(loader):
                 new_qs = []
@@ -188,23 +261,32 @@ def train(args, data_lists):
                         prompt_template.format(question=q, context=batch.text_context[i]))
                 batch.question = new_qs
                 
-                optimizer.zero_grad()
-                loss = get_loss(model, batch)
-                loss.backward()
-                clip_grad_norm_(optimizer.param_groups[0]['params'], 0.1)
+                with autocast:
+                    loss = get_loss(model, batch)
+                scaler.scale(loss / accum_steps).backward()
+                epoch_loss += float(loss)
+                
+                if (step + 1) % accum_steps != 0 and step + 1 != len(train_loader):
+                    continue
+                # Clip the accumulated, unscaled gradients once per optimizer step
+                scaler.unscale_(optimizer)
+                clip_grad_norm_(optimizer.param_groups[0]['params'], GRAD_CLIP_NORM)
+                updates += 1
                 
-                if (step + 1) % 2 == 0:
+                if updates % 2 == 0:
                     adjust_learning_rate(optimizer.param_groups[0], lr,
                                         step / len(train_loader) + epoch, args.epochs)
                 
-                optimizer.step()
-                epoch_loss += float(loss)
+                scaler.step(optimizer)
+                scaler.update()
+                optimizer.zero_grad()
                 
-                if (step + 1) % 2 == 0:
+                if updates % 2 == 0:
                     lr = optimizer.param_groups[0]['lr']
             
             train_loss = epoch_loss / len(train_loader)
-            print(epoch_str + f', Train Loss: {train_loss:4f}')
+            samples_per_second = len(train_loader) * batch_size / max(time.time() - start_time, 1e-9)
+            print(epoch_str + f', Train Loss: {train_loss:4f}, {samples_per_second:.2f} samples/s')
             
             # Eval Step
             val_loss = 0
@@ -218,7 +300,8 @@ def train(args, data_lists):
                             prompt_template.format(question=q, context=batch.text_context[i]))
                     batch.question = new_qs
                     
-                    loss = get_loss(model, batch)
+                    with autocast:
+                        loss = get_loss(model, batch)
                     val_loss += loss.item()
             
             val_loss = val_loss / len(val_loader)
@@ -287,13 +370,21 @@ def test(model, test_loader, args):
 def load_dataset(args):
     """
     Load preprocessed dataset from file
+
+    The sharded store written by preprocess_data.py is opened lazily:
+    samples are read from memory-mapped shards as the DataLoader asks for
+    them. A single-file .pt dataset is unpickled into memory as before.
     """
     dataset_path = os.path.join(args.output_dir, args.dataset_file)
-    if not os.path.exists(dataset_path):
-        raise FileNotFoundError(f"Dataset file not found at {dataset_path}. Please run preprocess_data.py first.")
-    
-    print(f"Loading dataset from {dataset_path}...")
-    data_lists = torch.load(dataset_path, weights_only=False)
+    if is_data_store(store_path(dataset_path)):
+        print(f"Opening sharded dataset {store_path(dataset_path)}...")
+        data_lists = load_data_lists(store_path(dataset_path))
+    elif os.path.exists(dataset_path):
+        print(f"Loading dataset from {dataset_path}...")
+        data_lists = torch.load(dataset_path, weights_only=False)
+    else:
+        raise FileNotFoundError(f"Dataset not found at {store_path(dataset_path)} or {dataset_path}. "
+                                "Please run preprocess_data.py first.")
     print("Dataset loaded successfully!")
     print(f"Train set size: {len(data_lists['train'])}")
     print(f"Validation set size: {len(data_lists['validation'])}")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Columnar normalization of knowledge-graph triples
+
+ArangoDB exports and TXT2KG output arrive as millions of dicts, tuples or
+"subject predicate object" strings. normalize_triples converts them to Arrow
+columns in chunks, in parallel worker processes, drops incomplete triples
+with vectorized checks, dictionary-encodes entities (subjects and objects)
+and predicates into integer ids, and deduplicates on the integer
+(head, relation, tail) rows rather than on formatted strings. The resulting
+TripleTable holds every distinct string once, in Arrow buffers, and produces
+both the string form the PyG RAG backend takes and an id-encoded edge index.
+"""
+
+import os
+import multiprocessing
+from collections import deque
+from collections.abc import Sequence
+from itertools import filterfalse, islice
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import torch
+
+NORMALIZE_CHUNK_SIZE = 500_000
+NORMALIZE_WORKERS_DEFAULT = min(4, os.cpu_count() or 1)
+MAX_WARNINGS = 5  # malformed triples printed as examples
+FIELDS = ('subject', 'predicate', 'object')
+TRIPLE_STRUCT = pa.struct([(field, pa.string()) for field in FIELDS])
+TRIPLE_LIST = pa.list_(pa.string(), 3)
+
+def parse_triple(triple):
+    """
+    (subject, predicate, object) from a dict with subject/predicate/object
+    keys, a 3-sequence, or a "subject predicate object" string (first token
+    subject, second predicate, the rest object; only for triples files
+    written before triples were kept structured). None when malformed.
+    """
+    if isinstance(triple, str):
+        parts = triple.split()
+        if len(parts) < 3:
+            return None
+        return parts[0], parts[1], ' '.join(parts[2:])
+    if isinstance(triple, dict):
+        if not all(field in triple for field in FIELDS):
+            return None
+        return tuple(str(triple[field]) if triple[field] is not None else None for field in FIELDS)
+    if isinstance(triple, (tuple, list)) and len(triple) == 3:
+        return tuple(str(part) if part is not None else None for part in triple)
+    return None
+
+def _chunk_columns(chunk):
+    """
+    Arrow (subject, predicate, object) columns for a chunk; malformed
+    triples become null rows. Chunks of dicts (the ArangoDB export) or of
+    3-sequences of strings are converted by Arrow directly; strings, mixed
+    chunks and non-string values go through parse_triple one at a time.
+    """
+    try:
+        if isinstance(chunk[0], dict):
+            return pa.array(chunk, TRIPLE_STRUCT).flatten()
+        if isinstance(chunk[0], (tuple, list)):
+            rows = pa.array(chunk, TRIPLE_LIST)
+            return [pc.list_element(rows, i) for i in range(3)]
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    rows = [parse_triple(triple) or (None, None, None) for triple in chunk]
+    return [pa.array(column, pa.string()) for column in zip(*rows)]
+
+def _encode_chunk(chunk):
+    """
+    Validate a chunk and dictionary-encode it with chunk-local vocabularies.
+
+    Returns (entities, relations, ids, malformed count, malformed examples),
+    where entities/relations are Arrow string arrays and ids is an (n, 3)
+    array of local (head, relation, tail) ids.
+    """
+    subjects, predicates, objects = _chunk_columns(chunk)
+    valid = pc.fill_null(pc.and_(pc.and_(pc.greater(pc.utf8_length(subjects), 0),
+                                         pc.greater(pc.utf8_length(predicates), 0)),
+                                 pc.greater(pc.utf8_length(objects), 0)), False)
+    invalid = np.flatnonzero(~valid.to_numpy(zero_copy_only=False))
+    if len(invalid):
+        subjects, predicates, objects = (column.filter(valid) for column in (subjects, predicates, objects))
+
+    count = len(subjects)
+    entities = pa.concat_arrays([subjects, objects]).dictionary_encode()
+    relations = predicates.dictionary_encode()
+    entity_ids = entities.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+    ids = np.empty((count, 3), dtype=np.int64)
+    ids[:, 0] = entity_ids[:count]
+    ids[:, 1] = relations.indices.to_numpy(zero_copy_only=False)
+    ids[:, 2] = entity_ids[count:]
+    return (entities.dictionary, relations.dictionary, ids,
+            len(invalid), [chunk[i] for i in invalid[:MAX_WARNINGS]])
+
+def _encode_in_pool(pool, chunks, window):
+    """_encode_chunk results for `chunks` in order, with at most `window` chunks sent and not yet returned"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(_encode_chunk, (chunk,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def _intern(vocab, strings):
+    """Global ids for chunk-local (distinct) `strings`, adding unseen ones to `vocab`"""
+    strings = strings.to_pylist()
+    unseen = list(filterfalse(vocab.__contains__, strings))
+    vocab.update(zip(unseen, range(len(vocab), len(vocab) + len(unseen))))
+    return np.fromiter(map(vocab.__getitem__, strings), dtype=np.int64, count=len(strings))
+
+def _first_unique_rows(ids, num_entities, num_relations):
+    """Indices of the first occurrence of every distinct row, in input order"""
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int64)
+    if num_entities * num_entities * max(num_relations, 1) < 2 ** 63:
+        # Pack each row into one integer; 1-D unique is much cheaper than axis=0
+        keys = (ids[:, 0] * num_relations + ids[:, 1]) * num_entities + ids[:, 2]
+        _, first = np.unique(keys, return_index=True)
+    else:
+        _, first = np.unique(ids, axis=0, return_index=True)
+    return np.sort(first)
+
+class TripleTable:
+    """
+    Deduplicated triples as integer (head, relation, tail) rows over interned
+    entity and relation strings.
+
+    Attributes:
+        entities: Arrow array of entity strings; head and tail ids index it
+        relations: Arrow array of relation strings
+        ids: (n, 3) int64 array of (head, relation, tail) ids
+    """
+
+    def __init__(self, entities, relations, ids):
+        self.entities = entities
+        self.relations = relations
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _columns(self):
+        return (self.entities.take(pa.array(self.ids[:, 0])),
+                self.relations.take(pa.array(self.ids[:, 1])),
+                self.entities.take(pa.array(self.ids[:, 2])))
+
+    def row(self, i):
+        """Triple `i` as a (subject, predicate, object) tuple"""
+        h, r, t = self.ids[i].tolist()
+        return self.entities[h].as_py(), self.relations[r].as_py(), self.entities[t].as_py()
+
+    def triples(self):
+        """(subject, predicate, object) string tuples"""
+        return list(zip(*(column.to_pylist() for column in self._columns())))
+
+    def strings(self):
+        """"subject predicate object" strings"""
+        return pc.binary_join_element_wise(*self._columns(), pa.scalar(" ", pa.large_string())).to_pylist()
+
+    def edge_index(self):
+        """[2, n] tensor of (head, tail) entity ids"""
+        return torch.from_numpy(np.ascontiguousarray(self.ids[:, [0, 2]].T))
+
+    def edge_type(self):
+        """[n] tensor of relation ids"""
+        return torch.from_numpy(np.ascontiguousarray(self.ids[:, 1]))
+
+def normalize_triples(triples, workers=NORMALIZE_WORKERS_DEFAULT, chunk_size=NORMALIZE_CHUNK_SIZE):
+    """
+    Validate, intern and deduplicate an iterable of triples.
+
+    A list is split into chunks of `chunk_size` that are sent to `workers`
+    spawned processes, a few at a time, and come back as chunk-local
+    vocabularies and id arrays. The pool is spawned rather than forked
+    because callers run TXT2KG and torch threads by then, and a forked child
+    can deadlock on a lock one of them held. Any other
+    iterable (e.g. an ArangoDB cursor) is treated as a stream and consumed
+    chunk by chunk in this process, keeping memory bounded. Malformed or
+    incomplete triples are dropped and summarized once.
+
+    Returns:
+        TripleTable in first-occurrence order
+    """
+    entity_vocab = {}
+    relation_vocab = {}
+    id_chunks = []
+    malformed = 0
+    examples = []
+
+    pool = None
+    if isinstance(triples, Sequence):
+        bounds = [(start, start + chunk_size) for start in range(0, len(triples), chunk_size)]
+        if workers > 1 and len(bounds) > 1:
+            workers = min(workers, len(bounds))
+            pool = multiprocessing.get_context("spawn").Pool(workers)
+            encoded = _encode_in_pool(pool, (triples[start:end] for start, end in bounds), 2 * workers)
+        else:
+            encoded = (_encode_chunk(triples[start:end]) for start, end in bounds)
+    else:
+        stream = iter(triples)
+        encoded = map(_encode_chunk, iter(lambda: list(islice(stream, chunk_size)), []))
+    try:
+        for entities, relations, ids, chunk_malformed, chunk_examples in encoded:
+            entity_map = _intern(entity_vocab, entities)
+            relation_map = _intern(relation_vocab, relations)
+            if len(ids):
+                id_chunks.append(np.stack([entity_map[ids[:, 0]], relation_map[ids[:, 1]],
+                                           entity_map[ids[:, 2]]], axis=1))
+            malformed += chunk_malformed
+            examples.extend(chunk_examples[:MAX_WARNINGS - len(examples)])
+    finally:
+        if pool:
+            pool.terminate()
+
+    ids = np.concatenate(id_chunks) if id_chunks else np.empty((0, 3), dtype=np.int64)
+    total = len(ids)
+    ids = ids[_first_unique_rows(ids, len(entity_vocab), len(relation_vocab))]
+
+    if malformed:
+        print(f"Warning: skipped {malformed} malformed or incomplete triples, e.g.:")
+        for example in examples:
+            print(f"  {example!r}")
+    print(f"Normalized {total + malformed} triples: {len(ids)} unique, "
+          f"{len(entity_vocab)} entities, {len(relation_vocab)} relations")
+    return TripleTable(pa.array(list(entity_vocab), pa.large_string()),
+                       pa.array(list(relation_vocab), pa.large_string()), ids)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the txt2kg extract/store API
+Implements /api/extract-triples and /api/graph-db/triples with configurable
+latency distributions, failure injection and deterministic synthetic triples,
+so the batch processor can be benchmarked without the full stack.
+
+Example:
+    python3 scripts/mock_ingest_server.py --port 3101 \
+        --extract-latency lognormal:2.0,0.4 --extract-ms-per-kb 20 \
+        --max-concurrency 16 --extract-error-rate 0.01
+
+Latency specs have the form "<distribution>:<params>" (seconds):
+    fixed:0.5            always 0.5 s
+    uniform:0.2,1.0      uniform between 0.2 and 1.0 s
+    normal:1.0,0.2       mean 1.0 s, standard deviation 0.2 s (clamped at 0)
+    lognormal:1.0,0.5    median 1.0 s, log-space sigma 0.5 (long right tail)
+    exponential:0.5      mean 0.5 s
+"""
+
+import re
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+PORT_DEFAULT = 3101
+ENTITY_PATTERN = re.compile(r"\b[A-Z][A-Za-z0-9\-]{2,}\b")
+SYNTHETIC_PREDICATES = [
+    "associated_with", "interacts_with", "regulates", "part_of",
+    "located_in", "causes", "treats", "expressed_in",
+]
+
+@dataclass
+class LatencyModel:
+    distribution: str
+    params: tuple
+
+    @classmethod
+    def parse(cls, spec):
+        name, _, raw = spec.partition(':')
+        params = tuple(float(p) for p in raw.split(',') if p) if raw else ()
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+        if name not in expected or len(params) != expected[name]:
+            raise argparse.ArgumentTypeError(
+                f"Invalid latency spec '{spec}'; expected one of "
+                + ", ".join(f"{k}:<{v} values>" for k, v in expected.items())
+            )
+        return cls(name, params)
+
+    def sample(self, rng):
+        if self.distribution == 'fixed':
+            return self.params[0]
+        if self.distribution == 'uniform':
+            return rng.uniform(*self.params)
+        if self.distribution == 'normal':
+            return max(0.0, rng.gauss(*self.params))
+        if self.distribution == 'lognormal':
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(max(median, 1e-9)), sigma)
+        return rng.expovariate(1.0 / self.params[0])
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    succeeded: int = 0
+    injected_errors: int = 0
+    rejected: int = 0
+    service_time: float = 0.0
+    bytes: int = 0
+    triples: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__dataclass_fields__}
+
+@dataclass
+class MockConfig:
+    extract_latency: LatencyModel
+    store_latency: LatencyModel
+    extract_ms_per_kb: float = 0.0
+    store_ms_per_triple: float = 0.0
+    triples_per_kb: float = 2.0
+    max_concurrency: int = 0
+    extract_error_rate: float = 0.0
+    extract_429_rate: float = 0.0
+    extract_hang_rate: float = 0.0
+    store_error_rate: float = 0.0
+    seed: int = 0
+    stats: dict = field(default_factory=lambda: {
+        'extract': EndpointStats(), 'store': EndpointStats()
+    })
+
+def synthetic_triples(text, triples_per_kb):
+    """
+    Deterministic triples for a text: the same text always yields the same
+    triples, so results are comparable between runs and between clients.
+    """
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    rng = random.Random(digest)
+    entities = list(dict.fromkeys(ENTITY_PATTERN.findall(text))) or [f"Entity_{digest[:4].hex()}"]
+    count = max(1, round(len(text.encode('utf-8')) / 1024 * triples_per_kb))
+    triples = []
+    for _ in range(count):
+        subject = rng.choice(entities)
+        obj = rng.choice(entities) if len(entities) > 1 else f"Concept_{rng.randrange(1000)}"
+        triples.append({
+            "subject": subject,
+            "predicate": rng.choice(SYNTHETIC_PREDICATES),
+            "object": obj,
+        })
+    return triples
+
+def make_app(config):
+    rng = random.Random(config.seed)
+
+    async def admitted(stats, handler):
+        """Run a handler, rejecting with 429 above --max-concurrency like an overloaded backend"""
+        if config.max_concurrency and stats.in_flight >= config.max_concurrency:
+            stats.rejected += 1
+            return web.json_response({"error": "Too many requests"}, status=429,
+                                     headers={"Retry-After": "1"})
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        start_time = time.perf_counter()
+        try:
+            return await handler()
+        finally:
+            stats.in_flight -= 1
+            stats.service_time += time.perf_counter() - start_time
+
+    async def extract(request):
+        stats = config.stats['extract']
+        stats.requests += 1
+        body = await request.json()
+        text = body.get("text", "")
+
+        async def handler():
+            roll = rng.random()
+            if roll < config.extract_429_rate:
+                stats.injected_errors += 1
+                return web.json_response({"error": "Rate limited"}, status=429)
+            if roll < config.extract_429_rate + config.extract_error_rate:
+                stats.injected_errors += 1
+                return web.json_response({"error": "Injected failure"}, status=500)
+            if roll < config.extract_429_rate + config.extract_error_rate + config.extract_hang_rate:
+                stats.injected_errors += 1
+                await asyncio.sleep(3600)  # simulate a hung generation; the client times out
+
+            size = len(text.encode('utf-8'))
+            delay = config.extract_latency.sample(rng) + size / 1024 * config.extract_ms_per_kb / 1000
+            await asyncio.sleep(delay)
+
+            triples = synthetic_triples(text, config.triples_per_kb)
+            stats.succeeded += 1
+            stats.bytes += size
+            stats.triples += len(triples)
+            return web.json_response({"triples": triples, "count": len(triples), "success": True})
+
+        return await admitted(stats, handler)
+
+    async def store(request):
+        stats = config.stats['store']
+        stats.requests += 1
+        body = await request.json()
+        triples = body.get("triples") or []
+
+        async def handler():
+            if rng.random() < config.store_error_rate:
+                stats.injected_errors += 1
+                return web.json_response({"error": "Injected failure"}, status=500)
+            delay = config.store_latency.sample(rng) + len(triples) * config.store_ms_per_triple / 1000
+            await asyncio.sleep(delay)
+            stats.succeeded += 1
+            stats.triples += len(triples)
+            return web.json_response({
+                "success": True,
+                "count": len(triples),
+                "documentName": body.get("documentName"),
+                "databaseType": "mock",
+            })
+
+        return await admitted(stats, handler)
+
+    async def get_stats(request):
+        return web.json_response({name: s.as_dict() for name, s in config.stats.items()})
+
+    async def reset_stats(request):
+        config.stats['extract'] = EndpointStats()
+        config.stats['store'] = EndpointStats()
+        return web.json_response({"success": True})
+
+    app = web.Application(client_max_size=256 * 1024 * 1024)
+    app.router.add_post("/api/extract-triples", extract)
+    app.router.add_post("/api/graph-db/triples", store)
+    app.router.add_get("/stats", get_stats)
+    app.router.add_post("/stats/reset", reset_stats)
+    return app
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock txt2kg extract/store API for offline ingest benchmarks")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=PORT_DEFAULT, help="Port to listen on")
+    parser.add_argument("--extract-latency", type=LatencyModel.parse, default=LatencyModel.parse("lognormal:1.0,0.3"),
+                        help="Base extraction latency distribution")
+    parser.add_argument("--extract-ms-per-kb", type=float, default=10.0,
+                        help="Additional extraction latency per KB of input text")
+    parser.add_argument("--store-latency", type=LatencyModel.parse, default=LatencyModel.parse("fixed:0.05"),
+                        help="Base store latency distribution")
+    parser.add_argument("--store-ms-per-triple", type=float, default=2.0,
+                        help="Additional store latency per triple")
+    parser.add_argument("--triples-per-kb", type=float, default=2.0,
+                        help="Synthetic triples returned per KB of input text")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Reject requests with 429 above this many in flight per endpoint (0 = unlimited)")
+    parser.add_argument("--extract-error-rate", type=float, default=0.0, help="Fraction of extractions failing with 500")
+    parser.add_argument("--extract-429-rate", type=float, default=0.0, help="Fraction of extractions failing with 429")
+    parser.add_argument("--extract-hang-rate", type=float, default=0.0,
+                        help="Fraction of extractions that never respond (exercises client timeouts)")
+    parser.add_argument("--store-error-rate", type=float, default=0.0, help="Fraction of stores failing with 500")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and failure sampling")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = MockConfig(
+        extract_latency=args.extract_latency,
+        store_latency=args.store_latency,
+        extract_ms_per_kb=args.extract_ms_per_kb,
+        store_ms_per_triple=args.store_ms_per_triple,
+        triples_per_kb=args.triples_per_kb,
+        max_concurrency=args.max_concurrency,
+        extract_error_rate=args.extract_error_rate,
+        extract_429_rate=args.extract_429_rate,
+        extract_hang_rate=args.extract_hang_rate,
+        store_error_rate=args.store_error_rate,
+        seed=args.seed,
+    )
+    print(f"Mock txt2kg API listening on http://{args.host}:{args.port}", flush=True)
+    web.run_app(make_app(config), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
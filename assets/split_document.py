@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Streaming, sentence-aware document splitter for txt2kg
+
+Reads arbitrarily large text files in fixed-size blocks, splits them into
+sentences and packs whole sentences into chunks up to a byte or token budget,
+optionally repeating the tail of each chunk at the start of the next one.
+Memory use is bounded by the block and chunk sizes, not the input size.
+
+With --tokenizer, tokens are counted with the extraction model's own
+tokenizer (loaded from a local directory, never from the network), and each
+chunk is filled as close to the model's context budget as possible without
+going over it.
+
+Chunks are produced by a generator, so batch-process-chunks.py can consume
+them directly without writing temp files:
+
+    python3 batch-process-chunks.py large-document.txt --async
+
+or, like split-large-document.sh, they can be written to a chunks directory:
+
+    python3 split_document.py large-document.txt 50
+"""
+
+import os
+import re
+import sys
+import argparse
+
+CHUNK_SIZE_KB_DEFAULT = 50  # ~20-30 seconds of extraction per chunk
+BLOCK_SIZE = 1 << 20  # bytes read from the input at a time
+BYTES_PER_TOKEN_ESTIMATE = 4
+# Tokens kept free for the extraction prompt template and the generated triples
+RESERVE_TOKENS_DEFAULT = 2048
+
+# A sentence ends after terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or at a paragraph break.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])["\'\)\]]*\s+|\n\s*\n')
+
+def byte_length(text):
+    return len(text.encode('utf-8'))
+
+def estimated_tokens(text):
+    """Rough token count for English text when no tokenizer is available"""
+    return -(-byte_length(text) // BYTES_PER_TOKEN_ESTIMATE)
+
+def load_token_counter(tokenizer_path):
+    """
+    Load the extraction model's tokenizer from a local directory.
+
+    Returns:
+        (count_tokens, model_max_length) where count_tokens(text) is the exact
+        number of tokens the model sees for `text`
+    """
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise ImportError("Token-budget packing requires transformers (pip install transformers)")
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path, local_files_only=True)
+
+    def count_tokens(text):
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    return count_tokens, tokenizer.model_max_length
+
+def resolve_token_budget(max_tokens, model_max_length, reserve_tokens=RESERVE_TOKENS_DEFAULT):
+    """Chunk budget: --max-tokens if given, else the model context minus the reserve"""
+    if max_tokens:
+        return max_tokens
+    # Tokenizers without a configured limit report a huge sentinel value
+    if not model_max_length or model_max_length > 10_000_000:
+        raise ValueError("Tokenizer does not define a context length; pass --max-tokens")
+    if model_max_length <= reserve_tokens:
+        raise ValueError(f"Context length {model_max_length} is smaller than the "
+                         f"{reserve_tokens}-token reserve; lower --reserve-tokens")
+    return model_max_length - reserve_tokens
+
+def iter_sentences(stream, block_size=BLOCK_SIZE, max_sentence_chars=None):
+    """
+    Yield sentences from a text stream, reading it block by block.
+
+    Each sentence keeps its trailing whitespace, so joining the output
+    reproduces the input. Runs of text without a sentence boundary are cut at
+    the last whitespace once they exceed `max_sentence_chars` (default: the
+    block size) to keep memory bounded on inputs such as tables or logs.
+    """
+    max_sentence_chars = max_sentence_chars or block_size
+    pending = ''
+    while True:
+        block = stream.read(block_size)
+        pending += block
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(pending):
+            # A boundary at the very end of the buffer may continue in the next block
+            if block and match.end() == len(pending):
+                break
+            yield pending[start:match.end()]
+            start = match.end()
+        pending = pending[start:]
+
+        while len(pending) > max_sentence_chars:
+            cut = pending.rfind(' ', 0, max_sentence_chars) + 1 or max_sentence_chars
+            yield pending[:cut]
+            pending = pending[cut:]
+
+        if not block:
+            break
+    if pending:
+        yield pending
+
+def split_oversized(sentence, budget, measure):
+    """
+    Split a single sentence that exceeds the budget at word boundaries.
+
+    Word sizes are summed rather than re-measuring the growing piece, which
+    keeps this linear for tokenizer-based measures.
+    """
+    piece = ''
+    piece_size = 0
+    for word in re.findall(r'\S+\s*', sentence):
+        word_size = measure(word)
+        while word_size > budget:
+            # A single "word" longer than the budget: hard cut by characters
+            cut = max(1, len(word) * budget // word_size)
+            if piece:
+                yield piece
+                piece, piece_size = '', 0
+            yield word[:cut]
+            word = word[cut:]
+            word_size = measure(word)
+        if piece and piece_size + word_size > budget:
+            yield piece
+            piece, piece_size = '', 0
+        piece += word
+        piece_size += word_size
+    if piece:
+        yield piece
+
+def pack_sentences(sentences, budget, overlap=0, measure=byte_length, exact=False):
+    """
+    Greedily pack sentences into chunks of at most `budget` units.
+
+    Args:
+        sentences: Iterable of sentence strings (e.g. from iter_sentences)
+        budget: Maximum size of a chunk as reported by `measure`
+        overlap: Size of trailing context repeated at the start of the next chunk
+        measure: Function returning the size of a piece of text (bytes, tokens, ...)
+        exact: Re-measure every packed chunk and move trailing sentences to the
+            next chunk if it is over budget. Needed for tokenizers, where the
+            token count of joined text can differ from the sum of its parts.
+
+    Yields:
+        Chunk strings with surrounding whitespace stripped
+    """
+    current = []  # (sentence, size) pairs
+    size = 0
+
+    def take_chunk():
+        # Returns the chunk text and how many sentences of `current` it uses
+        count = len(current)
+        chunk = ''.join(s for s, _ in current).strip()
+        while exact and count > 1 and measure(chunk) > budget:
+            count -= 1
+            chunk = ''.join(s for s, _ in current[:count]).strip()
+        return chunk, count
+
+    def pieces():
+        for sentence in sentences:
+            sentence_size = measure(sentence)
+            if sentence_size > budget:
+                for piece in split_oversized(sentence, budget, measure):
+                    yield piece, measure(piece)
+            else:
+                yield sentence, sentence_size
+
+    for sentence, sentence_size in pieces():
+        while current and size + sentence_size > budget:
+            chunk, count = take_chunk()
+            if chunk:
+                yield chunk
+            emitted, remainder = current[:count], current[count:]
+            remainder_size = sum(n for _, n in remainder)
+            # Carry whole trailing sentences forward as overlap, as long as
+            # the next sentence still fits after them
+            carried = []
+            carried_size = 0
+            for s, n in reversed(emitted):
+                if (carried_size + n > overlap or
+                        carried_size + n + remainder_size + sentence_size > budget):
+                    break
+                carried.insert(0, (s, n))
+                carried_size += n
+            current = carried + remainder
+            size = carried_size + remainder_size
+        current.append((sentence, sentence_size))
+        size += sentence_size
+
+    while current:
+        chunk, count = take_chunk()
+        if chunk:
+            yield chunk
+        current = current[count:]
+
+def resolve_packing(chunk_size_kb=CHUNK_SIZE_KB_DEFAULT, overlap_kb=0, max_tokens=None,
+                    overlap_tokens=0, tokenizer=None, reserve_tokens=RESERVE_TOKENS_DEFAULT):
+    """
+    Packing parameters for pack_sentences: (budget, overlap, measure, exact).
+
+    With `tokenizer` (a local tokenizer directory) chunks are packed by exact
+    token count up to `max_tokens`, or the model's context length minus
+    `reserve_tokens`. Without it, `max_tokens` packs by estimated tokens, and
+    otherwise the budget is `chunk_size_kb` kilobytes of UTF-8 text.
+    """
+    if tokenizer:
+        count_tokens, model_max_length = load_token_counter(tokenizer)
+        budget = resolve_token_budget(max_tokens, model_max_length, reserve_tokens)
+        return budget, overlap_tokens, count_tokens, True
+    if max_tokens:
+        return max_tokens, overlap_tokens, estimated_tokens, False
+    return int(chunk_size_kb * 1024), int(overlap_kb * 1024), byte_length, False
+
+def iter_file_chunks(path, chunk_size_kb=CHUNK_SIZE_KB_DEFAULT, overlap_kb=0,
+                     max_tokens=None, overlap_tokens=0, tokenizer=None,
+                     reserve_tokens=RESERVE_TOKENS_DEFAULT):
+    """Stream chunks from a text file, packed as described in resolve_packing"""
+    budget, overlap, measure, exact = resolve_packing(
+        chunk_size_kb, overlap_kb, max_tokens, overlap_tokens, tokenizer, reserve_tokens
+    )
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        yield from pack_sentences(iter_sentences(f), budget, overlap, measure, exact)
+
+def chunk_name(path, index):
+    """File name used for chunk `index` (1-based), matching split-large-document.sh"""
+    basename = os.path.splitext(os.path.basename(path))[0]
+    return f"{basename}_part_{index:03d}.txt"
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Split a large document into sentence-aligned chunks for txt2kg processing"
+    )
+    parser.add_argument('input_file', help="Text file to split")
+    parser.add_argument('chunk_size_kb', nargs='?', type=float, default=CHUNK_SIZE_KB_DEFAULT,
+                        help="Maximum chunk size in KB (default: 50)")
+    parser.add_argument('--overlap-kb', type=float, default=0,
+                        help="KB of trailing sentences repeated at the start of the next chunk")
+    parser.add_argument('--max-tokens', type=int, default=None,
+                        help="Pack by tokens instead of bytes (estimated unless --tokenizer is given)")
+    parser.add_argument('--overlap-tokens', type=int, default=0,
+                        help="Tokens of overlap when packing by tokens")
+    parser.add_argument('--tokenizer', type=str, default=None,
+                        help="Local directory with the extraction model's tokenizer for exact token counts")
+    parser.add_argument('--reserve-tokens', type=int, default=RESERVE_TOKENS_DEFAULT,
+                        help="Tokens left free for the prompt and output when the budget comes from the model context")
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help="Directory for chunk files (default: <basename>_chunks)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if not os.path.isfile(args.input_file):
+        print(f"Error: File '{args.input_file}' not found")
+        sys.exit(1)
+
+    basename = os.path.splitext(os.path.basename(args.input_file))[0]
+    output_dir = args.output_dir or f"{basename}_chunks"
+    if args.tokenizer:
+        budget = f"{args.max_tokens or 'model context'} tokens ({args.tokenizer})"
+    elif args.max_tokens:
+        budget = f"{args.max_tokens} estimated tokens"
+    else:
+        budget = f"{args.chunk_size_kb:g} KB"
+
+    print("================================================")
+    print("txt2kg Large Document Splitter")
+    print("================================================")
+    print(f"Input file: {args.input_file}")
+    print(f"File size: {os.path.getsize(args.input_file) // 1024} KB")
+    print(f"Chunk budget: {budget}")
+    print(f"Output directory: {output_dir}")
+    print("")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    count = 0
+    for count, chunk in enumerate(iter_file_chunks(
+            args.input_file, args.chunk_size_kb, args.overlap_kb,
+            args.max_tokens, args.overlap_tokens, args.tokenizer,
+            args.reserve_tokens), 1):
+        chunk_path = os.path.join(output_dir, chunk_name(args.input_file, count))
+        with open(chunk_path, 'w', encoding='utf-8') as f:
+            f.write(chunk)
+        print(f"Created: {os.path.basename(chunk_path)} ({byte_length(chunk) / 1024:.1f} KB)")
+
+    print("")
+    print("================================================")
+    print(f"✅ Successfully split into {count} chunks")
+    print("================================================")
+    print("")
+    print("Next steps:")
+    print(f"  python3 batch-process-chunks.py {output_dir}/ --async")
+    print("")
+    print("Or skip the chunk files and stream the document directly:")
+    print(f"  python3 batch-process-chunks.py {args.input_file} --async")
+
+if __name__ == "__main__":
+    main()